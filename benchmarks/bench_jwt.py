@@ -0,0 +1,46 @@
+"""
+JWT 校验吞吐量微基准：对比 PyJWT 的 `jwt.decode` 与 `JWTKeyring.decode`。
+
+运行方式::
+
+    python benchmarks/bench_jwt.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import jwt
+
+from pkg.JWT.jwt import JWTKeyring
+
+ROUNDS = 50000
+
+def main() -> None:
+    secret = 'a' * 512
+    keyring = JWTKeyring()
+    keyring.load(secret, ['b' * 512])
+    token = keyring.encode({
+        'sub': 'admin',
+        'uid': 1,
+        'exp': datetime.now(timezone.utc) + timedelta(hours=1),
+    })
+
+    cases = {
+        'jwt.decode': lambda: jwt.decode(token, secret, algorithms=['HS256']),
+        'JWTKeyring.decode': lambda: keyring.decode(token),
+    }
+
+    results: dict[str, float] = {}
+    for name, func in cases.items():
+        func()
+        seconds = min(timeit.repeat(func, number=ROUNDS, repeat=5))
+        results[name] = ROUNDS / seconds
+        print(f"{name:<20} {results[name]:>12,.0f} ops/s")
+
+    print(f"speedup              {results['JWTKeyring.decode'] / results['jwt.decode']:>12.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,28 @@
 from fastapi import FastAPI
 from routers import routers
 from pkg.conf import appmeta
-from models.database import init_db
+from models.database import ReplicaRouter, init_db
 from models.migration import migration
+from models.setting import SettingsCache
 from pkg.lifespan import lifespan
 from pkg.JWT import jwt as JWT
+from pkg.password.pwd import Password
+from service.storage import ThumbCache, UploadSessionStore, run_rollup_reconciler
+from service.task import TaskExecutor
 
 # 添加初始化数据库启动项
 lifespan.add_startup(init_db)
 lifespan.add_startup(migration)
+lifespan.add_startup(SettingsCache.load_from_database)
 lifespan.add_startup(JWT.load_secret_key)
+lifespan.add_startup(TaskExecutor.recover)
+lifespan.add_background(ReplicaRouter.run_health_checks)
+lifespan.add_background(run_rollup_reconciler)
+lifespan.add_background(UploadSessionStore.run_sweeper)
+lifespan.add_background(TaskExecutor.run_heartbeat)
+lifespan.add_shutdown(Password.shutdown)
+lifespan.add_shutdown(TaskExecutor.shutdown)
+lifespan.add_shutdown(ThumbCache.shutdown)
 
 # 创建应用实例并设置元数据
 app = FastAPI(
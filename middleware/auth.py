@@ -1,11 +1,15 @@
+import hmac
 from typing import Annotated
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from jwt import InvalidTokenError
-import jwt
 
+from models.database import current_user_id, get_session
 from models.user import User
+from pkg.cache.lru import LRUCache
+from pkg.conf import appmeta
 from pkg.JWT import jwt as JWT
+from pkg.sign.sign import PURPOSE_DOWNLOAD, PURPOSE_REQUEST, SignatureError, SignedClaims, Signer, request_digest
 from .dependencies import SessionDep
 
 credentials_exception = HTTPException(
@@ -14,38 +18,126 @@ credentials_exception = HTTPException(
     headers={"WWW-Authenticate": "Bearer"},
 )
 
+_user_cache: LRUCache[int, User] = LRUCache(maxsize=appmeta.auth_cache_size, ttl=appmeta.auth_cache_ttl)
+"""
+鉴权用户快照缓存，键为用户ID。
+
+值是已脱离会话（detached）且预加载了 `group` 的 User 实例，只作为模板使用，
+每个请求通过 `session.merge(load=False)` 得到属于自己会话的副本，不会产生查询。
+"""
+
+def invalidate_user(user_id: int) -> None:
+    """
+    用户被修改或删除后，使其鉴权缓存失效。
+
+    :param user_id: 用户ID
+    """
+    _user_cache.pop(user_id)
+
+def invalidate_group(group_id: int) -> None:
+    """
+    用户组被修改或删除后，使该组全部用户的鉴权缓存失效。
+
+    :param group_id: 用户组ID
+    """
+    _user_cache.pop_if(lambda _, user: user.group_id == group_id)
+
+async def _load_user_snapshot(user_id: int) -> User | None:
+    """
+    在独立的会话中读取用户及其用户组，会话关闭后实例处于 detached 状态，可以安全地缓存。
+
+    :param user_id: 用户ID
+    """
+    async for session in get_session():
+        return await User.get(session, User.id == user_id, load=User.group)
+    return None
+
 async def AuthRequired(
     session: SessionDep,
     token: Annotated[str, Depends(JWT.oauth2_scheme)],
 ) -> User:
     """
     AuthRequired 需要登录
+
+    令牌中携带用户ID（`uid`），命中鉴权缓存时整个依赖链不访问数据库。
     """
     try:
-        payload = jwt.decode(token, JWT.SECRET_KEY, algorithms=["HS256"])
-        username = payload.get("sub")
+        payload = JWT.keyring.decode(token)
+    except JWT.UnknownKeyIdError:
+        # 密钥可能已在其他 worker 上轮换，刷新后重试一次
+        if not await JWT.refresh_keys():
+            raise credentials_exception
+        try:
+            payload = JWT.keyring.decode(token)
+        except InvalidTokenError:
+            raise credentials_exception
+    except InvalidTokenError:
+        raise credentials_exception
 
+    user_id = payload.get("uid")
+    if user_id is None:
+        # 兼容旧令牌：只带用户名时按用户名查询，不走缓存
+        username = payload.get("sub")
         if username is None:
             raise credentials_exception
-
-        # 从数据库获取用户信息
-        user = await User.get(session, User.username == username)
+        user = await User.get(session, User.username == username, load=User.group)
         if not user:
             raise credentials_exception
-
+        current_user_id.set(user.id)
         return user
 
-    except InvalidTokenError:
-        raise credentials_exception
+    snapshot = _user_cache.get(user_id)
+    if snapshot is None:
+        snapshot = await _load_user_snapshot(user_id)
+        if snapshot is None:
+            raise credentials_exception
+        _user_cache.set(user_id, snapshot)
+
+    current_user_id.set(user_id)
+    return await session.merge(snapshot, load=False)
+
+_slave_signer: tuple[str, Signer] | None = None
+"""(密钥, 签名器)，密钥变化时重建"""
+
+def _get_slave_signer() -> Signer:
+    global _slave_signer
+    if not appmeta.slave_secret:
+        raise HTTPException(status_code=403, detail="Slave mode is not enabled")
+    if _slave_signer is None or _slave_signer[0] != appmeta.slave_secret:
+        _slave_signer = (appmeta.slave_secret, Signer(appmeta.slave_secret))
+    return _slave_signer[1]
 
 async def SignRequired(
-    session: SessionDep,
+    request: Request,
     token: Annotated[str, Depends(JWT.oauth2_scheme)],
-) -> User | None:
+) -> SignedClaims:
     """
     SignAuthRequired 需要验证请求签名
+
+    主机使用 `Node.slave_key` 对请求方法、路径、查询参数与请求体签名，放在 `Authorization: Bearer` 中；
+    从机用 `SLAVE_SECRET` 校验，只做一次 HMAC，不访问数据库。
     """
-    pass
+    try:
+        claims = _get_slave_signer().verify(token, PURPOSE_REQUEST)
+    except SignatureError:
+        raise HTTPException(status_code=403, detail="Invalid signature")
+    if claims.path != request.url.path or claims.request is None:
+        raise HTTPException(status_code=403, detail="Invalid signature")
+    digest = request_digest(request.method, request.url.path, request.url.query, await request.body())
+    if not hmac.compare_digest(claims.request, digest):
+        raise HTTPException(status_code=403, detail="Invalid signature")
+    return claims
+
+async def DownloadSignRequired(sign: str) -> SignedClaims:
+    """
+    校验 URL 中的下载签名，取出文件位置、限速与用户。
+
+    签名由主机在生成下载链接时签发，从机无需回调主机即可直接提供下载。
+    """
+    try:
+        return _get_slave_signer().verify(sign, PURPOSE_DOWNLOAD)
+    except SignatureError:
+        raise HTTPException(status_code=403, detail="Invalid signature")
 
 async def AdminRequired(
     user: Annotated[User, Depends(AuthRequired)],
@@ -59,4 +151,4 @@ async def AdminRequired(
     group = await user.awaitable_attrs.group
     if group.admin:
         return user
-    raise HTTPException(status_code=403, detail="Admin Required")
\ No newline at end of file
+    raise HTTPException(status_code=403, detail="Admin Required")
@@ -3,7 +3,10 @@ from typing import Annotated, AsyncGenerator
 from fastapi import Depends
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from models.database import get_session
+from models.database import get_read_session, get_session
 
 SessionDep = Annotated[AsyncSession, Depends(get_session)]
 """数据库会话依赖，用于路由函数中获取数据库会话"""
+
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
+"""读写分离数据库会话依赖，SELECT 走只读副本（配置了的话），用于以读取为主的路由"""
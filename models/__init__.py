@@ -2,6 +2,7 @@ from . import response
 
 from .user import User
 
+from .blob import Blob
 from .download import Download
 from .file import File
 from .folder import Folder
@@ -16,7 +17,8 @@ from .share import Share
 from .source_link import SourceLink
 from .storage_pack import StoragePack
 from .tag import Tag
-from .task import Task
+from .task import Task, TaskStatus, TaskType
+from .upload_session import UploadSession
 from .webdav import WebDAV
 
 from .database import engine, get_session
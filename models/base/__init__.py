@@ -1,2 +1,2 @@
 from .sqlmodel_base import SQLModelBase
-from .table_base import TableBase, UUIDTableBase, now, now_date
+from .table_base import CursorPage, TableBase, UUIDTableBase, now, now_date
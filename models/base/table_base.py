@@ -1,9 +1,11 @@
+import base64
+import json
 import uuid
 from datetime import datetime, timezone
-from typing import Union, List, TypeVar, Type, Literal, override, Optional, Any
+from typing import Generic, NamedTuple, Union, List, TypeVar, Type, Literal, override, Optional, Any
 
 from fastapi import HTTPException
-from sqlalchemy import DateTime, BinaryExpression, ClauseElement
+from sqlalchemy import DateTime, BinaryExpression, ClauseElement, delete, insert, inspect, tuple_, update
 from sqlalchemy.orm import selectinload
 from sqlmodel import Field, select, Relationship
 from sqlmodel.ext.asyncio.session import AsyncSession
@@ -18,6 +20,39 @@ M = TypeVar("M", bound="SQLModel")
 now = lambda: datetime.now()
 now_date = lambda: datetime.now().date()
 
+class CursorPage(NamedTuple, Generic[T]):
+    """游标分页的一页结果"""
+
+    items: list[T]
+    """本页记录"""
+
+    next_cursor: str | None
+    """下一页的游标，没有更多记录时为 None"""
+
+def encode_cursor(key: datetime, id: Any) -> str:
+    """把排序键与主键编码为不透明的游标字符串"""
+    raw = json.dumps([key.isoformat(), str(id) if isinstance(id, uuid.UUID) else id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).rstrip(b'=').decode('ascii')
+
+def decode_cursor(cursor: str, id_type: type = int) -> tuple[datetime, Any]:
+    """
+    解析 :func:`encode_cursor` 生成的游标。
+
+    :param cursor: 游标
+    :param id_type: 主键类型，游标中的主键按此转换
+    :raises HTTPException: 游标格式错误时抛出 400
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key, id = json.loads(raw)
+        if id_type is uuid.UUID:
+            id = uuid.UUID(id)
+        elif not isinstance(id, id_type) or isinstance(id, bool):
+            raise TypeError(f"cursor id is not {id_type.__name__}")
+        return datetime.fromisoformat(key), id
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 class TableBase(SQLModelBase, AsyncAttrs):
     id: int | None = Field(default=None, primary_key=True)
 
@@ -121,6 +156,134 @@ class TableBase(SQLModelBase, AsyncAttrs):
 
         await session.commit()
 
+    @classmethod
+    async def bulk_add(
+            cls: Type[T],
+            session: AsyncSession,
+            instances: list[T],
+            *,
+            returning: bool = True,
+            batch_size: int = 1000,
+            commit: bool = True,
+    ) -> list[T]:
+        """
+        批量插入记录，以集合的方式一次性写入，不会逐行 refresh。
+
+        数据库支持 `INSERT ... RETURNING` 时（SQLite 3.35+、PostgreSQL），
+        新记录的主键随插入语句一起返回并回填到实例上；否则只插入，不回填主键。
+        实例不会被加入会话，插入后可以直接读取字段值。
+
+        :param session: 数据库会话
+        :param instances: 要插入的实例
+        :param returning: 是否回填自增主键
+        :param batch_size: 每条 INSERT 语句包含的行数
+        :param commit: 是否提交事务，传 `False` 时由调用方在同一事务中继续操作
+        :return: 传入的实例列表
+
+        usage:
+        items = [Item(...) for _ in range(100000)]
+
+        await Item.bulk_add(session, items)
+
+        item_id = items[0].id
+        """
+        if not instances:
+            return instances
+
+        need_ids = returning and any(instance.id is None for instance in instances)
+        keys = [attr.key for attr in inspect(cls).column_attrs]
+        dialect = session.get_bind().dialect
+        if need_ids and not dialect.insert_executemany_returning_sort_by_parameter_order:
+            need_ids = False
+
+        for start in range(0, len(instances), batch_size):
+            batch = instances[start:start + batch_size]
+            rows = [
+                {key: getattr(instance, key) for key in keys if key != 'id' or instance.id is not None}
+                for instance in batch
+            ]
+
+            if need_ids:
+                result = await session.exec(
+                    insert(cls).returning(cls.id, sort_by_parameter_order=True),
+                    params=rows,
+                )
+                for instance, (id_,) in zip(batch, result.all()):
+                    instance.id = id_
+            else:
+                await session.exec(insert(cls), params=rows)
+
+        if commit:
+            await session.commit()
+
+        return instances
+
+    @classmethod
+    async def bulk_update(
+            cls: Type[T],
+            session: AsyncSession,
+            condition: BinaryExpression | ClauseElement | None,
+            values: dict[str, Any],
+            *,
+            commit: bool = True,
+    ) -> int:
+        """
+        按条件批量更新，只发出一条 UPDATE 语句，不加载任何实例。
+
+        会话中已加载的同类实例不会被同步，需要时请重新查询。
+
+        :param session: 数据库会话
+        :param condition: SQLAlchemy 条件，如 `Item.owner_id == 1`；为 `None` 时更新全表
+        :param values: `{字段名: 新值}`，值也可以是 SQL 表达式，如 `Item.size + 1`
+        :param commit: 是否提交事务
+        :return: 受影响的行数
+
+        usage:
+        await Item.bulk_update(session, Item.owner_id == 1, {'owner_id': 2})
+        """
+        statement = update(cls).values(**values).execution_options(synchronize_session=False)
+        if condition is not None:
+            statement = statement.where(condition)
+
+        result = await session.exec(statement)
+
+        if commit:
+            await session.commit()
+
+        return result.rowcount
+
+    @classmethod
+    async def bulk_delete(
+            cls: Type[T],
+            session: AsyncSession,
+            condition: BinaryExpression | ClauseElement | None,
+            *,
+            commit: bool = True,
+    ) -> int:
+        """
+        按条件批量删除，只发出一条 DELETE 语句，不加载任何实例。
+
+        不会触发 ORM 级联，有外键依赖的记录需要调用方先行处理。
+
+        :param session: 数据库会话
+        :param condition: SQLAlchemy 条件；为 `None` 时清空全表
+        :param commit: 是否提交事务
+        :return: 受影响的行数
+
+        usage:
+        await Item.bulk_delete(session, Item.owner_id == 1)
+        """
+        statement = delete(cls).execution_options(synchronize_session=False)
+        if condition is not None:
+            statement = statement.where(condition)
+
+        result = await session.exec(statement)
+
+        if commit:
+            await session.commit()
+
+        return result.rowcount
+
     @classmethod
     async def get(
             cls: Type[T],
@@ -184,6 +347,66 @@ class TableBase(SQLModelBase, AsyncAttrs):
         else:
             raise ValueError(f"无效的 fetch_mode: {fetch_mode}")
 
+    @classmethod
+    async def get_page(
+            cls: Type[T],
+            session: AsyncSession,
+            condition: BinaryExpression | ClauseElement | None,
+            *,
+            cursor: str | None = None,
+            limit: int = 20,
+            order_field: Literal["created_at", "updated_at"] = "created_at",
+            descending: bool = True,
+            load: Union[Relationship, None] = None,
+    ) -> CursorPage[T]:
+        """
+        游标（keyset）分页查询。
+
+        按 `(order_field, id)` 排序，翻页条件是 `(order_field, id) < 上一页最后一行`，
+        可以直接利用 `(…, updated_at)` / `(…, created_at)` 索引定位，翻到多深都和第一页一样快。
+        游标对客户端不透明，原样传回即可。
+
+        :param session: 数据库会话
+        :param condition: 额外的查询条件，如 `File.user_id == 1`
+        :param cursor: 上一页返回的 `next_cursor`，第一页传 None
+        :param limit: 每页记录数
+        :param order_field: 排序字段
+        :param descending: 是否倒序（最新的在前）
+        :param load: 需要预加载的关系
+        :return: 本页记录与下一页游标
+        """
+        key_column = getattr(cls, order_field)
+        statement = select(cls)
+
+        if condition is not None:
+            statement = statement.where(condition)
+
+        if cursor is not None:
+            key, id = decode_cursor(cursor, cls.__table__.c.id.type.python_type)
+            if descending:
+                statement = statement.where(tuple_(key_column, cls.id) < tuple_(key, id))
+            else:
+                statement = statement.where(tuple_(key_column, cls.id) > tuple_(key, id))
+
+        if descending:
+            statement = statement.order_by(key_column.desc(), cls.id.desc())
+        else:
+            statement = statement.order_by(key_column.asc(), cls.id.asc())
+
+        if load:
+            statement = statement.options(selectinload(load))
+
+        # 多取一行用于判断是否还有下一页
+        items = list((await session.exec(statement.limit(limit + 1))).all())
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            last = items[-1]
+            next_cursor = encode_cursor(getattr(last, order_field), last.id)
+
+        return CursorPage(items, next_cursor)
+
     @classmethod
     async def get_exist_one(cls: Type[T], session: AsyncSession, id: int, load: Union[Relationship, None] = None) -> T:
         """此方法和 await session.get(cls, 主键)的区别就是当不存在时不返回None，
@@ -0,0 +1,110 @@
+from datetime import datetime
+
+from sqlalchemy import delete, func, update
+from sqlmodel import Field, Index, UniqueConstraint, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .base import TableBase
+
+class Blob(TableBase, table=True):
+    """
+    内容寻址的物理文件，同一存储策略下内容相同（SHA256 与大小相同）的文件只保存一份。
+
+    `ref_count` 为指向它的 File 数量，降到 0 后由后台清理任务删除记录与物理文件。
+    """
+
+    __table_args__ = (
+        UniqueConstraint("policy_id", "sha256", "size", name="uq_blob_policy_hash_size"),
+        Index("ix_blob_ref_count", "ref_count"),
+    )
+
+    sha256: str = Field(max_length=64, description="SHA256 摘要（十六进制）")
+    size: int = Field(ge=0, description="文件大小（字节）")
+    md5: str | None = Field(default=None, max_length=32, description="MD5 摘要（十六进制）")
+    sha1: str | None = Field(default=None, max_length=40, description="SHA1 摘要（十六进制）")
+    crc32: str | None = Field(default=None, max_length=8, description="CRC32（十六进制）")
+    source_name: str = Field(description="物理文件位置")
+    ref_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"}, description="引用计数")
+
+    # 外键
+    policy_id: int = Field(foreign_key="policy.id", index=True, description="所属存储策略ID")
+
+    @classmethod
+    async def acquire(cls, session: AsyncSession, condition, *, commit: bool = True) -> "Blob | None":
+        """
+        增加一次引用，一条 UPDATE 完成。
+
+        引用计数已降到 0、但尚未被清理的 Blob 也会被重新引用；清理任务只删除计数仍为 0 的记录，
+        两者不会冲突。
+
+        :param session: 数据库会话
+        :param condition: Blob 的筛选条件，如 `Blob.id == 1` 或 :meth:`content_condition`
+        :param commit: 是否提交事务
+        :return: 引用成功的 Blob，不存在或已被清理时返回 None
+        """
+        result = await session.exec(update(cls).where(condition).values(ref_count=cls.ref_count + 1))
+        if commit:
+            await session.commit()
+        if result.rowcount == 0:
+            return None
+        return await cls.get(session, condition)
+
+    @classmethod
+    async def release_one(cls, session: AsyncSession, blob_id: int, *, commit: bool = True) -> None:
+        """
+        放弃一次由 :meth:`acquire` 取得、但没有交给文件记录的引用。
+
+        :param session: 数据库会话
+        :param blob_id: Blob ID
+        :param commit: 是否提交事务
+        """
+        await session.exec(update(cls).where(cls.id == blob_id).values(ref_count=cls.ref_count - 1))
+        if commit:
+            await session.commit()
+
+    @classmethod
+    def content_condition(cls, policy_id: int, sha256: str, size: int):
+        """同一存储策略下内容相同的筛选条件，可以直接利用唯一约束的索引"""
+        return (cls.policy_id == policy_id) & (cls.sha256 == sha256.lower()) & (cls.size == size)
+
+    @classmethod
+    async def release(cls, session: AsyncSession, file_condition, *, commit: bool = True) -> None:
+        """
+        满足条件的文件即将删除，按各 Blob 被引用的次数扣减引用计数，一条 UPDATE 完成。
+
+        只扣减计数，物理文件由清理任务删除。
+
+        :param session: 数据库会话
+        :param file_condition: File 的筛选条件
+        :param commit: 是否提交事务
+        """
+        from .file import File
+
+        refs = (
+            select(func.count(File.id))
+            .where(File.blob_id == cls.id, file_condition)
+            .correlate(cls)
+            .scalar_subquery()
+        )
+        await session.exec(
+            update(cls)
+            .where(cls.id.in_(select(File.blob_id).where(file_condition)))
+            .values(ref_count=cls.ref_count - refs)
+        )
+        if commit:
+            await session.commit()
+
+    @classmethod
+    async def purge(cls, session: AsyncSession, before: datetime) -> list[str]:
+        """
+        删除引用计数已降到 0 的 Blob 记录，一条 DELETE ... RETURNING 完成。
+
+        :param session: 数据库会话
+        :param before: 只删除最后一次变更早于该时间的记录
+        :return: 需要删除的物理文件位置
+        """
+        result = await session.exec(
+            delete(cls).where(cls.ref_count <= 0, cls.updated_at < before).returning(cls.source_name)
+        )
+        sources = list(result.scalars().all())
+        await session.commit()
+        return sources
@@ -1,33 +1,252 @@
-from sqlmodel import SQLModel
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import AsyncGenerator, ClassVar
+
+from loguru import logger as log
+from sqlalchemy import Select, event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+from sqlmodel import Session as SQLModelSession, SQLModel
 from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel.ext.asyncio.session import AsyncSession
 from pkg.conf import appmeta
-from sqlalchemy.orm import sessionmaker
-from typing import AsyncGenerator
+from sqlalchemy.orm import Session, sessionmaker
 
 ASYNC_DATABASE_URL = appmeta.database_url
 
-engine: AsyncEngine = create_async_engine(
-    ASYNC_DATABASE_URL,
-    echo=appmeta.debug,
-    connect_args={
-        "check_same_thread": False
-    } if ASYNC_DATABASE_URL.startswith("sqlite") else None,
-    future=True,
-    # pool_size=POOL_SIZE,
-    # max_overflow=64,
-)
+class PoolMetrics:
+    """连接池取连接的等待统计"""
+
+    checkouts: ClassVar[int] = 0
+    """取连接次数"""
+
+    timeouts: ClassVar[int] = 0
+    """等待超时次数"""
+
+    total_wait: ClassVar[float] = 0.0
+    """累计等待秒数"""
+
+    max_wait: ClassVar[float] = 0.0
+    """单次最长等待秒数"""
+
+    @classmethod
+    def record(cls, wait: float) -> None:
+        cls.checkouts += 1
+        cls.total_wait += wait
+        if wait > cls.max_wait:
+            cls.max_wait = wait
+
+    @classmethod
+    def snapshot(cls, target: AsyncEngine | None = None) -> dict[str, int | float | str]:
+        """
+        当前统计与连接池状态。
+
+        :param target: 要查看的引擎，默认为主库引擎
+        """
+        pool = (target or engine).pool
+        data: dict[str, int | float | str] = {
+            'checkouts': cls.checkouts,
+            'timeouts': cls.timeouts,
+            'avg_wait_ms': cls.total_wait / cls.checkouts * 1000 if cls.checkouts else 0.0,
+            'max_wait_ms': cls.max_wait * 1000,
+            'status': pool.status(),
+        }
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            data.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+            })
+        return data
+
+class _MeteredQueuePool(AsyncAdaptedQueuePool):
+    """记录取连接等待时间的连接池"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            PoolMetrics.timeouts += 1
+            raise
+        finally:
+            PoolMetrics.record(time.perf_counter() - start)
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _is_sqlite_memory(url: str) -> bool:
+    return _is_sqlite(url) and (":memory:" in url or url.rstrip("/").endswith(":"))
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """每个新建的 SQLite 连接都设置一遍 PRAGMA"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={appmeta.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={appmeta.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={appmeta.sqlite_busy_timeout}")
+    cursor.execute(f"PRAGMA mmap_size={appmeta.sqlite_mmap_size}")
+    cursor.close()
+
+def create_engine(url: str) -> AsyncEngine:
+    """
+    按 appmeta 中的连接池配置创建异步引擎。
+
+    SQLite 文件数据库额外在每个连接上设置 WAL / synchronous / busy_timeout / mmap 等 PRAGMA，
+    避免并发写入时频繁出现 "database is locked"；内存数据库使用单连接的 StaticPool。
+
+    :param url: 数据库连接地址
+    """
+    if _is_sqlite_memory(url):
+        return create_async_engine(
+            url,
+            echo=appmeta.debug,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+
+    new_engine = create_async_engine(
+        url,
+        echo=appmeta.debug,
+        connect_args={"check_same_thread": False} if _is_sqlite(url) else {},
+        poolclass=_MeteredQueuePool,
+        pool_size=appmeta.database_pool_size,
+        max_overflow=appmeta.database_max_overflow,
+        pool_timeout=appmeta.database_pool_timeout,
+        pool_recycle=appmeta.database_pool_recycle,
+        pool_pre_ping=appmeta.database_pool_pre_ping,
+    )
+    if _is_sqlite(url):
+        event.listen(new_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return new_engine
+
+engine: AsyncEngine = create_engine(ASYNC_DATABASE_URL)
+
+replica_engines: list[AsyncEngine] = [create_engine(url) for url in appmeta.database_replica_urls]
+
+current_user_id: ContextVar[int | None] = ContextVar('current_user_id', default=None)
+"""当前请求的用户ID，由鉴权依赖设置，用于读己之写的主库粘滞"""
+
+class ReplicaRouter:
+    """
+    只读副本路由：在健康的副本之间轮询，副本全部不可用时回退到主库。
+
+    用户在本进程内发生写入后的 `database_replica_sticky_seconds` 秒内，
+    其读请求固定走主库，避免复制延迟导致读不到自己刚写入的数据。
+    """
+
+    _replicas: ClassVar[list[AsyncEngine]] = replica_engines
+    """全部副本引擎"""
+
+    _healthy: ClassVar[list[AsyncEngine]] = list(replica_engines)
+    """当前健康的副本引擎"""
+
+    _cursor: ClassVar[int] = 0
+    """轮询游标"""
+
+    _sticky_until: ClassVar[dict[int, float]] = {}
+    """用户ID -> 读请求走主库的截止时间（monotonic）"""
+
+    @classmethod
+    def configure(cls, replicas: list[AsyncEngine]) -> None:
+        """替换副本列表，全部视为健康"""
+        cls._replicas = replicas
+        cls._healthy = list(replicas)
+        cls._cursor = 0
+
+    @classmethod
+    def pick(cls) -> AsyncEngine:
+        """轮询选出一个健康的副本，没有可用副本时返回主库"""
+        healthy = cls._healthy
+        if not healthy:
+            return engine
+        cls._cursor = (cls._cursor + 1) % len(healthy)
+        return healthy[cls._cursor]
+
+    @classmethod
+    def mark_write(cls, user_id: int) -> None:
+        """记录用户刚刚写入过"""
+        now = time.monotonic()
+        if len(cls._sticky_until) > 10000:
+            cls._sticky_until = {uid: until for uid, until in cls._sticky_until.items() if until > now}
+        cls._sticky_until[user_id] = now + appmeta.database_replica_sticky_seconds
+
+    @classmethod
+    def is_sticky(cls, user_id: int | None) -> bool:
+        """用户的读请求当前是否应该走主库"""
+        if user_id is None:
+            return False
+        until = cls._sticky_until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    @classmethod
+    async def _ping(cls, replica: AsyncEngine) -> bool:
+        try:
+            async with replica.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            return True
+        except Exception as e:
+            log.warning(f"只读副本 {replica.url.render_as_string()} 不可用: {e}")
+            return False
+
+    @classmethod
+    async def check_health(cls) -> None:
+        """并发检测全部副本，更新健康副本列表"""
+        results = await asyncio.gather(*(cls._ping(replica) for replica in cls._replicas))
+        cls._healthy = [replica for replica, is_ok in zip(cls._replicas, results) if is_ok]
+
+    @classmethod
+    async def run_health_checks(cls) -> None:
+        """后台任务：定期检测副本健康状态"""
+        if not cls._replicas:
+            return
+        while True:
+            await cls.check_health()
+            await asyncio.sleep(appmeta.database_replica_health_interval)
+
+class RoutingSession(SQLModelSession):
+    """
+    读写分离会话：写入（flush）和非 SELECT 语句走主库，SELECT 走只读副本。
+
+    同一会话内只选一次副本，保证一个请求内读到的数据来自同一节点。
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._replica: AsyncEngine | None = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or not isinstance(clause, Select) or ReplicaRouter.is_sticky(current_user_id.get()):
+            return engine.sync_engine
+        if self._replica is None:
+            self._replica = ReplicaRouter.pick()
+        return self._replica.sync_engine
+
+@event.listens_for(Session, "after_flush")
+def _mark_user_write(session: Session, flush_context) -> None:
+    """任何会话发生写入后，记录当前用户以启用主库粘滞"""
+    user_id = current_user_id.get()
+    if user_id is not None:
+        ReplicaRouter.mark_write(user_id)
 
 _async_session_factory = sessionmaker(engine, class_=AsyncSession)
 
+_async_read_session_factory = sessionmaker(engine, class_=AsyncSession, sync_session_class=RoutingSession)
+
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with _async_session_factory() as session:
         yield session
 
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    获取读写分离会话，适合以读取为主的接口。未配置副本时等同于 :func:`get_session` 。
+    """
+    async with _async_read_session_factory() as session:
+        yield session
+
 async def init_db(
     url: str = ASYNC_DATABASE_URL
 ):
     """创建数据库结构"""
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
-        
\ No newline at end of file
@@ -1,6 +1,9 @@
 
 from typing import TYPE_CHECKING
+from fastapi import HTTPException
+from sqlalchemy import and_
 from sqlmodel import Field, Relationship, UniqueConstraint, CheckConstraint, Index
+from sqlmodel.ext.asyncio.session import AsyncSession
 from .base import TableBase
 
 if TYPE_CHECKING:
@@ -16,6 +19,7 @@ class File(TableBase, table=True):
         Index("ix_file_user_updated", "user_id", "updated_at"),
         Index("ix_file_folder_updated", "folder_id", "updated_at"),
         Index("ix_file_user_size", "user_id", "size"),
+        Index("ix_file_updated", "updated_at"),
     )
 
     name: str = Field(max_length=255, description="文件名")
@@ -23,14 +27,101 @@ class File(TableBase, table=True):
     size: int = Field(default=0, sa_column_kwargs={"server_default": "0"}, description="文件大小（字节）")
     upload_session_id: str | None = Field(default=None, max_length=255, unique=True, index=True, description="分块上传会话ID")
     file_metadata: str | None = Field(default=None, description="文件元数据 (JSON格式)") # 后续可以考虑模型继承？
+    md5: str | None = Field(default=None, max_length=32, index=True, description="MD5 摘要（十六进制）")
+    sha1: str | None = Field(default=None, max_length=40, index=True, description="SHA1 摘要（十六进制）")
+    sha256: str | None = Field(default=None, max_length=64, index=True, description="SHA256 摘要（十六进制）")
+    crc32: str | None = Field(default=None, max_length=8, description="CRC32（十六进制），打包下载时直接写入 ZIP 文件头")
     
     # 外键
     user_id: int = Field(foreign_key="user.id", index=True, description="所属用户ID")
     folder_id: int = Field(foreign_key="folder.id", index=True, description="所在目录ID")
     policy_id: int = Field(foreign_key="policy.id", index=True, description="所属存储策略ID")
+    blob_id: int | None = Field(default=None, foreign_key="blob.id", index=True, description="物理文件（Blob）ID")
     
     # 关系
     user: "User" = Relationship(back_populates="files")
     folder: "Folder" = Relationship(back_populates="files")
     policy: "Policy" = Relationship(back_populates="files")
-    source_links: list["SourceLink"] = Relationship(back_populates="file")
\ No newline at end of file
+    source_links: list["SourceLink"] = Relationship(back_populates="file")
+
+    async def add_to(self, session: AsyncSession, folder: "Folder", capacity: int | None = None) -> "File":
+        """
+        把新文件写入目录，同一事务内更新该目录及全部祖先的汇总字段，并计入用户已用空间。
+
+        :param session: 数据库会话
+        :param folder: 所在目录
+        :param capacity: 用户的容量上限（字节），为 None 时不检查
+        :raises HTTPException: 同名文件已存在（409）或超出容量（413），事务由调用方回滚
+        """
+        from .folder import Folder
+        from .user import User
+
+        folder_path = await folder.awaitable_attrs.path
+        if await File.get(session, and_(File.folder_id == folder.id, File.name == self.name)):
+            raise HTTPException(status_code=409, detail="File already exists")
+
+        if not await User.adjust_storage(session, self.user_id, self.size, limit=capacity):
+            raise HTTPException(status_code=413, detail="Storage quota exceeded")
+
+        self.folder_id = folder.id
+        await Folder.adjust_rollups(
+            session, folder.owner_id, Folder.ancestor_paths(folder_path), size=self.size, files=1,
+        )
+        return await self.save(session)
+
+    async def remove(self, session: AsyncSession) -> None:
+        """
+        删除文件记录，同一事务内从所在目录及全部祖先的汇总、用户已用空间中扣除，并释放对 Blob 的引用。
+
+        只删除数据库记录，物理文件由调用方负责清理。
+
+        :param session: 数据库会话
+        """
+        from .blob import Blob
+        from .folder import Folder
+        from .user import User
+
+        folder = await Folder.get_exist_one(session, await self.awaitable_attrs.folder_id)
+        await Folder.adjust_rollups(
+            session, folder.owner_id, Folder.ancestor_paths(folder.path), size=-self.size, files=-1,
+        )
+        await User.adjust_storage(session, self.user_id, -self.size)
+        await Blob.release(session, File.id == self.id, commit=False)
+        await session.delete(self)
+        await session.commit()
+
+    async def move_to(self, session: AsyncSession, folder: "Folder", new_name: str | None = None) -> "File":
+        """
+        移动和/或重命名文件，汇总从只属于旧位置的祖先中扣除、加到只属于新位置的祖先上。
+
+        :param session: 数据库会话
+        :param folder: 目标目录
+        :param new_name: 新文件名，不重命名时传 None
+        :raises HTTPException: 名称非法（400）或目标目录中已有同名文件（409）
+        """
+        from .folder import Folder
+
+        old_folder = await Folder.get_exist_one(session, await self.awaitable_attrs.folder_id)
+        new_folder_path = await folder.awaitable_attrs.path
+        name = new_name if new_name is not None else self.name
+        if not name or '/' in name or '\\' in name:
+            raise HTTPException(status_code=400, detail="Invalid file name")
+        if folder.owner_id != old_folder.owner_id:
+            raise HTTPException(status_code=400, detail="Cannot move file to another user's folder")
+        if folder.id == old_folder.id and name == self.name:
+            return self
+        if await File.get(session, and_(File.folder_id == folder.id, File.name == name)):
+            raise HTTPException(status_code=409, detail="File already exists")
+
+        old_ancestors = set(Folder.ancestor_paths(old_folder.path))
+        new_ancestors = set(Folder.ancestor_paths(new_folder_path))
+        await Folder.adjust_rollups(
+            session, old_folder.owner_id, list(old_ancestors - new_ancestors), size=-self.size, files=-1,
+        )
+        await Folder.adjust_rollups(
+            session, folder.owner_id, list(new_ancestors - old_ancestors), size=self.size, files=1,
+        )
+
+        self.folder_id = folder.id
+        self.name = name
+        return await self.save(session)
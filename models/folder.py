@@ -1,6 +1,9 @@
-
+import re
 from typing import Optional, List, TYPE_CHECKING
-from sqlmodel import Field, Relationship, UniqueConstraint, CheckConstraint
+from fastapi import HTTPException
+from sqlalchemy import and_, bindparam, func, literal, select, update
+from sqlmodel import Field, Relationship, UniqueConstraint, CheckConstraint, Index
+from sqlmodel.ext.asyncio.session import AsyncSession
 from .base import TableBase
 from datetime import datetime
 
@@ -21,10 +24,27 @@ class Folder(TableBase, table=True):
             "name NOT LIKE '%/%' AND name NOT LIKE '%\\%'",
             name="ck_folder_name_no_slash",
         ),
+        Index("uq_folder_owner_path", "owner_id", "path", unique=True),
+        Index("ix_folder_parent_size", "parent_id", "size"),
     )
 
     name: str = Field(max_length=255, nullable=False, description="目录名")
     
+    path: str = Field(default="/", description="目录的完整路径，以 / 开头和结尾，根目录为 /")
+    """
+    物化路径，随创建、移动、重命名同步维护。
+
+    按路径定位目录、查询某目录的全部子孙都只需要一次 `(owner_id, path)` 索引查询。
+    """
+    
+    size: int = Field(default=0, sa_column_kwargs={"server_default": "0"}, description="子树内全部文件的总大小（字节）")
+    file_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"}, description="子树内的文件数量")
+    folder_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"}, description="子树内的目录数量（不含自身）")
+    """
+    以上三个汇总字段在文件/目录的增删移动时与其在同一事务内增量更新，读取目录属性无需遍历子树。
+    偶发的偏差由后台任务调用 :meth:`reconcile_rollups` 修复。
+    """
+    
     # 外键
     parent_id: int | None = Field(default=None, foreign_key="folder.id", index=True, description="父目录ID")
     owner_id: int = Field(foreign_key="user.id", index=True, description="所有者用户ID")
@@ -38,4 +58,394 @@ class Folder(TableBase, table=True):
     parent: Optional["Folder"] = Relationship(back_populates="children", sa_relationship_kwargs={"remote_side": "Folder.id"})
     children: List["Folder"] = Relationship(back_populates="parent")
 
-    files: List["File"] = Relationship(back_populates="folder")
\ No newline at end of file
+    files: List["File"] = Relationship(back_populates="folder")
+
+    @staticmethod
+    def normalize_path(path: str) -> str:
+        """
+        把用户传入的路径规范化为物化路径格式，如 `a//b/` -> `/a/b/` 。
+
+        :raises HTTPException: 路径中包含 `.` 、 `..` 或反斜杠时抛出 400
+        """
+        parts = [part for part in path.split('/') if part]
+        for part in parts:
+            if part in ('.', '..') or '\\' in part:
+                raise HTTPException(status_code=400, detail="Invalid path")
+        return '/' + ''.join(f'{part}/' for part in parts)
+
+    @staticmethod
+    def subtree_condition(path: str):
+        """
+        `path` 自身及其全部子孙目录的条件。
+
+        用 `[path, path 末尾的 / 换成 0)` 的范围条件走索引（`0` 是 `/` 的下一个字符），
+        再用前缀匹配兜底，防止非二进制排序规则下范围条件不准确。
+        """
+        return and_(
+            Folder.path >= path,
+            Folder.path < path[:-1] + '0',
+            Folder.path.startswith(path, autoescape=True),
+        )
+
+    @staticmethod
+    def ancestor_paths(path: str) -> list[str]:
+        """
+        `path` 自身及其全部祖先的路径，如 `/a/b/` -> `['/', '/a/', '/a/b/']` 。
+        """
+        paths = ['/']
+        for part in path.strip('/').split('/'):
+            if part:
+                paths.append(f'{paths[-1]}{part}/')
+        return paths
+
+    @staticmethod
+    def parent_path(path: str) -> str | None:
+        """父目录的路径，根目录返回 None"""
+        if path == '/':
+            return None
+        return path[:path.rstrip('/').rfind('/') + 1]
+
+    @classmethod
+    async def adjust_rollups(
+            cls,
+            session: AsyncSession,
+            owner_id: int,
+            paths: list[str],
+            *,
+            size: int = 0,
+            files: int = 0,
+            folders: int = 0,
+    ) -> None:
+        """
+        用一条 UPDATE 给一组目录（通常是某目录及其全部祖先）的汇总字段加上增量，不提交事务。
+
+        :param session: 数据库会话
+        :param owner_id: 所有者用户ID
+        :param paths: 目录路径列表
+        :param size: 大小增量（字节）
+        :param files: 文件数量增量
+        :param folders: 目录数量增量
+        """
+        values = {}
+        if size:
+            values['size'] = cls.size + size
+        if files:
+            values['file_count'] = cls.file_count + files
+        if folders:
+            values['folder_count'] = cls.folder_count + folders
+        if not values or not paths:
+            return
+
+        await cls.bulk_update(
+            session,
+            and_(cls.owner_id == owner_id, cls.path.in_(paths)),
+            values,
+            commit=False,
+        )
+
+    @classmethod
+    async def _rollup_corrections(cls, session: AsyncSession, owner_id: int) -> list[dict]:
+        """
+        从文件表重新计算某个用户全部目录的汇总字段，返回有偏差的目录及各字段的修正量。
+
+        两次查询（目录列表、按目录分组的文件统计），在内存中自底向上累加，
+        与目录数量成线性关系。
+        """
+        from .file import File
+
+        folders = (await session.exec(
+            select(cls.id, cls.path, cls.size, cls.file_count, cls.folder_count)
+            .where(cls.owner_id == owner_id)
+        )).all()
+        file_stats = (await session.exec(
+            select(File.folder_id, func.coalesce(func.sum(File.size), 0), func.count())
+            .where(File.user_id == owner_id)
+            .group_by(File.folder_id)
+        )).all()
+
+        totals: dict[str, list[int]] = {path: [0, 0, 0] for _, path, *_ in folders}
+        path_by_id = {id: path for id, path, *_ in folders}
+        for folder_id, size, count in file_stats:
+            path = path_by_id.get(folder_id)
+            if path is not None:
+                totals[path][0] += size
+                totals[path][1] += count
+
+        # 路径越长层级越深，按长度倒序累加可保证子目录先于父目录完成
+        for path in sorted(totals, key=len, reverse=True):
+            parent = cls.parent_path(path)
+            if parent in totals:
+                size, count, folder_count = totals[path]
+                totals[parent][0] += size
+                totals[parent][1] += count
+                totals[parent][2] += folder_count + 1
+
+        return [
+            {
+                'folder_id': id,
+                'size_delta': totals[path][0] - size,
+                'file_count_delta': totals[path][1] - file_count,
+                'folder_count_delta': totals[path][2] - folder_count,
+            }
+            for id, path, size, file_count, folder_count in folders
+            if [size, file_count, folder_count] != totals[path]
+        ]
+
+    @classmethod
+    async def _apply_rollup_corrections(cls, session: AsyncSession, corrections: list[dict]) -> None:
+        """
+        以增量形式写回修正量并提交。
+
+        读取与写回之间其他请求经 :meth:`adjust_rollups` 加上的增量会保留下来；
+        写回绝对值则会把它们覆盖掉，反而制造新的偏差。
+        """
+        if not corrections:
+            return
+        table = cls.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam('folder_id'))
+            .values(
+                size=table.c.size + bindparam('size_delta'),
+                file_count=table.c.file_count + bindparam('file_count_delta'),
+                folder_count=table.c.folder_count + bindparam('folder_count_delta'),
+            )
+        )
+        await session.exec(statement, params=corrections)
+        await session.commit()
+
+    @classmethod
+    async def reconcile_rollups(cls, session: AsyncSession, owner_id: int) -> int:
+        """
+        从文件表重新计算某个用户全部目录的汇总字段，只修正有偏差的目录。
+
+        :param session: 数据库会话
+        :param owner_id: 所有者用户ID
+        :return: 修复的目录数量
+        """
+        corrections = await cls._rollup_corrections(session, owner_id)
+        await cls._apply_rollup_corrections(session, corrections)
+        return len(corrections)
+
+    @classmethod
+    async def create_root(cls, session: AsyncSession, owner_id: int, policy_id: int | None = None) -> "Folder":
+        """
+        创建用户的根目录，根目录名称为空、路径为 `/` 。
+
+        :param session: 数据库会话
+        :param owner_id: 所有者用户ID
+        :param policy_id: 存储策略ID，不指定时使用用户组允许的第一个策略，用户组未限制时使用ID最小的策略
+        :raises RuntimeError: 没有任何存储策略
+        """
+        if policy_id is None:
+            policy_id = await cls._default_policy_id(session, owner_id)
+        root = cls(name='', path='/', owner_id=owner_id, policy_id=policy_id)
+        return await root.save(session)
+
+    @staticmethod
+    async def _default_policy_id(session: AsyncSession, owner_id: int) -> int:
+        from .group import Group
+        from .policy import Policy
+        from .user import User
+
+        policies = (await session.exec(
+            select(Group.policies).join(User, User.group_id == Group.id).where(User.id == owner_id)
+        )).scalar_one_or_none()
+        # 历史数据中既有 `1,2` 也有 `[1,2]` 的写法
+        allowed = [int(id) for id in re.findall(r'\d+', policies or '')]
+        statement = select(Policy.id).order_by(Policy.id).limit(1)
+        if allowed:
+            statement = statement.where(Policy.id.in_(allowed))
+        policy_id = (await session.exec(statement)).scalar_one_or_none()
+        if policy_id is None:
+            raise RuntimeError("没有可用的存储策略，无法创建根目录")
+        return policy_id
+
+    @classmethod
+    async def backfill_paths(cls, session: AsyncSession) -> int:
+        """
+        按 `parent_id` 与 `name` 重新计算全部目录的物化路径，只写回不一致的目录并提交。
+
+        用于升级在引入 `path` 字段之前创建的数据库，这些目录的 `path` 都是默认值 `/` 。
+        一次查询取出全部目录，在内存中自顶向下拼接路径，与目录数量成线性关系。
+
+        :param session: 数据库会话
+        :return: 修复的目录数量
+        :raises RuntimeError: `parent_id` 构成了环，无法确定路径
+        """
+        rows = (await session.exec(select(cls.id, cls.parent_id, cls.name, cls.path))).all()
+        parents = {id: (parent_id, name) for id, parent_id, name, _ in rows}
+        paths: dict[int, str] = {}
+
+        def path_of(folder_id: int) -> str:
+            # 沿父目录向上找到第一个已算出路径的祖先，再沿原路拼接回来
+            chain, visited, current = [], set(), folder_id
+            while current not in paths:
+                if current in visited:
+                    raise RuntimeError(f"目录 {current} 的父目录链构成了环，无法回填路径")
+                visited.add(current)
+                parent_id, _ = parents[current]
+                if parent_id is None or parent_id not in parents:
+                    paths[current] = '/'
+                else:
+                    chain.append(current)
+                    current = parent_id
+            for id in reversed(chain):
+                parent_id, name = parents[id]
+                paths[id] = f"{paths[parent_id]}{name}/"
+            return paths[folder_id]
+
+        repairs = []
+        for id, _, _, path in rows:
+            expected = path_of(id)
+            if expected != path:
+                repairs.append({'folder_id': id, 'new_path': expected})
+        if repairs:
+            table = cls.__table__
+            await session.exec(
+                update(table).where(table.c.id == bindparam('folder_id')).values(path=bindparam('new_path')),
+                params=repairs,
+            )
+            await session.commit()
+        return len(repairs)
+
+    @classmethod
+    async def resolve(cls, session: AsyncSession, owner_id: int, path: str, load=None) -> "Folder | None":
+        """
+        按路径定位目录，无论路径多深都只有一次索引查询。
+
+        :param session: 数据库会话
+        :param owner_id: 所有者用户ID
+        :param path: 目录路径，如 `/a/b/c`
+        :param load: 需要预加载的关系
+        :return: 目录，不存在时返回 None
+        """
+        return await cls.get(
+            session,
+            and_(cls.owner_id == owner_id, cls.path == cls.normalize_path(path)),
+            load=load,
+        )
+
+    async def get_descendants(self, session: AsyncSession, include_self: bool = False) -> list["Folder"]:
+        """
+        一次查询取得全部子孙目录，按路径排序（父目录总在子目录之前）。
+
+        :param session: 数据库会话
+        :param include_self: 结果是否包含自身
+        """
+        # 其他操作提交后实例会过期，通过 awaitable_attrs 在异步上下文中重新加载
+        path = await self.awaitable_attrs.path
+        condition = and_(Folder.owner_id == self.owner_id, Folder.subtree_condition(path))
+        if not include_self:
+            condition = and_(condition, Folder.id != self.id)
+        return await Folder.get(session, condition, fetch_mode="all", order_by=[Folder.path])
+
+    async def create_child(self, session: AsyncSession, name: str) -> "Folder":
+        """
+        在当前目录下创建子目录，继承当前目录的存储策略。
+
+        :param session: 数据库会话
+        :param name: 子目录名
+        :raises HTTPException: 名称非法（400）或同名目录已存在（409）
+        """
+        if not name or name in ('.', '..') or '/' in name or '\\' in name:
+            raise HTTPException(status_code=400, detail="Invalid folder name")
+
+        parent_path = await self.awaitable_attrs.path
+        path = f'{parent_path}{name}/'
+        if await Folder.get(session, and_(Folder.owner_id == self.owner_id, Folder.path == path)):
+            raise HTTPException(status_code=409, detail="Folder already exists")
+
+        await Folder.adjust_rollups(session, self.owner_id, Folder.ancestor_paths(parent_path), folders=1)
+
+        child = Folder(
+            name=name,
+            path=path,
+            parent_id=self.id,
+            owner_id=self.owner_id,
+            policy_id=self.policy_id,
+        )
+        return await child.save(session)
+
+    async def move(
+            self,
+            session: AsyncSession,
+            new_parent: "Folder | None" = None,
+            new_name: str | None = None,
+    ) -> "Folder":
+        """
+        移动和/或重命名目录，整棵子树的路径用一条 UPDATE 改写前缀，
+        子树汇总从只属于旧位置的祖先中扣除、加到只属于新位置的祖先上（共同祖先不变）。
+
+        :param session: 数据库会话
+        :param new_parent: 新的父目录，不移动时传 None
+        :param new_name: 新名称，不重命名时传 None
+        :raises HTTPException: 移动根目录、移动到自身或子孙目录下（400），目标已存在（409）
+        """
+        old_path = await self.awaitable_attrs.path
+        if self.parent_id is None:
+            raise HTTPException(status_code=400, detail="Cannot move root folder")
+
+        parent = new_parent or await Folder.get_exist_one(session, self.parent_id)
+        parent_path = await parent.awaitable_attrs.path
+        name = new_name if new_name is not None else self.name
+        if not name or name in ('.', '..') or '/' in name or '\\' in name:
+            raise HTTPException(status_code=400, detail="Invalid folder name")
+        if parent.owner_id != self.owner_id or parent_path.startswith(old_path):
+            raise HTTPException(status_code=400, detail="Cannot move folder into itself")
+
+        new_path = f'{parent_path}{name}/'
+        if new_path == old_path:
+            return self
+        if await Folder.get(session, and_(Folder.owner_id == self.owner_id, Folder.path == new_path)):
+            raise HTTPException(status_code=409, detail="Folder already exists")
+
+        old_ancestors = set(Folder.ancestor_paths(Folder.parent_path(old_path)))
+        new_ancestors = set(Folder.ancestor_paths(parent_path))
+        subtree_totals = {'size': self.size, 'files': self.file_count, 'folders': self.folder_count + 1}
+        await Folder.adjust_rollups(
+            session, self.owner_id, list(old_ancestors - new_ancestors),
+            **{key: -value for key, value in subtree_totals.items()},
+        )
+        await Folder.adjust_rollups(session, self.owner_id, list(new_ancestors - old_ancestors), **subtree_totals)
+
+        await Folder.bulk_update(
+            session,
+            and_(Folder.owner_id == self.owner_id, Folder.subtree_condition(old_path)),
+            {'path': literal(new_path) + func.substr(Folder.path, len(old_path) + 1)},
+            commit=False,
+        )
+
+        self.parent_id = parent.id
+        self.name = name
+        self.path = new_path
+        return await self.save(session)
+
+    async def delete_tree(self, session: AsyncSession) -> int:
+        """
+        删除目录及其全部子孙目录与其中的文件，各用一条 DELETE 完成，
+        并从祖先目录的汇总与用户已用空间中扣除（扣除量直接取自身的汇总字段），释放文件对 Blob 的引用。
+
+        只删除数据库记录，物理文件由调用方负责清理。
+
+        :param session: 数据库会话
+        :return: 删除的目录数量
+        """
+        from .blob import Blob
+        from .file import File
+        from .user import User
+
+        path = await self.awaitable_attrs.path
+        parent_path = Folder.parent_path(path)
+        if parent_path is not None:
+            await Folder.adjust_rollups(
+                session, self.owner_id, Folder.ancestor_paths(parent_path),
+                size=-self.size, files=-self.file_count, folders=-(self.folder_count + 1),
+            )
+        await User.adjust_storage(session, self.owner_id, -self.size)
+
+        subtree = and_(Folder.owner_id == self.owner_id, Folder.subtree_condition(path))
+        files = File.folder_id.in_(select(Folder.id).where(subtree))
+        await Blob.release(session, files, commit=False)
+        await File.bulk_delete(session, files, commit=False)
+        return await Folder.bulk_delete(session, subtree)
@@ -1,7 +1,7 @@
 
 from typing import Optional, List, TYPE_CHECKING
 from sqlmodel import Field, Relationship, text, Column, JSON
-from .base import TableBase
+from .base import TableBase, SQLModelBase
 from sqlmodel import SQLModel
 
 if TYPE_CHECKING:
@@ -41,4 +41,32 @@ class Group(TableBase, table=True):
     previous_user: List["User"] = Relationship(
         back_populates="previous_group",
         sa_relationship_kwargs={"foreign_keys": "User.previous_group_id"}
-    )
\ No newline at end of file
+    )
+
+class GroupUpdateRequest(SQLModelBase):
+    """管理员更新用户组 DTO，只更新显式传入的字段"""
+
+    name: str | None = Field(default=None, max_length=255)
+    """用户组名"""
+
+    policies: str | None = Field(default=None, max_length=255)
+    """允许的策略ID列表，逗号分隔"""
+
+    max_storage: int | None = Field(default=None, ge=0)
+    """最大存储空间（字节）"""
+
+    share_enabled: bool | None = None
+    """是否允许创建分享"""
+
+    web_dav_enabled: bool | None = None
+    """是否允许使用WebDAV"""
+
+    admin: bool | None = None
+    """是否为管理员组"""
+
+    speed_limit: int | None = Field(default=None, ge=0)
+    """速度限制 (KB/s), 0为不限制"""
+
+    options: GroupOptions | None = None
+    """其他选项"""
+
@@ -16,7 +16,10 @@ async def migration() -> None:
     
     await init_default_settings()
     await init_default_group()
+    await init_default_policy()
     await init_default_user()
+    await init_folder_tree()
+    await init_task_table()
     
     log.info('数据库初始化结束')
 
@@ -51,6 +54,8 @@ default_settings: list[Setting] = [
     Setting(name="onedrive_chunk_retries", value="1", type="retry"),
     Setting(name="onedrive_source_timeout", value="1800", type="timeout"),
     Setting(name="reset_after_upload_failed", value="0", type="upload"),
+    Setting(name="upload_gc_interval", value="3600", type="upload"),
+    Setting(name="speed_limit_per_user", value="0", type="basic"),
     Setting(name="login_captcha", value="0", type="login"),
     Setting(name="reg_captcha", value="0", type="login"),
     Setting(name="email_active", value="0", type="register"),
@@ -81,6 +86,7 @@ Neue',Helvetica,Arial,sans-serif; box-sizing: border-box; font-size: 14px; verti
     Setting(name="aria2_interval", value="60", type="aria2"),
     Setting(name="max_worker_num", value="10", type="task"),
     Setting(name="max_parallel_transfer", value="4", type="task"),
+    Setting(name="folder_rollup_interval", value="3600", type="task"),
     Setting(name="secret_key", value=Password.generate(256), type="auth"),
     Setting(name="temp_path", value="temp", type="path"),
     Setting(name="avatar_path", value="avatar", type="path"),
@@ -108,6 +114,9 @@ Neue',Helvetica,Arial,sans-serif; box-sizing: border-box; font-size: 14px; verti
     Setting(name="captcha_ReCaptchaSecret", value="defaultSecret", type="captcha"),
     Setting(name="thumb_width", value="400", type="thumb"),
     Setting(name="thumb_height", value="300", type="thumb"),
+    Setting(name="thumb_encode_quality", value="85", type="thumb"),
+    Setting(name="thumb_max_task_count", value="0", type="thumb"),
+    Setting(name="thumb_cache_max_size", value="1073741824", type="thumb"),
     Setting(name="pwa_small_icon", value="/static/img/favicon.ico", type="pwa"),
     Setting(name="pwa_medium_icon", value="/static/img/logo192.png", type="pwa"),
     Setting(name="pwa_large_icon", value="/static/img/logo512.png", type="pwa"),
@@ -133,7 +142,7 @@ async def init_default_settings() -> None:
             return
 
         # 批量添加默认设置
-        await Setting.add(session, default_settings)
+        await Setting.bulk_add(session, default_settings, returning=False)
 
 async def init_default_group() -> None:
     from .group import Group, GroupOptions
@@ -213,4 +222,120 @@ async def init_default_user() -> None:
             await admin_user.save(session)
 
             log.info(f'初始管理员账号：[bold]admin[/bold]')
-            log.info(f'初始管理员密码：[bold]{admin_password}[/bold]')
\ No newline at end of file
+            log.info(f'初始管理员密码：[bold]{admin_password}[/bold]')
+
+
+async def init_default_policy() -> None:
+    from .policy import Policy
+    from .database import get_session
+
+    log.info('初始化存储策略...')
+
+    async for session in get_session():
+        # 没有任何存储策略时创建默认的本地策略，用户的根目录需要归属一个策略
+        if not await Policy.get(session, None):
+            await Policy(name="默认存储策略", type="local", server="uploads").save(session)
+
+
+_FOLDER_UPGRADE_COLUMNS = ('path', 'size', 'file_count', 'folder_count')
+"""引入物化路径与目录汇总时新增的 folder 列"""
+
+
+def _add_folder_columns(connection) -> list[str]:
+    """
+    给旧数据库的 folder 表补上新增的列。`create_all` 只创建缺失的表，不会修改已存在的表。
+
+    :return: 补上的列名
+    """
+    from sqlalchemy import inspect, text
+    from .folder import Folder
+
+    existing = {column['name'] for column in inspect(connection).get_columns('folder')}
+    added = []
+    for name in _FOLDER_UPGRADE_COLUMNS:
+        if name in existing:
+            continue
+        column = Folder.__table__.c[name]
+        column_type = column.type.compile(dialect=connection.dialect)
+        default = "'/'" if name == 'path' else "0"
+        connection.execute(text(f"ALTER TABLE folder ADD COLUMN {name} {column_type} NOT NULL DEFAULT {default}"))
+        added.append(name)
+    return added
+
+
+def _create_folder_indexes(connection) -> None:
+    """补建 folder 表的索引，唯一的 `(owner_id, path)` 索引必须在路径回填之后创建"""
+    from .folder import Folder
+
+    for index in Folder.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+async def init_folder_tree() -> None:
+    from sqlalchemy import select
+    from .database import engine, get_session
+    from .folder import Folder
+    from .user import User
+
+    log.info('检查目录结构...')
+
+    async with engine.begin() as conn:
+        added = await conn.run_sync(_add_folder_columns)
+    if added:
+        log.warning(f"folder 表已补充字段: {', '.join(added)}")
+
+    async for session in get_session():
+        # 非根目录的路径不可能是 `/`，存在这样的目录说明数据库来自引入物化路径之前
+        stale = await Folder.get(session, (Folder.parent_id != None) & (Folder.path == '/'), limit=1)
+        if stale is not None:
+            repaired = await Folder.backfill_paths(session)
+            log.warning(f"已回填 {repaired} 个目录的路径")
+        if stale is not None or {'size', 'file_count', 'folder_count'} & set(added):
+            owner_ids = (await session.exec(select(Folder.owner_id).distinct())).scalars().all()
+            for owner_id in owner_ids:
+                await Folder.reconcile_rollups(session, owner_id)
+
+        # 为还没有根目录的用户创建根目录
+        roots = select(Folder.owner_id).where(Folder.parent_id == None)
+        user_ids = (await session.exec(select(User.id).where(User.id.not_in(roots)))).scalars().all()
+        for user_id in user_ids:
+            await Folder.create_root(session, user_id)
+        if user_ids:
+            log.info(f"已为 {len(user_ids)} 个用户创建根目录")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(_create_folder_indexes)
+
+
+_TASK_UPGRADE_COLUMNS = {
+    'heartbeat': "DATETIME",
+    'cancel_requested': "BOOLEAN NOT NULL DEFAULT 0",
+}
+"""引入任务心跳时新增的 task 列及其定义"""
+
+
+def _add_task_columns(connection) -> list[str]:
+    """
+    给旧数据库的 task 表补上心跳相关的列，与 :func:`_add_folder_columns` 相同。
+
+    :return: 补上的列名
+    """
+    from sqlalchemy import inspect, text
+
+    existing = {column['name'] for column in inspect(connection).get_columns('task')}
+    added = []
+    for name, definition in _TASK_UPGRADE_COLUMNS.items():
+        if name in existing:
+            continue
+        connection.execute(text(f"ALTER TABLE task ADD COLUMN {name} {definition}"))
+        added.append(name)
+    return added
+
+
+async def init_task_table() -> None:
+    from .database import engine
+
+    async with engine.begin() as conn:
+        added = await conn.run_sync(_add_task_columns)
+    if added:
+        log.warning(f"task 表已补充字段: {', '.join(added)}")
@@ -7,6 +7,8 @@ from typing import Literal, Union, Optional
 from datetime import datetime, timezone
 from uuid import uuid4
 
+from .setting import SettingsType
+
 class LoginRequest(BaseModel):
     """
     登录请求模型
@@ -14,4 +16,64 @@ class LoginRequest(BaseModel):
     username: str = Field(..., description="用户名或邮箱")
     password: str = Field(..., description="用户密码")
     captcha: str | None = Field(None, description="验证码")
-    twoFaCode: str | None = Field(None, description="两步验证代码")
\ No newline at end of file
+    twoFaCode: str | None = Field(None, description="两步验证代码")
+
+class SettingItemRequest(BaseModel):
+    """
+    单个设置项修改请求
+    """
+    type: SettingsType = Field(..., description="设置类型/分组")
+    name: str = Field(..., max_length=255, description="设置项名称")
+    value: str | None = Field(None, description="设置值")
+
+class SettingsUpdateRequest(BaseModel):
+    """
+    批量修改设置请求模型
+    """
+    settings: list[SettingItemRequest] = Field(..., min_length=1, description="要修改的设置项列表")
+
+class DirectoryCreateRequest(BaseModel):
+    """
+    创建目录请求模型
+    """
+    path: str = Field(..., min_length=1, description="要创建的目录的完整路径，父目录必须已存在")
+
+class UploadSessionRequest(BaseModel):
+    """
+    创建上传会话请求模型
+    """
+    path: str = Field(..., description="目标目录路径")
+    name: str = Field(..., min_length=1, max_length=255, description="文件名")
+    size: int = Field(..., ge=0, description="文件大小（字节）")
+    sha256: str | None = Field(default=None, pattern=r'^[0-9a-fA-F]{64}$', description="文件 SHA256，服务端已有相同内容时秒传")
+
+class ArchiveRequest(BaseModel):
+    """
+    打包下载请求模型
+    """
+    files: list[int] = Field(default_factory=list, description="要打包的文件ID")
+    folders: list[int] = Field(default_factory=list, description="要打包的目录ID")
+    compress: bool = Field(default=True, description="是否压缩；已经压缩过的类型（图片、视频、压缩包等）总是直接存储")
+
+class ThumbBatchRequest(BaseModel):
+    """
+    批量获取缩略图请求模型
+    """
+    ids: list[int] = Field(..., min_length=1, max_length=200, description="文件ID，一次最多 200 个")
+
+class CompressRequest(BaseModel):
+    """
+    创建压缩任务请求模型
+    """
+    files: list[int] = Field(default_factory=list, description="要压缩的文件ID")
+    folders: list[int] = Field(default_factory=list, description="要压缩的目录ID")
+    path: str = Field(..., description="压缩包保存到的目录路径")
+    name: str = Field(..., min_length=1, max_length=255, pattern=r'^[^/\\]+$', description="压缩包文件名")
+    compress: bool = Field(default=True, description="是否压缩；为 false 时只打包")
+
+class DecompressRequest(BaseModel):
+    """
+    创建解压任务请求模型
+    """
+    id: int = Field(..., description="压缩包文件ID（ZIP）")
+    path: str = Field(..., description="解压到的目录路径")
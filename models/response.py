@@ -134,4 +134,17 @@ class DirectoryModel(BaseModel):
     '''
     parent: str = Field(default=..., description="父目录ID")
     objects: list[ObjectModel] = Field(default_factory=list, description="目录下的对象列表")
-    policy: PolicyModel = Field(default_factory=PolicyModel, description="存储策略")
\ No newline at end of file
+    policy: PolicyModel = Field(default_factory=PolicyModel, description="存储策略")
+
+
+class ObjectPropertyModel(BaseModel):
+    '''
+    对象属性模型
+    '''
+    created_at: datetime = Field(default=..., description="创建时间")
+    updated_at: datetime = Field(default=..., description="修改时间")
+    policy: str = Field(default=..., description="存储策略名称")
+    size: int = Field(default=0, description="大小，目录为其下全部文件的总大小，单位字节")
+    child_folder_num: int = Field(default=0, description="子孙目录数量，文件为0")
+    child_file_num: int = Field(default=0, description="子孙文件数量，文件为0")
+    path: str = Field(default=..., description="对象所在目录的路径")
@@ -1,6 +1,15 @@
+import asyncio
+import json
+from collections.abc import Callable
+from enum import StrEnum
+from typing import ClassVar
+
+from loguru import logger as log
+from sqlalchemy import and_, or_
 from sqlmodel import Field, UniqueConstraint
+from sqlmodel.ext.asyncio.session import AsyncSession
+
 from .base import TableBase
-from enum import StrEnum
 
 class SettingsType(StrEnum):
     """设置类型枚举"""
@@ -40,4 +49,185 @@ class Setting(TableBase, table=True):
 
     type: SettingsType = Field(max_length=255, description="设置类型/分组")
     name: str = Field(max_length=255, description="设置项名称")
-    value: str | None = Field(default=None, description="设置值")
\ No newline at end of file
+    value: str | None = Field(default=None, description="设置值")
+
+    @classmethod
+    async def upsert(
+            cls,
+            session: AsyncSession,
+            values: dict[tuple[SettingsType, str], str | None],
+    ) -> int:
+        """
+        批量写入设置值，不存在的设置项会被新建，全部修改在一次提交中完成。
+
+        写入后不会自动刷新 :class:`SettingsCache`，调用方需要自行 `reload`。
+
+        :param session: 数据库会话
+        :param values: `{(设置类型, 设置项名称): 设置值}`
+        :return: 写入的设置项数量
+        """
+        existing: list[Setting] = await cls.get(
+            session,
+            or_(*[
+                and_(cls.type == type_, cls.name == name)
+                for type_, name in values
+            ]),
+            fetch_mode="all",
+        )
+        existing_map = {(setting.type, setting.name): setting for setting in existing}
+
+        changed: list[Setting] = []
+        for (type_, name), value in values.items():
+            setting = existing_map.get((type_, name))
+            if setting is None:
+                setting = cls(type=type_, name=name, value=value)
+            else:
+                setting.value = value
+            changed.append(setting)
+
+        await cls.add(session, changed, refresh=False)
+        return len(changed)
+
+
+class SettingsCache:
+    """
+    进程内设置缓存。
+
+    启动时一次性读取 `Setting` 表的全部行，此后按 `(SettingsType, name)` 的查询都直接命中内存，
+    布尔值和 JSON 值在加载时就解析好。管理员修改设置后调用 :meth:`reload` 重新加载，
+    稳定状态下读取设置不会访问数据库。
+
+    注意：缓存只在当前进程内有效，多进程部署时其他 worker 需要各自重新加载。
+    """
+
+    _values: ClassVar[dict[tuple[SettingsType, str], str | None]] = {}
+    """原始字符串值"""
+
+    _json_values: ClassVar[dict[tuple[SettingsType, str], dict | list]] = {}
+    """预解析的 JSON 值"""
+
+    _version: ClassVar[int] = 0
+    """缓存版本号，每次重新加载后自增"""
+
+    _is_loaded: ClassVar[bool] = False
+    """是否已经加载过"""
+
+    _lock: ClassVar[asyncio.Lock] = asyncio.Lock()
+    """防止并发重复加载"""
+
+    _listeners: ClassVar[list[Callable[[], None]]] = []
+    """每次加载完成后调用的回调，用于重建依赖设置的派生状态"""
+
+    @classmethod
+    async def load(cls, session: AsyncSession) -> None:
+        """
+        从数据库读取全部设置并替换当前缓存。
+
+        :param session: 数据库会话
+        """
+        settings: list[Setting] = await Setting.get(session, None, fetch_mode="all")
+
+        values: dict[tuple[SettingsType, str], str | None] = {}
+        json_values: dict[tuple[SettingsType, str], dict | list] = {}
+        for setting in settings:
+            # StrEnum 与 str 的哈希一致，直接用原始值作键即可
+            key = (setting.type, setting.name)
+            values[key] = setting.value
+            if setting.value and setting.value[:1] in ('{', '['):
+                try:
+                    json_values[key] = json.loads(setting.value)
+                except ValueError:
+                    log.warning(f"设置项 {setting.type}.{setting.name} 不是合法的 JSON")
+
+        # 整体替换而非原地修改，读取方不会看到加载了一半的状态
+        cls._values = values
+        cls._json_values = json_values
+        cls._version += 1
+        cls._is_loaded = True
+        log.debug(f"设置缓存已加载 {len(values)} 项，版本 {cls._version}")
+
+        for listener in cls._listeners:
+            listener()
+
+    @classmethod
+    def add_listener(cls, listener: Callable[[], None]) -> None:
+        """
+        注册设置重新加载后的回调。
+
+        :param listener: 同步回调，在缓存替换完成后调用
+        """
+        cls._listeners.append(listener)
+
+    @classmethod
+    async def load_from_database(cls) -> None:
+        """
+        启动项：打开一个新的数据库会话加载设置缓存。
+        """
+        from .database import get_session
+
+        async for session in get_session():
+            await cls.load(session)
+            break
+
+    @classmethod
+    async def ensure_loaded(cls, session: AsyncSession) -> None:
+        """
+        若缓存尚未加载则立即加载，已加载时不访问数据库。
+
+        :param session: 数据库会话
+        """
+        if cls._is_loaded:
+            return
+        async with cls._lock:
+            if not cls._is_loaded:
+                await cls.load(session)
+
+    @classmethod
+    async def reload(cls, session: AsyncSession) -> None:
+        """
+        设置被修改后使缓存失效并重新加载。
+
+        :param session: 数据库会话
+        """
+        async with cls._lock:
+            await cls.load(session)
+
+    @classmethod
+    def version(cls) -> int:
+        """当前缓存版本号，可用于判断依赖设置的派生数据是否需要重建"""
+        return cls._version
+
+    @classmethod
+    def get(cls, type_: SettingsType, name: str, default: str | None = None) -> str | None:
+        """
+        获取设置的原始字符串值。
+
+        :param type_: 设置类型
+        :param name: 设置项名称
+        :param default: 设置不存在（或值为 NULL）时的默认值
+        """
+        value = cls._values.get((type_, name))
+        return default if value is None else value
+
+    @classmethod
+    def get_bool(cls, type_: SettingsType, name: str) -> bool:
+        """获取布尔类型设置值，`"1"` 为真，其余（包括不存在）为假"""
+        return cls._values.get((type_, name)) == "1"
+
+    @classmethod
+    def get_int(cls, type_: SettingsType, name: str, default: int = 0) -> int:
+        """获取整数类型设置值，不存在或无法解析时返回默认值"""
+        value = cls._values.get((type_, name))
+        try:
+            return int(value) if value else default
+        except ValueError:
+            return default
+
+    @classmethod
+    def get_json(cls, type_: SettingsType, name: str) -> dict | list | None:
+        """
+        获取 JSON 类型设置值。
+
+        返回的对象在所有调用方之间共享，不要原地修改。
+        """
+        return cls._json_values.get((type_, name))
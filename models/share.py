@@ -17,6 +17,7 @@ class Share(TableBase, table=True):
         CheckConstraint("(file_id IS NOT NULL) <> (folder_id IS NOT NULL)", name="ck_share_xor"),
         Index("ix_share_source_name", "source_name"),
         Index("ix_share_user_created", "user_id", "created_at"),
+        Index("ix_share_created", "created_at"),
     )
 
     code: str = Field(max_length=64, nullable=False, index=True, description="分享码")
@@ -1,6 +1,7 @@
 
+from enum import IntEnum
 from typing import Optional, TYPE_CHECKING
-from sqlmodel import Field, Relationship, CheckConstraint
+from sqlmodel import Field, Relationship, CheckConstraint, Index
 from .base import TableBase
 from datetime import datetime
 
@@ -8,11 +9,30 @@ if TYPE_CHECKING:
     from .user import User
     from .download import Download
 
+class TaskStatus(IntEnum):
+    """任务状态枚举"""
+
+    QUEUED = 0
+    PROCESSING = 1
+    COMPLETE = 2
+    ERROR = 3
+
+class TaskType(IntEnum):
+    """任务类型枚举"""
+
+    COMPRESS = 0
+    DECOMPRESS = 1
+    TRANSFER = 2
+    IMPORT = 3
+    RECYCLE = 4
+
 class Task(TableBase, table=True):
     """任务模型"""
 
     __table_args__ = (
         CheckConstraint("progress BETWEEN 0 AND 100", name="ck_task_progress_range"),
+        Index("ix_task_user_created", "user_id", "created_at"),
+        Index("ix_task_created", "created_at"),
     )
 
     status: int = Field(default=0, sa_column_kwargs={"server_default": "0"}, description="任务状态: 0=排队中, 1=处理中, 2=完成, 3=错误")
@@ -20,6 +40,8 @@ class Task(TableBase, table=True):
     progress: int = Field(default=0, sa_column_kwargs={"server_default": "0"}, description="任务进度 (0-100)")
     error: str | None = Field(default=None, description="错误信息")
     props: str | None = Field(default=None, description="任务属性 (JSON格式)")
+    heartbeat: datetime | None = Field(default_factory=datetime.now, description="执行任务的进程最近一次确认任务存活的时间")
+    cancel_requested: bool = Field(default=False, sa_column_kwargs={"server_default": "0"}, description="是否已请求取消，由执行任务的进程在下一次心跳时处理")
     
     # 外键
     user_id: int = Field(foreign_key="user.id", index=True, description="所属用户ID")
@@ -0,0 +1,23 @@
+from datetime import datetime
+from sqlmodel import Field
+from .base import UUIDTableBase
+
+class UploadSession(UUIDTableBase, table=True):
+    """分块上传会话模型"""
+
+    name: str = Field(max_length=255, description="上传完成后的文件名")
+    size: int = Field(ge=0, description="文件总大小（字节）")
+    chunk_size: int = Field(gt=0, description="分块大小（字节），最后一块可以更小")
+    chunk_count: int = Field(ge=1, description="分块数量")
+    expires: datetime = Field(index=True, description="会话过期时间")
+    
+    # 外键
+    user_id: int = Field(foreign_key="user.id", index=True, description="所属用户ID")
+    folder_id: int = Field(foreign_key="folder.id", description="目标目录ID")
+    policy_id: int = Field(foreign_key="policy.id", description="存储策略ID")
+
+    def expected_chunk_size(self, index: int) -> int:
+        """第 `index` 块应有的字节数"""
+        if index == self.chunk_count - 1:
+            return self.size - self.chunk_size * (self.chunk_count - 1)
+        return self.chunk_size
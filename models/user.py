@@ -1,7 +1,9 @@
 from datetime import datetime
 from typing import Optional, TYPE_CHECKING
 
-from sqlmodel import Field, Relationship
+from sqlalchemy import case
+from sqlmodel import Field, Index, Relationship
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
 
 from .base import TableBase, SQLModelBase
@@ -51,6 +53,10 @@ class WebAuthnInfo(BaseModel):
 class User(TableBase, table=True):
     """用户模型"""
 
+    __table_args__ = (
+        Index("ix_user_created", "created_at"),
+    )
+
     username: str = Field(max_length=50, unique=True, index=True)
     """用户名，唯一，一经注册不可更改"""
     
@@ -130,6 +136,39 @@ class User(TableBase, table=True):
         """转换为公开 DTO，排除敏感字段"""
         return UserPublic.model_validate(self)
 
+    @classmethod
+    async def adjust_storage(
+            cls,
+            session: AsyncSession,
+            user_id: int,
+            delta: int,
+            limit: int | None = None,
+    ) -> bool:
+        """
+        原子地增减已用存储空间（`storage = storage + delta`），不提交事务。
+
+        增加时若给出 `limit`，只有增加后不超过 `limit` 才会生效，检查与写入在同一条 UPDATE 中完成，
+        并发上传也不会超额；减少时最小减到 0。
+
+        :param session: 数据库会话
+        :param user_id: 用户ID
+        :param delta: 增量（字节），可以为负
+        :param limit: 容量上限（字节），为 None 时不检查
+        :return: 是否生效（超出容量时返回 False）
+        """
+        if delta == 0:
+            return True
+
+        condition = cls.id == user_id
+        if delta > 0:
+            value = cls.storage + delta
+            if limit is not None:
+                condition = condition & (cls.storage + delta <= limit)
+        else:
+            value = case((cls.storage + delta > 0, cls.storage + delta), else_=0)
+
+        return await cls.bulk_update(session, condition, {'storage': value}, commit=False) == 1
+
 
 class UserPublic(SQLModelBase):
     """用户公开信息 DTO，用于 API 响应"""
@@ -166,4 +205,26 @@ class UserPublic(SQLModelBase):
 
     updated_at: datetime | None = None
     """更新时间"""
-    
\ No newline at end of file
+
+
+class UserUpdateRequest(SQLModelBase):
+    """管理员更新用户信息 DTO，只更新显式传入的字段"""
+
+    nick: str | None = Field(default=None, max_length=50)
+    """昵称"""
+
+    status: bool | None = None
+    """用户状态: True=正常, False=封禁"""
+
+    avatar: str | None = Field(default=None, max_length=255)
+    """头像地址"""
+
+    score: int | None = Field(default=None, ge=0)
+    """用户积分"""
+
+    group_id: int | None = None
+    """所属用户组ID"""
+
+    group_expires: datetime | None = None
+    """用户组过期时间"""
+
@@ -1,8 +1,15 @@
+import binascii
+import hashlib
+import hmac
+import json
+import time
+
 from fastapi.security import OAuth2PasswordBearer
-from models.setting import Setting
+from loguru import logger as log
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models.setting import Setting, SettingsCache, SettingsType
 from models.database import get_session
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import and_
 import jwt
 
 oauth2_scheme = OAuth2PasswordBearer(
@@ -11,22 +18,228 @@ oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="/api/user/session",
     )
 
-SECRET_KEY = ''
+class UnknownKeyIdError(jwt.InvalidTokenError):
+    """令牌头中的 kid 不在当前密钥环中"""
+
+_URLSAFE_TO_STD = str.maketrans('-_', '+/')
+_STD_TO_URLSAFE = bytes.maketrans(b'+/', b'-_')
+_json_decoder = json.JSONDecoder()
+
+def _b64decode(data: str) -> bytes:
+    """解码 JWT 使用的无填充 base64url"""
+    return binascii.a2b_base64((data + '=' * (-len(data) % 4)).translate(_URLSAFE_TO_STD), strict_mode=True)
+
+def _b64encode(data: bytes) -> bytes:
+    """编码为无填充 base64url"""
+    return binascii.b2a_base64(data, newline=False).translate(_STD_TO_URLSAFE).rstrip(b'=')
+
+class JWTKeyring:
+    """
+    按 `kid` 管理 HS256 密钥的令牌签发/校验器。
+
+    - 签发时总是使用当前密钥，并在令牌头中写入 `kid`；
+    - 校验时按 `kid` 选择密钥，轮换期间旧密钥仍可校验，无需重启或让用户重新登录；
+    - 每个密钥预先构造好 HMAC 对象，校验时只 `copy()` 后计算摘要，
+      不经过 PyJWT 的选项解析与算法查找。
+    """
+
+    def __init__(self) -> None:
+        self._secrets: dict[str, str] = {}
+        """kid -> 原始密钥"""
+
+        self._macs: dict[str, hmac.HMAC] = {}
+        """kid -> 预先构造好的 HMAC-SHA256 对象"""
+
+        self._active_kid: str | None = None
+        """当前用于签发的 kid"""
+
+        self._header_kids: dict[str, str | None] = {}
+        """已校验通过的令牌头段 -> kid，同一密钥签发的令牌头完全相同，可跳过解码"""
+
+    @staticmethod
+    def make_kid(secret: str) -> str:
+        """由密钥派生 kid，不泄露密钥本身"""
+        return hashlib.sha256(secret.encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def active_kid(self) -> str | None:
+        """当前用于签发的 kid"""
+        return self._active_kid
+
+    def load(self, active_secret: str, previous_secrets: list[str] | None = None) -> None:
+        """
+        替换密钥环。
+
+        :param active_secret: 当前用于签发的密钥
+        :param previous_secrets: 仍然接受校验的旧密钥
+        """
+        secrets: dict[str, str] = {}
+        for secret in [active_secret, *(previous_secrets or [])]:
+            if secret:
+                secrets[self.make_kid(secret)] = secret
+
+        self._macs = {
+            kid: hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256)
+            for kid, secret in secrets.items()
+        }
+        self._secrets = secrets
+        self._active_kid = self.make_kid(active_secret) if active_secret else None
+        self._header_kids = {}
+
+    def load_from_settings(self) -> None:
+        """
+        从设置缓存读取 `auth.secret_key` 与 `auth.secret_key_previous`（JSON 字符串数组）。
+        """
+        previous = SettingsCache.get_json(SettingsType.AUTH, "secret_key_previous")
+        self.load(
+            SettingsCache.get(SettingsType.AUTH, "secret_key", ""),
+            [secret for secret in previous if isinstance(secret, str)] if isinstance(previous, list) else [],
+        )
+
+    def encode(self, payload: dict) -> str:
+        """使用当前密钥签发令牌"""
+        if self._active_kid is None:
+            raise RuntimeError("JWT 密钥尚未加载")
+        return jwt.encode(
+            payload,
+            self._secrets[self._active_kid],
+            algorithm='HS256',
+            headers={'kid': self._active_kid},
+        )
+
+    def decode(self, token: str, leeway: float = 0) -> dict:
+        """
+        校验签名与有效期并返回载荷。
+
+        :param token: JWT 字符串
+        :param leeway: 判断过期时允许的时钟误差（秒）
+        :raises UnknownKeyIdError: kid 不在密钥环中
+        :raises jwt.InvalidTokenError: 令牌格式错误、签名错误或已过期
+        """
+        signing_input, _, signature = token.rpartition('.')
+        header_segment, _, payload_segment = signing_input.partition('.')
+
+        if header_segment in self._header_kids:
+            kid = self._header_kids[header_segment]
+        else:
+            try:
+                header = _json_decoder.decode(_b64decode(header_segment).decode('utf-8'))
+            except (ValueError, TypeError):
+                raise jwt.DecodeError("Invalid token format")
+            if not isinstance(header, dict) or header.get('alg') != 'HS256':
+                raise jwt.InvalidAlgorithmError("The specified alg value is not allowed")
+            kid = header.get('kid')
+            if kid is not None and not isinstance(kid, str):
+                raise jwt.DecodeError("Invalid kid")
+
+        if kid is None:
+            # 没有 kid 的旧令牌：依次尝试密钥环中的全部密钥
+            candidates = list(self._macs.values())
+        elif kid in self._macs:
+            candidates = [self._macs[kid]]
+        else:
+            raise UnknownKeyIdError(f"Unknown kid: {kid}")
+
+        # 直接比较 base64url 编码后的签名，省去解码签名段
+        signing_bytes = signing_input.encode('ascii', errors='replace')
+        signature_bytes = signature.encode('ascii', errors='replace')
+        for base_mac in candidates:
+            mac = base_mac.copy()
+            mac.update(signing_bytes)
+            if hmac.compare_digest(_b64encode(mac.digest()), signature_bytes):
+                break
+        else:
+            raise jwt.InvalidSignatureError("Signature verification failed")
+
+        if len(self._header_kids) < 64:
+            self._header_kids[header_segment] = kid
+
+        try:
+            payload = _json_decoder.decode(_b64decode(payload_segment).decode('utf-8'))
+        except (ValueError, TypeError):
+            raise jwt.DecodeError("Invalid payload")
+        if not isinstance(payload, dict):
+            raise jwt.DecodeError("Invalid payload")
+
+        now = time.time()
+        exp = payload.get('exp')
+        if exp is not None:
+            if not isinstance(exp, (int, float)):
+                raise jwt.DecodeError("Expiration Time claim (exp) must be a number")
+            if exp <= now - leeway:
+                raise jwt.ExpiredSignatureError("Signature has expired")
+        nbf = payload.get('nbf')
+        if nbf is not None:
+            if not isinstance(nbf, (int, float)):
+                raise jwt.DecodeError("Not Before claim (nbf) must be a number")
+            if nbf > now + leeway:
+                raise jwt.ImmatureSignatureError("The token is not yet valid (nbf)")
+
+        return payload
+
+keyring = JWTKeyring()
+"""全局密钥环，设置缓存重新加载时自动刷新"""
+
+SettingsCache.add_listener(keyring.load_from_settings)
+
+_KEY_REFRESH_INTERVAL = 5.0
+"""遇到未知 kid 时从数据库重新加载密钥的最小间隔（秒）"""
+
+_last_key_refresh: float = 0.0
 
 async def load_secret_key() -> None:
     """
     从数据库读取 JWT 的密钥。
     """
-    global SECRET_KEY
     async for session in get_session():
-        setting = await Setting.get(
-            session,
-            and_(Setting.type == "auth", Setting.name == "secret_key")
-        )
-        if setting:
-            SECRET_KEY = setting.value
+        await SettingsCache.ensure_loaded(session)
         break
-    
+    keyring.load_from_settings()
+
+async def refresh_keys() -> bool:
+    """
+    遇到未知 kid 时从数据库重新加载设置（进而刷新密钥环）。
+
+    其他 worker 轮换密钥后，本进程可借此在不重启的情况下拿到新密钥。调用有频率限制。
+
+    :return: 本次是否真的重新加载了
+    """
+    global _last_key_refresh
+    now = time.monotonic()
+    if now - _last_key_refresh < _KEY_REFRESH_INTERVAL:
+        return False
+    _last_key_refresh = now
+    await SettingsCache.load_from_database()
+    return True
+
+async def rotate_secret_key(session: AsyncSession, keep_previous: int = 1) -> str:
+    """
+    生成新的签发密钥，旧密钥移入 `secret_key_previous` 继续接受校验。
+
+    :param session: 数据库会话
+    :param keep_previous: 保留的旧密钥数量
+    :return: 新密钥的 kid
+    """
+    from pkg.password.pwd import Password
+
+    current = SettingsCache.get(SettingsType.AUTH, "secret_key")
+    previous = SettingsCache.get_json(SettingsType.AUTH, "secret_key_previous")
+    previous = [secret for secret in previous if isinstance(secret, str)] if isinstance(previous, list) else []
+    if current:
+        previous.insert(0, current)
+
+    new_secret = Password.generate(256)
+    await Setting.upsert(
+        session,
+        {
+            (SettingsType.AUTH, "secret_key"): new_secret,
+            (SettingsType.AUTH, "secret_key_previous"): json.dumps(previous[:keep_previous]),
+        },
+    )
+    await SettingsCache.reload(session)
+    log.info(f"JWT 密钥已轮换，新 kid: {keyring.active_kid}")
+    return keyring.active_kid
+
 # 访问令牌
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> tuple[str, datetime]:
     to_encode = data.copy()
@@ -35,7 +248,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> t
     else:
         expire = datetime.now(timezone.utc) + timedelta(hours=3)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm='HS256')
+    encoded_jwt = keyring.encode(to_encode)
     return encoded_jwt, expire
 
 # 刷新令牌
@@ -46,5 +259,5 @@ def create_refresh_token(data: dict, expires_delta: timedelta | None = None) ->
     else:
         expire = datetime.now(timezone.utc) + timedelta(days=30)
     to_encode.update({"exp": expire, "token_type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm='HS256')
-    return encoded_jwt, expire
\ No newline at end of file
+    encoded_jwt = keyring.encode(to_encode)
+    return encoded_jwt, expire
@@ -0,0 +1,364 @@
+import asyncio
+import struct
+import zlib
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+import anyio
+
+ZIP64_LIMIT = 0xFFFFFFFF
+"""超过该值的大小或偏移需要使用 ZIP64 扩展"""
+
+ZIP_FILECOUNT_LIMIT = 0xFFFF
+"""超过该条目数需要使用 ZIP64 结尾记录"""
+
+DEFLATE_ZIP64_THRESHOLD = 0xF0000000
+"""压缩后大小无法提前确定，原始大小超过该值的压缩条目一律使用 ZIP64"""
+
+READ_SIZE = 256 * 1024
+"""每次从存储读取的字节数"""
+
+READ_AHEAD = 16
+"""预读队列的最大块数，读取领先发送最多 READ_AHEAD * READ_SIZE 字节"""
+
+STORED = 0
+DEFLATED = 8
+
+STORED_EXTENSIONS = frozenset({
+    # 压缩包
+    '7z', 'apk', 'br', 'bz2', 'cab', 'dmg', 'gz', 'jar', 'lz', 'lz4', 'lzma', 'rar', 'tgz', 'xz', 'zip', 'zst',
+    # 图片
+    'avif', 'gif', 'heic', 'heif', 'jpeg', 'jpg', 'png', 'webp',
+    # 音视频
+    'aac', 'avi', 'flac', 'flv', 'm4a', 'm4v', 'mkv', 'mov', 'mp3', 'mp4', 'ogg', 'opus', 'webm', 'wmv',
+    # 本身是 ZIP 容器的文档
+    'docx', 'epub', 'odp', 'ods', 'odt', 'pptx', 'xlsx',
+})
+"""已经压缩过的类型，再压缩只会浪费 CPU，直接存储"""
+
+
+def should_store(name: str) -> bool:
+    """按扩展名判断是否直接存储（不压缩）"""
+    _, dot, extension = name.rpartition('.')
+    return bool(dot) and extension.lower() in STORED_EXTENSIONS
+
+
+class ZipEntry(NamedTuple):
+    """压缩包中的一个条目"""
+
+    name: str
+    """包内路径，以 `/` 分隔；目录以 `/` 结尾"""
+
+    path: Path | None
+    """文件的物理位置，目录为 None"""
+
+    size: int
+    """文件大小（字节）"""
+
+    mtime: datetime
+    """修改时间"""
+
+    crc32: int | None = None
+    """已知的 CRC32；提前知道时直接写入文件头，否则在数据之后写数据描述符"""
+
+
+class _Job(NamedTuple):
+    """一次读取任务：从 `path` 的 `offset` 处读取 `length` 字节"""
+
+    path: Path
+    offset: int
+    length: int
+    deflate: bool
+
+
+class _JobDone(NamedTuple):
+    crc32: int
+    compressed_size: int
+
+
+class _JobReader:
+    """在工作线程中执行：读取、计算 CRC32、压缩在同一次线程调用中完成"""
+
+    def __init__(self, job: _Job) -> None:
+        self.remaining = job.length
+        self.crc32 = 0
+        self.compressed_size = 0
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, -15) if job.deflate else None
+        self._file: BinaryIO = open(job.path, 'rb')
+        self._file.seek(job.offset)
+
+    def next(self) -> tuple[bytes, bool]:
+        """
+        :return: (输出数据, 是否读完)
+        """
+        data = self._file.read(min(READ_SIZE, self.remaining)) if self.remaining else b''
+        if self.remaining and not data:
+            raise EOFError(f"{self._file.name} is shorter than expected")
+        self.remaining -= len(data)
+        self.crc32 = zlib.crc32(data, self.crc32)
+
+        done = self.remaining == 0
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+            if done:
+                data += self._compressor.flush()
+        self.compressed_size += len(data)
+        return data, done
+
+    def close(self) -> None:
+        self._file.close()
+
+
+async def _produce(jobs: list[_Job], queue: asyncio.Queue) -> None:
+    """按顺序执行读取任务并放入队列，队列满时等待，读取始终只领先发送有限的数据"""
+    try:
+        for job in jobs:
+            reader = await anyio.to_thread.run_sync(_JobReader, job)
+            try:
+                done = False
+                while not done:
+                    data, done = await anyio.to_thread.run_sync(reader.next)
+                    if data:
+                        await queue.put(data)
+                await queue.put(_JobDone(reader.crc32, reader.compressed_size))
+            finally:
+                reader.close()
+    except Exception as e:
+        await queue.put(e)
+
+
+def _dos_datetime(dt: datetime) -> tuple[int, int]:
+    if dt.year < 1980:
+        dt = datetime(1980, 1, 1)
+    elif dt.year > 2107:
+        dt = datetime(2107, 12, 31, 23, 59, 58)
+    return (
+        (dt.hour << 11) | (dt.minute << 5) | (dt.second // 2),
+        ((dt.year - 1980) << 9) | (dt.month << 5) | dt.day,
+    )
+
+
+class _Record(NamedTuple):
+    """写中央目录需要的信息"""
+
+    entry: ZipEntry
+    name: bytes
+    method: int
+    descriptor: bool
+    zip64: bool
+    crc32: int
+    compressed_size: int
+    offset: int
+
+
+class ZipStream:
+    """
+    流式生成 ZIP（含 ZIP64）压缩包，不落盘、不在内存中攒整个文件。
+
+    - 已经压缩过的类型直接存储，其他类型按 deflate 压缩（`compress=False` 时全部直接存储）；
+    - 从存储读取由后台任务流水线执行，读取、CRC32 与压缩在工作线程中完成，
+      预读队列有上限，发送慢时读取随之暂停；
+    - 全部条目都直接存储时，压缩包大小可以提前算出，可以设置 `Content-Length`；
+      若 CRC32 也都已知，每个字节的位置都是确定的，支持从任意位置开始输出（Range 断点续传），
+      跳过的文件不会被读取。
+    """
+
+    def __init__(self, entries: Sequence[ZipEntry], *, compress: bool = True) -> None:
+        """
+        :param entries: 条目列表，按此顺序写入
+        :param compress: 是否对未压缩的类型使用 deflate
+        """
+        self.entries = list(entries)
+        self._methods = [
+            DEFLATED if compress and entry.path is not None and entry.size and not should_store(entry.name) else STORED
+            for entry in self.entries
+        ]
+
+    @property
+    def seekable(self) -> bool:
+        """是否支持从任意位置开始输出"""
+        return all(
+            method == STORED and (entry.crc32 is not None or not entry.size)
+            for entry, method in zip(self.entries, self._methods)
+        )
+
+    @property
+    def size(self) -> int | None:
+        """压缩包的总大小；有压缩条目时无法提前确定，返回 None"""
+        if any(method == DEFLATED for method in self._methods):
+            return None
+
+        position = 0
+        records = []
+        for entry in self.entries:
+            record = self._record(entry, STORED, position, entry.crc32 or 0, entry.size)
+            position += len(self._local_header(record)) + entry.size + len(self._descriptor(record))
+            records.append(record)
+        return position + len(self._central_directory(records, position))
+
+    def _record(self, entry: ZipEntry, method: int, offset: int, crc32: int, compressed_size: int) -> _Record:
+        known = entry.crc32 is not None or not entry.size
+        if method == DEFLATED:
+            zip64 = entry.size >= DEFLATE_ZIP64_THRESHOLD
+        else:
+            zip64 = entry.size >= ZIP64_LIMIT
+        return _Record(
+            entry=entry,
+            name=entry.name.encode(),
+            method=method,
+            descriptor=method == DEFLATED or not known,
+            zip64=zip64,
+            crc32=crc32,
+            compressed_size=compressed_size,
+            offset=offset,
+        )
+
+    @staticmethod
+    def _local_header(record: _Record) -> bytes:
+        dos_time, dos_date = _dos_datetime(record.entry.mtime)
+        flags = 0x0800 | (0x0008 if record.descriptor else 0)
+        crc32 = 0 if record.descriptor else record.crc32
+        size = 0 if record.descriptor else record.entry.size
+        compressed_size = 0 if record.descriptor else record.compressed_size
+        extra = b''
+        if record.zip64:
+            extra = struct.pack('<HHQQ', 0x0001, 16, size, compressed_size)
+            size = compressed_size = ZIP64_LIMIT
+        return struct.pack(
+            '<IHHHHHIIIHH',
+            0x04034B50, 45 if record.zip64 else 20, flags, record.method, dos_time, dos_date,
+            crc32, compressed_size, size, len(record.name), len(extra),
+        ) + record.name + extra
+
+    @staticmethod
+    def _descriptor(record: _Record) -> bytes:
+        if not record.descriptor:
+            return b''
+        if record.zip64:
+            return struct.pack('<IIQQ', 0x08074B50, record.crc32, record.compressed_size, record.entry.size)
+        return struct.pack('<IIII', 0x08074B50, record.crc32, record.compressed_size, record.entry.size)
+
+    @staticmethod
+    def _central_header(record: _Record) -> bytes:
+        dos_time, dos_date = _dos_datetime(record.entry.mtime)
+        flags = 0x0800 | (0x0008 if record.descriptor else 0)
+        size, compressed_size, offset = record.entry.size, record.compressed_size, record.offset
+        fields = []
+        if record.zip64 or size >= ZIP64_LIMIT or compressed_size >= ZIP64_LIMIT:
+            fields += [size, compressed_size]
+            size = compressed_size = ZIP64_LIMIT
+        if offset >= ZIP64_LIMIT:
+            fields.append(offset)
+            offset = ZIP64_LIMIT
+        extra = struct.pack(f'<HH{len(fields)}Q', 0x0001, 8 * len(fields), *fields) if fields else b''
+        version = 45 if fields else 20
+        is_dir = record.entry.path is None
+        attributes = ((0o40755 << 16) | 0x10) if is_dir else (0o100644 << 16)
+        return struct.pack(
+            '<IHHHHHHIIIHHHHHII',
+            0x02014B50, (3 << 8) | version, version, flags, record.method, dos_time, dos_date,
+            record.crc32, compressed_size, size, len(record.name), len(extra), 0, 0, 0, attributes, offset,
+        ) + record.name + extra
+
+    def _central_directory(self, records: list[_Record], offset: int) -> bytes:
+        directory = b''.join(self._central_header(record) for record in records)
+        count, size = len(records), len(directory)
+        tail = b''
+        if count >= ZIP_FILECOUNT_LIMIT or size >= ZIP64_LIMIT or offset >= ZIP64_LIMIT:
+            tail = struct.pack(
+                '<IQHHIIQQQQ', 0x06064B50, 44, (3 << 8) | 45, 45, 0, 0, count, count, size, offset,
+            ) + struct.pack('<IIQI', 0x07064B50, 0, offset + size, 1)
+        tail += struct.pack(
+            '<IHHHHIIH', 0x06054B50, 0, 0,
+            min(count, ZIP_FILECOUNT_LIMIT), min(count, ZIP_FILECOUNT_LIMIT),
+            min(size, ZIP64_LIMIT), min(offset, ZIP64_LIMIT), 0,
+        )
+        return directory + tail
+
+    async def stream(self, start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        """
+        生成压缩包内容。
+
+        :param start: 起始位置（含），非 0 时要求 :attr:`seekable`
+        :param end: 结束位置（不含），None 表示到末尾
+        :raises ValueError: 要求部分输出但压缩包不支持
+        """
+        seekable = self.seekable
+        if (start or end is not None) and not seekable:
+            raise ValueError("Archive does not support partial output")
+        if end is None:
+            end = self.size if seekable else None
+
+        def clip(data: bytes, position: int) -> bytes:
+            """取出 `data`（位于 `position`）与输出范围重叠的部分"""
+            if end is None:
+                return data
+            lo, hi = max(start - position, 0), min(end - position, len(data))
+            return data[lo:hi] if lo < hi else b''
+
+        # 先确定每个条目需要读取的范围，交给后台任务预读
+        jobs: list[_Job] = []
+        position = 0
+        for entry, method in zip(self.entries, self._methods):
+            record = self._record(entry, method, position, entry.crc32 or 0, entry.size)
+            position += len(self._local_header(record))
+            if entry.path is not None and entry.size:
+                if not seekable:
+                    jobs.append(_Job(entry.path, 0, entry.size, method == DEFLATED))
+                else:
+                    lo, hi = max(start, position), min(end, position + entry.size)
+                    if lo < hi:
+                        jobs.append(_Job(entry.path, lo - position, hi - lo, False))
+            position += entry.size + len(self._descriptor(record))
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=READ_AHEAD)
+        producer = asyncio.create_task(_produce(jobs, queue))
+
+        async def drain() -> AsyncIterator[bytes | _JobDone]:
+            while True:
+                item = await queue.get()
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                if isinstance(item, _JobDone):
+                    return
+
+        try:
+            position = 0
+            records: list[_Record] = []
+            for entry, method in zip(self.entries, self._methods):
+                if end is not None and position >= end:
+                    return
+
+                crc32 = entry.crc32 or 0
+                record = self._record(entry, method, position, crc32, entry.size)
+                header = self._local_header(record)
+                if data := clip(header, position):
+                    yield data
+                position += len(header)
+
+                compressed_size = entry.size
+                if entry.path is not None and entry.size:
+                    data_start, data_end = position, position + entry.size
+                    if not seekable or (start < data_end and data_start < end):
+                        async for item in drain():
+                            if isinstance(item, _JobDone):
+                                if not seekable:
+                                    crc32, compressed_size = item.crc32, item.compressed_size
+                            else:
+                                yield item
+                position += compressed_size
+
+                record = record._replace(crc32=crc32, compressed_size=compressed_size)
+                descriptor = self._descriptor(record)
+                if data := clip(descriptor, position):
+                    yield data
+                position += len(descriptor)
+                records.append(record)
+
+            if data := clip(self._central_directory(records, position), position):
+                yield data
+        finally:
+            producer.cancel()
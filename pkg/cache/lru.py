@@ -0,0 +1,93 @@
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """
+    带过期时间的有界 LRU 缓存。
+
+    只在事件循环线程内使用，不加锁。容量满时淘汰最久未使用的条目；
+    条目超过 `ttl` 秒后在下一次读取时失效。
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None) -> None:
+        """
+        :param maxsize: 最大条目数
+        :param ttl: 条目存活秒数，`None` 表示永不过期
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize 必须大于 0")
+        self._maxsize: int = maxsize
+        self._ttl: float | None = ttl
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        """
+        读取条目并将其标记为最近使用；不存在或已过期时返回 `None`。
+        """
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        """
+        写入条目，必要时淘汰最久未使用的条目。
+
+        :param ttl: 该条目的存活秒数，`None` 时使用缓存的 `ttl`
+        """
+        ttl = self._ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else float('inf')
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> V | None:
+        """删除条目，返回被删除的值"""
+        item = self._data.pop(key, None)
+        return item[1] if item is not None else None
+
+    def pop_if(self, predicate: Callable[[K, V], bool]) -> int:
+        """
+        删除所有满足条件的条目。
+
+        :param predicate: 接收 `(key, value)`，返回 `True` 表示删除
+        :return: 删除的条目数
+        """
+        keys = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def prune(self) -> int:
+        """
+        删除所有已过期的条目。
+
+        :return: 删除的条目数
+        """
+        now = time.monotonic()
+        keys = [key for key, (expires_at, _) in self._data.items() if expires_at < now]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key) is not None
@@ -25,6 +25,83 @@ log.info(f"Starting DiskNext Server {BackendVersion} on {host}:{port}")
 
 database_url: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///disknext.db")
 
+database_pool_size: int = int(os.getenv("DATABASE_POOL_SIZE", 10))
+"""连接池常驻连接数"""
+
+database_max_overflow: int = int(os.getenv("DATABASE_MAX_OVERFLOW", 20))
+"""连接池允许临时超出常驻连接数的数量"""
+
+database_pool_timeout: float = float(os.getenv("DATABASE_POOL_TIMEOUT", 30))
+"""从连接池获取连接的最长等待秒数"""
+
+database_pool_recycle: int = int(os.getenv("DATABASE_POOL_RECYCLE", 1800))
+"""连接最长复用秒数，-1 为不回收"""
+
+database_pool_pre_ping: bool = os.getenv("DATABASE_POOL_PRE_PING", "true").lower() in ("true", "1", "yes")
+"""取出连接前是否先检测连接可用"""
+
+database_replica_urls: list[str] = [
+    url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
+"""只读副本的连接地址，逗号分隔；为空时读请求也走主库"""
+
+database_replica_sticky_seconds: float = float(os.getenv("DATABASE_REPLICA_STICKY_SECONDS", 5))
+"""用户写入后，其读请求固定走主库的秒数（读己之写）"""
+
+database_replica_health_interval: float = float(os.getenv("DATABASE_REPLICA_HEALTH_INTERVAL", 10))
+"""只读副本健康检查间隔秒数"""
+
+sqlite_journal_mode: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+"""SQLite journal_mode"""
+
+sqlite_synchronous: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+"""SQLite synchronous"""
+
+sqlite_busy_timeout: int = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))
+"""SQLite 遇到锁时的等待毫秒数"""
+
+sqlite_mmap_size: int = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+"""SQLite 内存映射读取的字节数，0 为关闭"""
+
+auth_cache_size: int = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+"""鉴权用户缓存的最大用户数"""
+
+auth_cache_ttl: int = int(os.getenv("AUTH_CACHE_TTL", 60))
+"""鉴权用户缓存的存活秒数，多进程部署时也是其他 worker 看到用户变更的最长延迟"""
+
+upload_buffer_size: int = int(os.getenv("UPLOAD_BUFFER_SIZE", 1024 * 1024))
+"""上传分块时内存缓冲区的大小（字节），请求体攒够这么多才写一次磁盘"""
+
+upload_default_chunk_size: int = int(os.getenv("UPLOAD_DEFAULT_CHUNK_SIZE", 25 * 1024 * 1024))
+"""存储策略未配置 `chunk_size` 时使用的分块大小（字节）"""
+
+archive_session_cache_size: int = int(os.getenv("ARCHIVE_SESSION_CACHE_SIZE", 1000))
+"""内存中最多保存的打包下载会话数，每个会话都持有完整的条目列表"""
+
+quota_cache_ttl: int = int(os.getenv("QUOTA_CACHE_TTL", 300))
+"""用户容量上限缓存的存活秒数，条目数上限与鉴权缓存相同"""
+
+password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+"""密码哈希线程池的线程数"""
+
+password_hash_queue: int = int(os.getenv("PASSWORD_HASH_QUEUE", 64))
+"""密码哈希线程池允许排队的任务数，超出后直接返回 429"""
+
+argon2_time_cost: int | None = int(os.getenv("ARGON2_TIME_COST")) if os.getenv("ARGON2_TIME_COST") else None
+"""Argon2 迭代次数，不设置时使用 argon2-cffi 的默认值"""
+
+argon2_memory_cost: int | None = int(os.getenv("ARGON2_MEMORY_COST")) if os.getenv("ARGON2_MEMORY_COST") else None
+"""Argon2 内存开销（KiB），不设置时使用 argon2-cffi 的默认值"""
+
+argon2_parallelism: int | None = int(os.getenv("ARGON2_PARALLELISM")) if os.getenv("ARGON2_PARALLELISM") else None
+"""Argon2 并行度，不设置时使用 argon2-cffi 的默认值"""
+
+slave_secret: str = os.getenv("SLAVE_SECRET", "")
+"""从机模式的通讯密钥，与主机上该节点的 `Node.slave_key` 一致；为空时不接受签名请求与签名下载"""
+
+slave_sign_ttl: int = int(os.getenv("SLAVE_SIGN_TTL", 60))
+"""主机签发从机 API 请求签名的有效秒数"""
+
 tags_meta = [
     {
         "name": "site",
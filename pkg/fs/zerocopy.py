@@ -0,0 +1,85 @@
+import errno
+import os
+import shutil
+from pathlib import Path
+
+_COPY_CHUNK = 1 << 30
+"""单次内核拷贝调用的最大字节数"""
+
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+"""这些错误表示当前文件系统/内核不支持该拷贝方式，需要换一种"""
+
+
+def _copy_file_range(fd_in: int, fd_out: int, size: int) -> int:
+    """用 copy_file_range 拷贝，支持 reflink 的文件系统上不产生实际数据拷贝；返回已拷贝字节数"""
+    copied = 0
+    while copied < size:
+        n = os.copy_file_range(fd_in, fd_out, min(size - copied, _COPY_CHUNK))
+        if n == 0:
+            break
+        copied += n
+    return copied
+
+
+def _sendfile(fd_in: int, fd_out: int, offset: int, size: int) -> int:
+    """用 sendfile 从 `offset` 继续拷贝，数据只在内核中流转；返回拷贝结束时的位置"""
+    while offset < size:
+        n = os.sendfile(fd_out, fd_in, offset, min(size - offset, _COPY_CHUNK))
+        if n == 0:
+            break
+        offset += n
+    return offset
+
+
+def copy_file(src: str | os.PathLike, dst: str | os.PathLike) -> None:
+    """
+    在内核中拷贝文件，不经过 Python 缓冲区。
+
+    依次尝试 copy_file_range、sendfile，都不可用时退回 :func:`shutil.copyfile` 。
+    阻塞调用，请在线程中执行。
+
+    :param src: 源文件
+    :param dst: 目标文件，已存在时会被覆盖
+    """
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        fd_in, fd_out = fin.fileno(), fout.fileno()
+        size = os.fstat(fd_in).st_size
+        copied = 0
+
+        if hasattr(os, 'copy_file_range'):
+            try:
+                copied = _copy_file_range(fd_in, fd_out, size)
+            except OSError as e:
+                if e.errno not in _FALLBACK_ERRNOS:
+                    raise
+
+        if copied < size and hasattr(os, 'sendfile'):
+            try:
+                copied = _sendfile(fd_in, fd_out, copied, size)
+            except OSError as e:
+                if e.errno not in _FALLBACK_ERRNOS:
+                    raise
+
+        if copied < size:
+            fin.seek(copied)
+            fout.seek(copied)
+            shutil.copyfileobj(fin, fout)
+
+
+def move_file(src: str | os.PathLike, dst: str | os.PathLike) -> None:
+    """
+    移动文件。同一文件系统内只是一次 rename；跨文件系统时用 :func:`copy_file` 拷贝后删除源文件。
+
+    阻塞调用，请在线程中执行。
+
+    :param src: 源文件
+    :param dst: 目标文件，父目录不存在时自动创建
+    """
+    Path(dst).parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        copy_file(src, dst)
+        os.unlink(src)
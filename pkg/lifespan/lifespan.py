@@ -1,8 +1,13 @@
+import asyncio
+from collections.abc import Callable, Coroutine
+
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
+from loguru import logger as log
 
 __on_startup: list[callable] = []
 __on_shutdown: list[callable] = []
+__background: list[Callable[[], Coroutine]] = []
 
 def add_startup(func: callable):
     """
@@ -20,20 +25,37 @@ def add_shutdown(func: callable):
     """
     __on_shutdown.append(func)
 
+def add_background(func: Callable[[], Coroutine]):
+    """
+    注册一个后台任务，在所有启动函数执行完后创建，应用关闭时取消。
+
+    :param func: 返回协程的无参函数，通常是一个循环直到被取消的异步函数。
+    """
+    __background.append(func)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     应用程序的生命周期管理器。
     
-    此函数在应用启动时执行所有注册的启动函数，
-    并在应用关闭时执行所有注册的关闭函数。
+    此函数在应用启动时执行所有注册的启动函数并创建后台任务，
+    并在应用关闭时取消后台任务、执行所有注册的关闭函数。
     """
     # Execute all startup functions
     for func in __on_startup:
         await func()
+
+    tasks = [asyncio.create_task(func(), name=func.__qualname__) for func in __background]
     
     yield
+
+    # Cancel all background tasks
+    for task in tasks:
+        task.cancel()
+    for task, result in zip(tasks, await asyncio.gather(*tasks, return_exceptions=True)):
+        if isinstance(result, Exception):
+            log.error(f"后台任务 {task.get_name()} 异常退出: {result!r}")
     
     # Execute all shutdown functions
     for func in __on_shutdown:
-        await func()
\ No newline at end of file
+        await func()
@@ -1,7 +1,39 @@
+import asyncio
 import secrets
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import ClassVar, TypeVar
+
 from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from fastapi import HTTPException
+from loguru import logger as log
+
+from pkg.conf import appmeta
+
+T = TypeVar("T")
+
+def _build_hasher() -> PasswordHasher:
+    """按配置构造 PasswordHasher，未配置的参数使用 argon2-cffi 默认值"""
+    params: dict[str, int] = {}
+    if appmeta.argon2_time_cost is not None:
+        params['time_cost'] = appmeta.argon2_time_cost
+    if appmeta.argon2_memory_cost is not None:
+        params['memory_cost'] = appmeta.argon2_memory_cost
+    if appmeta.argon2_parallelism is not None:
+        params['parallelism'] = appmeta.argon2_parallelism
+    return PasswordHasher(**params)
 
 class Password:
+
+    _hasher: ClassVar[PasswordHasher] = _build_hasher()
+    """复用的 Argon2 哈希器（线程安全）"""
+
+    _executor: ClassVar[ThreadPoolExecutor | None] = None
+    """专用于密码哈希的线程池，首次使用时创建"""
+
+    _pending: ClassVar[int] = 0
+    """正在执行和排队中的哈希任务数"""
     
     @staticmethod
     def generate(
@@ -19,27 +51,32 @@ class Password:
             return secrets.token_urlsafe(length)
         return secrets.token_hex(length)
     
-    @staticmethod
+    @classmethod
     def hash(
+        cls,
         password: str,
     ) -> str:
         """
         生成密码的Argon2哈希值。
+
+        同步执行，会阻塞调用线程；在事件循环中请使用 :meth:`hash_async` 。
         
         :param password: 要哈希的密码。
         :return: 使用Argon2算法生成的密码哈希。
         :rtype: str
         """
-        ph = PasswordHasher()
-        return ph.hash(password)
+        return cls._hasher.hash(password)
     
-    @staticmethod
+    @classmethod
     def verify(
+        cls,
         stored_password: str, 
         provided_password: str, 
     ) -> bool:
         """
         验证存储的Argon2密码哈希值与用户提供的密码是否匹配。
+
+        同步执行，会阻塞调用线程；在事件循环中请使用 :meth:`verify_async` 。
         
         :param stored_password: 存储的Argon2密码哈希值。
         :param provided_password: 用户提供的密码。
@@ -47,9 +84,68 @@ class Password:
         :return: 如果密码匹配返回 `True` ,否则返回 `False` 。
         :rtype: bool
         """
-        ph = PasswordHasher()
         try:
-            ph.verify(stored_password, provided_password)
-            return True
-        except:
+            return cls._hasher.verify(stored_password, provided_password)
+        except (VerificationError, InvalidHashError):
             return False
+
+    @classmethod
+    def needs_rehash(cls, stored_password: str) -> bool:
+        """
+        判断存储的哈希是否使用了与当前配置不同的参数，需要在下次登录时重新哈希。
+
+        :param stored_password: 存储的Argon2密码哈希值。
+        """
+        try:
+            return cls._hasher.check_needs_rehash(stored_password)
+        except InvalidHashError:
+            return True
+
+    @classmethod
+    async def _run_in_pool(cls, func: Callable[..., T], *args: str) -> T:
+        """
+        在密码哈希线程池中执行，排队任务过多时直接返回 429 而不是无限排队。
+        """
+        if cls._pending >= appmeta.password_hash_workers + appmeta.password_hash_queue:
+            log.warning(f"密码哈希线程池已满（{cls._pending} 个任务），拒绝请求")
+            raise HTTPException(status_code=429, detail="Too many requests", headers={"Retry-After": "1"})
+
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=appmeta.password_hash_workers,
+                thread_name_prefix='password-hash',
+            )
+
+        cls._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(cls._executor, func, *args)
+        finally:
+            cls._pending -= 1
+
+    @classmethod
+    async def hash_async(cls, password: str) -> str:
+        """
+        在专用线程池中生成密码的Argon2哈希值，不阻塞事件循环。
+
+        :param password: 要哈希的密码。
+        :raises HTTPException: 线程池排队已满时抛出 429
+        """
+        return await cls._run_in_pool(cls.hash, password)
+
+    @classmethod
+    async def verify_async(cls, stored_password: str, provided_password: str) -> bool:
+        """
+        在专用线程池中验证密码，不阻塞事件循环。
+
+        :param stored_password: 存储的Argon2密码哈希值。
+        :param provided_password: 用户提供的密码。
+        :raises HTTPException: 线程池排队已满时抛出 429
+        """
+        return await cls._run_in_pool(cls.verify, stored_password, provided_password)
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """关闭密码哈希线程池，等待进行中的任务完成"""
+        if cls._executor is not None:
+            executor, cls._executor = cls._executor, None
+            await asyncio.to_thread(executor.shutdown, True)
@@ -0,0 +1,96 @@
+import asyncio
+import time
+import weakref
+from collections.abc import AsyncIterable, AsyncIterator, Sequence
+from typing import ClassVar
+
+MIN_SLEEP = 0.005
+"""等待时间不足该值（秒）时不睡眠，欠下的令牌累积到之后一起等待，避免高频的微小 sleep"""
+
+
+class TokenBucket:
+    """
+    令牌桶。令牌按 `rate` 字节/秒匀速补充，最多积攒 `capacity` 个。
+
+    补充是惰性的：只在取令牌时按距上次取的时间差一次算出，没有后台定时器，
+    大量连接同时限速时开销只与数据块数量成正比。
+    允许透支：取令牌时先扣除，余额为负说明需要等待 `-余额 / rate` 秒，
+    单个数据块大于桶容量也能正常发送，多个连接共享同一个桶时按扣除顺序公平排队。
+    """
+
+    __slots__ = ('rate', 'capacity', '_tokens', '_updated', '__weakref__')
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        """
+        :param rate: 速率（字节/秒）
+        :param capacity: 桶容量（字节），默认为一秒的量
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: int) -> float:
+        """
+        取出 `amount` 个令牌（可以透支）。
+
+        :return: 需要等待的秒数，为 0 表示可以立即发送
+        """
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate) - amount
+        self._updated = now
+        return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    async def consume(self, amount: int) -> None:
+        """取出 `amount` 个令牌，透支时等待到余额恢复"""
+        delay = self.reserve(amount)
+        if delay >= MIN_SLEEP:
+            await asyncio.sleep(delay)
+
+
+async def consume_all(buckets: Sequence[TokenBucket], amount: int) -> None:
+    """同时从多个桶取令牌（例如单连接桶 + 用户总桶），只按最长的等待时间睡眠一次"""
+    delay = 0.0
+    for bucket in buckets:
+        delay = max(delay, bucket.reserve(amount))
+    if delay >= MIN_SLEEP:
+        await asyncio.sleep(delay)
+
+
+async def throttle(chunks: AsyncIterable[bytes], buckets: Sequence[TokenBucket]) -> AsyncIterator[bytes]:
+    """
+    按令牌桶限速的数据流包装：每个数据块发出前取一次令牌。
+
+    :param chunks: 原始数据流
+    :param buckets: 需要同时满足的令牌桶，为空时不限速
+    """
+    async for chunk in chunks:
+        if buckets:
+            await consume_all(buckets, len(chunk))
+        yield chunk
+
+
+class SharedBuckets:
+    """
+    按键共享的令牌桶，用于同一用户的全部下载连接共享一个总速率。
+
+    以弱引用保存，最后一个连接结束后桶随之释放，不需要额外清理。
+    """
+
+    _buckets: ClassVar[weakref.WeakValueDictionary[object, TokenBucket]] = weakref.WeakValueDictionary()
+    """键 -> 令牌桶"""
+
+    @classmethod
+    def get(cls, key: object, rate: float) -> TokenBucket:
+        """
+        取得键对应的令牌桶，速率变化（例如管理员修改了用户组限速）时就地更新。
+
+        :param key: 共享的键，例如用户ID
+        :param rate: 速率（字节/秒）
+        """
+        bucket = cls._buckets.get(key)
+        if bucket is None:
+            bucket = cls._buckets[key] = TokenBucket(rate)
+        elif bucket.rate != rate:
+            bucket.rate = bucket.capacity = float(rate)
+        return bucket
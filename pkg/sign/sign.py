@@ -0,0 +1,156 @@
+import binascii
+import hashlib
+import hmac
+import json
+import time
+from typing import NamedTuple
+from urllib.parse import parse_qsl, urlencode
+
+PURPOSE_DOWNLOAD = 'download'
+"""下载链接签名，令牌放在 URL 中"""
+
+PURPOSE_REQUEST = 'request'
+"""主从机之间的 API 请求签名，令牌放在 `Authorization` 头中"""
+
+_URLSAFE_TO_STD = str.maketrans('-_', '+/')
+_STD_TO_URLSAFE = bytes.maketrans(b'+/', b'-_')
+
+
+def _b64decode(data: str) -> bytes:
+    return binascii.a2b_base64((data + '=' * (-len(data) % 4)).translate(_URLSAFE_TO_STD), strict_mode=True)
+
+
+def _b64encode(data: bytes) -> str:
+    return binascii.b2a_base64(data, newline=False).translate(_STD_TO_URLSAFE).rstrip(b'=').decode()
+
+
+class SignatureError(Exception):
+    """签名无效或格式错误"""
+
+
+class SignatureExpiredError(SignatureError):
+    """签名已过期"""
+
+
+class SignedClaims(NamedTuple):
+    """签名令牌携带的声明"""
+
+    path: str
+    """文件的物理位置，或被签名请求的路径"""
+
+    expires: int
+    """过期时间（Unix 时间戳）"""
+
+    speed: int = 0
+    """限速（KB/s），0 为不限速"""
+
+    user_id: int | None = None
+    """发起下载的用户ID，用于按用户共享限速"""
+
+    name: str | None = None
+    """下载时的文件名"""
+
+    request: str | None = None
+    """API 请求签名中被签名请求的摘要，见 :func:`request_digest`"""
+
+
+def request_digest(method: str, path: str, query: str = '', body: bytes = b'') -> str:
+    """
+    API 请求的规范摘要，覆盖请求方法、路径、查询参数与请求体。
+
+    查询参数按名称排序后重新编码，参数顺序与编码方式的差异不影响结果。
+    请求签名带上该摘要后，截获的令牌不能换一个方法、参数或请求体重放。
+
+    :param method: 请求方法
+    :param path: 请求路径
+    :param query: 原始查询字符串（不含 `?`）
+    :param body: 请求体
+    """
+    canonical_query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+    canonical = f"{method.upper()}\n{path}\n{canonical_query}\n{hashlib.sha256(body).hexdigest()}"
+    return _b64encode(hashlib.sha256(canonical.encode()).digest())
+
+
+class Signer:
+    """
+    无状态的 HMAC-SHA256 签名令牌。
+
+    令牌格式为 `<声明>.<签名>`，两段都是无填充的 base64url，声明是紧凑的 JSON 数组以缩短 URL。
+    签名输入带上用途前缀，下载链接不能拿来当作 API 请求签名，反之亦然。
+    校验只做一次 HMAC 与常量时间比较，不访问数据库，从机可以独立完成。
+    """
+
+    __slots__ = ('_mac',)
+
+    def __init__(self, key: str | bytes) -> None:
+        """
+        :param key: 签名密钥，主机向从机签名时为 `Node.slave_key`，从机向主机签名时为 `Node.master_key`
+        """
+        if not key:
+            raise ValueError("Signing key must not be empty")
+        self._mac = hmac.new(key.encode() if isinstance(key, str) else key, digestmod=hashlib.sha256)
+
+    def _digest(self, purpose: str, body: str) -> bytes:
+        mac = self._mac.copy()
+        mac.update(f"{purpose}\0{body}".encode())
+        return mac.digest()
+
+    def sign(self, claims: SignedClaims, purpose: str = PURPOSE_DOWNLOAD) -> str:
+        """
+        签发令牌。
+
+        :param claims: 声明
+        :param purpose: 用途
+        """
+        body = _b64encode(json.dumps(list(claims), separators=(',', ':'), ensure_ascii=False).encode())
+        return f"{body}.{_b64encode(self._digest(purpose, body))}"
+
+    def create(
+            self,
+            path: str,
+            ttl: int,
+            *,
+            speed: int = 0,
+            user_id: int | None = None,
+            name: str | None = None,
+            request: str | None = None,
+            purpose: str = PURPOSE_DOWNLOAD,
+    ) -> str:
+        """
+        签发 `ttl` 秒后过期的令牌。
+
+        :param path: 文件的物理位置，或被签名请求的路径
+        :param ttl: 有效期（秒）
+        :param speed: 限速（KB/s）
+        :param user_id: 发起下载的用户ID
+        :param name: 下载时的文件名
+        :param request: 被签名请求的摘要，见 :func:`request_digest`
+        :param purpose: 用途
+        """
+        return self.sign(SignedClaims(path, int(time.time()) + ttl, speed, user_id, name, request), purpose)
+
+    def verify(self, token: str, purpose: str = PURPOSE_DOWNLOAD, now: float | None = None) -> SignedClaims:
+        """
+        校验令牌并取出声明。
+
+        :param token: 令牌
+        :param purpose: 用途，需与签发时一致
+        :param now: 当前时间（Unix 时间戳），默认取系统时间
+        :raises SignatureError: 签名无效或格式错误
+        :raises SignatureExpiredError: 已过期
+        """
+        body, _, signature = token.partition('.')
+        try:
+            expected = _b64decode(signature)
+        except (binascii.Error, ValueError):
+            raise SignatureError("Malformed signature")
+        if not hmac.compare_digest(self._digest(purpose, body), expected):
+            raise SignatureError("Signature mismatch")
+
+        try:
+            claims = SignedClaims(*json.loads(_b64decode(body)))
+        except (binascii.Error, ValueError, TypeError):
+            raise SignatureError("Malformed claims")
+        if claims.expires <= (now if now is not None else time.time()):
+            raise SignatureExpiredError("Signature expired")
+        return claims
@@ -0,0 +1,104 @@
+import codecs
+import mmap
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+SAMPLE_SIZE = 64 * 1024
+"""判断编码时读取的文件开头字节数"""
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+"""字节序标记与对应的编码，UTF-32 LE 的标记以 UTF-16 LE 的标记开头，需要先判断"""
+
+_UNIT_SIZES = {'utf-16-le': 2, 'utf-16-be': 2, 'utf-32-le': 4, 'utf-32-be': 4}
+"""定长编码单元的字节数，窗口边界按此对齐"""
+
+
+class TextWindow(NamedTuple):
+    """文本文件中的一段"""
+
+    text: str
+    """解码后的文本"""
+
+    encoding: str
+    """文件的编码"""
+
+    offset: int
+    """这一段在文件中的起始字节位置，已对齐到字符边界"""
+
+    end: int
+    """这一段在文件中的结束字节位置（不含），读取下一段时从这里开始"""
+
+    size: int
+    """文件大小（字节）"""
+
+
+def detect_encoding(sample: bytes) -> tuple[str, int]:
+    """
+    根据文件开头的样本判断编码。
+
+    依次检查字节序标记、UTF-8、GB18030，都不符合时按 Latin-1 处理（任何字节序列都能解码）。
+    样本末尾可能截断在多字节字符中间，判断时容许不完整的结尾。
+
+    :param sample: 文件开头的字节
+    :return: 编码与字节序标记的长度
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding, len(bom)
+    for encoding in ('utf-8', 'gb18030'):
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding, 0
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1', 0
+
+
+def _align(data: mmap.mmap, position: int, encoding: str, start: int) -> int:
+    """把 `position` 向后移动到最近的字符起始位置，`start` 为正文（字节序标记之后）的起始位置"""
+    unit = _UNIT_SIZES.get(encoding)
+    if unit is not None:
+        return position + (unit - (position - start) % unit) % unit
+    if encoding == 'utf-8':
+        # UTF-8 的后续字节都是 10xxxxxx，最多跳过 3 个
+        limit = min(position + 3, len(data))
+        while position < limit and data[position] & 0xC0 == 0x80:
+            position += 1
+    return position
+
+
+def read_text(path: str | os.PathLike, offset: int = 0, length: int | None = None) -> TextWindow:
+    """
+    用内存映射读取文本文件中的一段并解码，只有这一段会被读入内存。
+
+    编码总是按文件开头判断，各段之间保持一致；起止位置对齐到字符边界，
+    返回的 `end` 可以直接作为下一段的 `offset` 。GB18030 等无法从中间定位字符边界的编码，
+    窗口边界处的残缺字符以替换字符表示。
+
+    阻塞调用，请在线程中执行。
+
+    :param path: 文件位置
+    :param offset: 起始字节位置
+    :param length: 最多读取的字节数，`None` 为读到文件末尾
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return TextWindow('', 'utf-8', 0, 0, 0)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            encoding, bom = detect_encoding(data[:SAMPLE_SIZE])
+            start = min(_align(data, min(max(offset, bom), size), encoding, bom), size)
+            stop = size if length is None else min(start + length, size)
+
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            text = decoder.decode(data[start:stop], final=stop == size)
+            # 末尾截断在多字节字符中间时，未解码的字节留给下一段
+            pending, _ = decoder.getstate()
+            return TextWindow(text, encoding, start, stop - len(pending), size)
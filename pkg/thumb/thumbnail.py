@@ -0,0 +1,65 @@
+import os
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+SUPPORTED_EXTENSIONS = frozenset({'bmp', 'gif', 'jpeg', 'jpg', 'png', 'tif', 'tiff', 'webp'})
+"""可以生成缩略图的扩展名"""
+
+MAX_SOURCE_SIZE = 50 * 1024 * 1024
+"""超过该大小的图片不生成缩略图"""
+
+
+def is_supported(name: str, size: int) -> bool:
+    """按扩展名与大小判断能否生成缩略图"""
+    _, dot, extension = name.rpartition('.')
+    return bool(dot) and extension.lower() in SUPPORTED_EXTENSIONS and 0 < size <= MAX_SOURCE_SIZE
+
+
+def make_thumbnail(source: Path, destination: Path, width: int, height: int, quality: int = 85) -> None:
+    """
+    生成不超过 `width` x `height` 的 JPEG 缩略图，保持宽高比，按 EXIF 方向摆正。
+
+    JPEG 先用 `draft` 让解码器直接按 1/2、1/4、1/8 缩小解码，大照片不必解出全部像素；
+    结果先写临时文件再改名，并发读取不会看到写了一半的文件。
+
+    同步执行，Pillow 在解码、缩放与编码时释放 GIL，适合放在线程池中执行。
+
+    :param source: 原图位置
+    :param destination: 缩略图位置
+    :param width: 最大宽度
+    :param height: 最大高度
+    :param quality: JPEG 质量
+    :raises OSError: 无法识别或解码原图（包括 Pillow 对损坏图片抛出的其他异常），或像素数超过 Pillow 的解压炸弹上限
+    """
+    try:
+        _make_thumbnail(source, destination, width, height, quality)
+    except OSError:
+        raise
+    except Exception as e:
+        # 损坏的图片还会引发 SyntaxError、ValueError、DecompressionBombError 等，统一视为无法解码
+        raise OSError(f"{type(e).__name__}: {e}") from e
+
+
+def _make_thumbnail(source: Path, destination: Path, width: int, height: int, quality: int) -> None:
+    with Image.open(source) as image:
+        image.draft('RGB', (width, height))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            # JPEG 不支持透明，铺在白色背景上
+            rgba = image.convert('RGBA')
+            image = Image.new('RGB', rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel('A'))
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        temporary = destination.with_name(f"{destination.name}.{os.getpid()}.tmp")
+        try:
+            image.save(temporary, 'JPEG', quality=quality, optimize=True)
+            os.replace(temporary, destination)
+        except BaseException:
+            temporary.unlink(missing_ok=True)
+            raise
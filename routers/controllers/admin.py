@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from loguru import logger
 
-from middleware.auth import AdminRequired
-from middleware.dependencies import SessionDep
-from models import User
-from models.user import UserPublic
+from middleware.auth import AdminRequired, invalidate_group, invalidate_user
+from middleware.dependencies import ReadSessionDep, SessionDep
+from models import File, Folder, Group, Setting, Share, Task, User
+from models.database import PoolMetrics
+from models.group import GroupUpdateRequest
+from models.request import SettingsUpdateRequest
+from models.setting import SettingsCache
+from models.user import UserPublic, UserUpdateRequest
+from pkg.JWT import jwt as JWT
+from service import storage
 from models.response import ResponseModel
 
 # 管理员根目录 /api/admin
@@ -98,14 +104,48 @@ def router_admin_get_news() -> ResponseModel:
     description='Update settings',
     dependencies=[Depends(AdminRequired)],
 )
-def router_admin_update_settings() -> ResponseModel:
+async def router_admin_update_settings(
+    session: SessionDep,
+    request: SettingsUpdateRequest,
+) -> ResponseModel:
     """
     更新站点设置，包括站点名称、描述等。
-    
+
+    不存在的设置项会被新建。写入完成后重新加载设置缓存。
+    同一设置项在请求中出现多次时以最后一次为准。
+
+    Args:
+        session: 数据库会话依赖项。
+        request (SettingsUpdateRequest): 要修改的设置项列表。
+
     Returns:
         ResponseModel: 包含更新结果的响应模型。
     """
-    pass
+    count = await Setting.upsert(
+        session,
+        {(item.type, item.name): item.value for item in request.settings},
+    )
+    await SettingsCache.reload(session)
+    logger.info(f"管理员更新了 {count} 项设置")
+
+    return ResponseModel(data={"updated": count, "version": SettingsCache.version()})
+
+@admin_router.post(
+    path='/settings/secret_key/rotate',
+    summary='轮换 JWT 密钥',
+    description='Rotate the JWT signing key. Tokens signed with the previous key stay valid.',
+    dependencies=[Depends(AdminRequired)],
+)
+async def router_admin_rotate_secret_key(session: SessionDep) -> ResponseModel:
+    """
+    生成新的 JWT 签发密钥。旧密钥保留用于校验，已签发的令牌在过期前仍然有效，
+    其他 worker 遇到新的 kid 时会自动从数据库刷新密钥。
+
+    Returns:
+        ResponseModel: 包含新密钥 kid 的响应模型。
+    """
+    kid = await JWT.rotate_secret_key(session)
+    return ResponseModel(data={"kid": kid})
 
 @admin_router.get(
     path='/settings',
@@ -122,6 +162,21 @@ def router_admin_get_settings() -> ResponseModel:
     """
     pass
 
+@admin_router.get(
+    path='/database/pool',
+    summary='获取数据库连接池状态',
+    description='Get database connection pool status and checkout wait metrics',
+    dependencies=[Depends(AdminRequired)],
+)
+def router_admin_get_database_pool() -> ResponseModel:
+    """
+    获取数据库连接池状态，包括取连接的次数、等待时间和超时次数。
+
+    Returns:
+        ResponseModel: 包含连接池状态的响应模型。
+    """
+    return ResponseModel(data=PoolMetrics.snapshot())
+
 @admin_group_router.get(
     path='/',
     summary='获取用户组列表',
@@ -200,17 +255,27 @@ def router_admin_create_group() -> ResponseModel:
     description='Update user group information by ID',
     dependencies=[Depends(AdminRequired)],
 )
-def router_admin_update_group(group_id: int) -> ResponseModel:
+async def router_admin_update_group(
+    session: SessionDep,
+    group_id: int,
+    request: GroupUpdateRequest,
+) -> ResponseModel:
     """
     根据用户组ID更新用户组信息，包括名称、权限等。
     
     Args:
+        session(SessionDep): 数据库会话依赖项。
         group_id (int): 用户组ID。
+        request (GroupUpdateRequest): 要更新的字段。
     
     Returns:
         ResponseModel: 包含更新结果的响应模型。
     """
-    pass
+    group = await Group.get_exist_one(session, group_id)
+    group = await group.update(session, request)
+    invalidate_group(group_id)
+    storage.invalidate_group_capacity(group_id)
+    return ResponseModel(data=group.model_dump())
 
 @admin_group_router.delete(
     path='/{group_id}',
@@ -218,17 +283,24 @@ def router_admin_update_group(group_id: int) -> ResponseModel:
     description='Delete user group by ID',
     dependencies=[Depends(AdminRequired)],
 )
-def router_admin_delete_group(group_id: int) -> ResponseModel:
+async def router_admin_delete_group(session: SessionDep, group_id: int) -> ResponseModel:
     """
-    根据用户组ID删除用户组。
+    根据用户组ID删除用户组。组内仍有用户时拒绝删除。
     
     Args:
+        session(SessionDep): 数据库会话依赖项。
         group_id (int): 用户组ID。
     
     Returns:
         ResponseModel: 包含删除结果的响应模型。
     """
-    pass
+    group = await Group.get_exist_one(session, group_id)
+    if await User.get(session, User.group_id == group_id):
+        raise HTTPException(status_code=409, detail="Group still has users")
+    await Group.delete(session, group)
+    invalidate_group(group_id)
+    storage.invalidate_group_capacity(group_id)
+    return ResponseModel(data=group_id)
 
 @admin_user_router.get(
     path='/info/{user_id}',
@@ -236,12 +308,12 @@ def router_admin_delete_group(group_id: int) -> ResponseModel:
     description='Get user information by ID',
     dependencies=[Depends(AdminRequired)],
 )
-async def router_admin_get_user(session: SessionDep, user_id: int) -> ResponseModel:
+async def router_admin_get_user(session: ReadSessionDep, user_id: int) -> ResponseModel:
     """
     根据用户ID获取用户信息，包括用户名、邮箱、注册时间等。
     
     Args:
-        session(SessionDep): 数据库会话依赖项。
+        session(ReadSessionDep): 数据库会话依赖项（读写分离）。
         user_id (int): 用户ID。
 
     Returns:
@@ -257,31 +329,27 @@ async def router_admin_get_user(session: SessionDep, user_id: int) -> ResponseMo
     dependencies=[Depends(AdminRequired)],
 )
 async def router_admin_get_users(
-    session: SessionDep,
-    page: int = 1,
-    page_size: int = 20
+    session: ReadSessionDep,
+    cursor: str | None = None,
+    page_size: int = Query(default=20, ge=1, le=100),
 ) -> ResponseModel:
     """
-    获取用户列表，支持分页。
+    获取用户列表，按注册时间倒序游标分页。
 
     Args:
         session: 数据库会话依赖项。
-        page (int): 页码，默认为1。
+        cursor (str | None): 上一页返回的 `next_cursor`，第一页不传。
         page_size (int): 每页显示的用户数量，默认为20。
 
     Returns:
-        ResponseModel: 包含用户列表的响应模型。
+        ResponseModel: 包含用户列表与下一页游标的响应模型。
     """
-    offset = (page - 1) * page_size
-    users: list[User] = await User.get(
-        session,
-        None,
-        fetch_mode="all",
-        offset=offset,
-        limit=page_size
-    )
+    page = await User.get_page(session, None, cursor=cursor, limit=page_size)
     return ResponseModel(
-        data=[user.to_public().model_dump() for user in users]
+        data={
+            'items': [user.to_public().model_dump() for user in page.items],
+            'next_cursor': page.next_cursor,
+        }
     )
 
 @admin_user_router.post(
@@ -307,7 +375,9 @@ async def router_admin_create_user(
             msg="User with this username already exists."
         )
     user = await user.save(session)
-    return ResponseModel(data=user.to_public().model_dump())
+    data = user.to_public().model_dump()
+    await Folder.create_root(session, user.id)
+    return ResponseModel(data=data)
 
 @admin_user_router.patch(
     path='/{user_id}',
@@ -315,17 +385,27 @@ async def router_admin_create_user(
     description='Update user information by ID',
     dependencies=[Depends(AdminRequired)],
 )
-def router_admin_update_user(user_id: int) -> ResponseModel:
+async def router_admin_update_user(
+    session: SessionDep,
+    user_id: int,
+    request: UserUpdateRequest,
+) -> ResponseModel:
     """
-    根据用户ID更新用户信息，包括用户名、邮箱等。
+    根据用户ID更新用户信息，包括昵称、状态、用户组等。
     
     Args:
+        session(SessionDep): 数据库会话依赖项。
         user_id (int): 用户ID。
+        request (UserUpdateRequest): 要更新的字段。
     
     Returns:
         ResponseModel: 包含更新结果的响应模型。
     """
-    pass
+    user = await User.get_exist_one(session, user_id)
+    user = await user.update(session, request)
+    invalidate_user(user_id)
+    storage.invalidate_capacity(user_id)
+    return ResponseModel(data=user.to_public().model_dump())
 
 @admin_user_router.delete(
     path='/{user_id}',
@@ -333,17 +413,22 @@ def router_admin_update_user(user_id: int) -> ResponseModel:
     description='Delete user by ID',
     dependencies=[Depends(AdminRequired)],
 )
-def router_admin_delete_user(user_id: int) -> ResponseModel:
+async def router_admin_delete_user(session: SessionDep, user_id: int) -> ResponseModel:
     """
     根据用户ID删除用户。
     
     Args:
+        session(SessionDep): 数据库会话依赖项。
         user_id (int): 用户ID。
     
     Returns:
         ResponseModel: 包含删除结果的响应模型。
     """
-    pass
+    user = await User.get_exist_one(session, user_id)
+    await User.delete(session, user)
+    invalidate_user(user_id)
+    storage.invalidate_capacity(user_id)
+    return ResponseModel(data=user_id)
 
 @admin_user_router.post(
     path='/calibrate/{user_id}',
@@ -351,8 +436,36 @@ def router_admin_delete_user(user_id: int) -> ResponseModel:
     description='Calibrate the user storage.',
     dependencies=[Depends(AdminRequired)]
 )
-def router_admin_calibrate_storage():
-    pass
+async def router_admin_calibrate_storage(session: SessionDep, user_id: int) -> ResponseModel:
+    """
+    按文件表重新计算用户的已用存储空间。
+    
+    Args:
+        session(SessionDep): 数据库会话依赖项。
+        user_id (int): 用户ID。
+    
+    Returns:
+        ResponseModel: 包含校准后已用空间的响应模型。
+    """
+    if not await storage.calibrate_storage(session, user_id):
+        raise HTTPException(status_code=404, detail="Not found")
+    used, total = await storage.get_usage(session, user_id)
+    return ResponseModel(data={'used': used, 'total': total})
+
+@admin_user_router.post(
+    path='/calibrate',
+    summary='校准全部用户存储容量',
+    description='Calibrate the storage of all users in one set-based update.',
+    dependencies=[Depends(AdminRequired)]
+)
+async def router_admin_calibrate_all_storage(session: SessionDep) -> ResponseModel:
+    """
+    用一条 UPDATE 按文件表重新计算全部用户的已用存储空间。
+    
+    Returns:
+        ResponseModel: 包含校准用户数量的响应模型。
+    """
+    return ResponseModel(data=await storage.calibrate_storage(session))
 
 @admin_file_router.get(
     path='/list',
@@ -360,14 +473,37 @@ def router_admin_calibrate_storage():
     description='Get file list',
     dependencies=[Depends(AdminRequired)],
 )
-def router_admin_get_file_list() -> ResponseModel:
+async def router_admin_get_file_list(
+    session: ReadSessionDep,
+    user_id: int | None = None,
+    cursor: str | None = None,
+    page_size: int = Query(default=20, ge=1, le=100),
+) -> ResponseModel:
     """
-    获取文件列表，包括文件名称、大小、上传时间等。
+    获取文件列表，包括文件名称、大小、上传时间等，按更新时间倒序游标分页。
+    
+    Args:
+        session: 数据库会话依赖项。
+        user_id (int | None): 只列出该用户的文件。
+        cursor (str | None): 上一页返回的 `next_cursor`，第一页不传。
+        page_size (int): 每页显示的文件数量，默认为20。
     
     Returns:
-        ResponseModel: 包含文件列表的响应模型。
+        ResponseModel: 包含文件列表与下一页游标的响应模型。
     """
-    pass
+    page = await File.get_page(
+        session,
+        File.user_id == user_id if user_id is not None else None,
+        cursor=cursor,
+        limit=page_size,
+        order_field="updated_at",
+    )
+    return ResponseModel(
+        data={
+            'items': [file.model_dump(mode='json') for file in page.items],
+            'next_cursor': page.next_cursor,
+        }
+    )
 
 @admin_file_router.get(
     path='/preview/{file_id}',
@@ -434,6 +570,80 @@ def router_admin_delete_file(file_id: int) -> ResponseModel:
 def router_admin_aira2_test() -> ResponseModel:
     pass
 
+@admin_share_router.get(
+    path='/list',
+    summary='获取分享列表',
+    description='Get share list',
+    dependencies=[Depends(AdminRequired)],
+)
+async def router_admin_get_share_list(
+    session: ReadSessionDep,
+    user_id: int | None = None,
+    cursor: str | None = None,
+    page_size: int = Query(default=20, ge=1, le=100),
+) -> ResponseModel:
+    """
+    获取分享列表，按创建时间倒序游标分页。
+
+    Args:
+        session: 数据库会话依赖项。
+        user_id (int | None): 只列出该用户创建的分享。
+        cursor (str | None): 上一页返回的 `next_cursor`，第一页不传。
+        page_size (int): 每页显示的分享数量，默认为20。
+
+    Returns:
+        ResponseModel: 包含分享列表与下一页游标的响应模型。
+    """
+    page = await Share.get_page(
+        session,
+        Share.user_id == user_id if user_id is not None else None,
+        cursor=cursor,
+        limit=page_size,
+    )
+    return ResponseModel(
+        data={
+            'items': [share.model_dump(mode='json', exclude={'password'}) for share in page.items],
+            'next_cursor': page.next_cursor,
+        }
+    )
+
+@admin_task_router.get(
+    path='/list',
+    summary='获取任务列表',
+    description='Get task list',
+    dependencies=[Depends(AdminRequired)],
+)
+async def router_admin_get_task_list(
+    session: ReadSessionDep,
+    user_id: int | None = None,
+    cursor: str | None = None,
+    page_size: int = Query(default=20, ge=1, le=100),
+) -> ResponseModel:
+    """
+    获取任务列表，按创建时间倒序游标分页。
+
+    Args:
+        session: 数据库会话依赖项。
+        user_id (int | None): 只列出该用户的任务。
+        cursor (str | None): 上一页返回的 `next_cursor`，第一页不传。
+        page_size (int): 每页显示的任务数量，默认为20。
+
+    Returns:
+        ResponseModel: 包含任务列表与下一页游标的响应模型。
+    """
+    page = await Task.get_page(
+        session,
+        Task.user_id == user_id if user_id is not None else None,
+        cursor=cursor,
+        limit=page_size,
+    )
+    return ResponseModel(
+        data={
+            'items': [task.model_dump(mode='json') for task in page.items],
+            'next_cursor': page.next_cursor,
+        }
+    )
+
 @admin_policy_router.get(
     path='/list',
     summary='列出存储策略',
@@ -1,6 +1,10 @@
-from fastapi import APIRouter, Depends
-from middleware.auth import SignRequired
-from models import response
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException
+from middleware.auth import AuthRequired
+from middleware.dependencies import ReadSessionDep, SessionDep
+from models import File, Folder, User, response
+from models.request import DirectoryCreateRequest
 
 directory_router = APIRouter(
     prefix="/directory",
@@ -11,35 +15,98 @@ directory_router = APIRouter(
     path='/',
     summary='创建目录',
     description='Create a directory endpoint.',
-    dependencies=[Depends(SignRequired)]
 )
-def router_directory_create() -> response.ResponseModel:
+async def router_directory_create(
+    session: SessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    request: DirectoryCreateRequest,
+) -> response.ResponseModel:
     """
     Create a directory endpoint.
     
+    Args:
+        request (DirectoryCreateRequest): The full path of the directory to create.
+    
     Returns:
         ResponseModel: A model containing the response data for the directory creation.
     """
-    pass
+    path = Folder.normalize_path(request.path)
+    if path == '/':
+        raise HTTPException(status_code=409, detail="Folder already exists")
+
+    parent_path, name = path[:-1].rsplit('/', 1)
+    parent = await Folder.resolve(session, user.id, parent_path)
+    if parent is None:
+        raise HTTPException(status_code=404, detail="Parent folder not found")
+
+    folder = await parent.create_child(session, name)
+    return response.ResponseModel(data=folder.id)
 
 @directory_router.get(
     path='/{path:path}',
     summary='获取目录内容',
     description='Get directory contents endpoint.',
-    dependencies=[Depends(SignRequired)]
 )
-def router_directory_get(path: str) -> response.ResponseModel:
+async def router_directory_get(
+    session: ReadSessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    path: str,
+) -> response.ResponseModel:
     """
     Get directory contents endpoint.
     
+    The folder is located by its materialized path in one query, no matter how deep it is.
+    
     Args:
         path (str): The path of the directory to retrieve contents from.
     
     Returns:
         ResponseModel: A model containing the response data for the directory contents.
     """
+    folder = await Folder.resolve(session, user.id, path, load=Folder.policy)
+    if folder is None:
+        raise HTTPException(status_code=404, detail="Folder not found")
+
+    children: list[Folder] = await Folder.get(
+        session, Folder.parent_id == folder.id, fetch_mode="all", order_by=[Folder.name]
+    )
+    files: list[File] = await File.get(
+        session, File.folder_id == folder.id, fetch_mode="all", order_by=[File.name]
+    )
+
+    objects = [
+        response.ObjectModel(
+            id=str(child.id),
+            name=child.name,
+            path=folder.path,
+            type='folder',
+            date=child.updated_at,
+            create_date=child.created_at,
+        )
+        for child in children
+    ] + [
+        response.ObjectModel(
+            id=str(file.id),
+            name=file.name,
+            path=folder.path,
+            size=file.size,
+            type='file',
+            date=file.updated_at,
+            create_date=file.created_at,
+        )
+        for file in files
+    ]
+
+    policy = folder.policy
     return response.ResponseModel(
         data=response.DirectoryModel(
-            
-        )
-    )
\ No newline at end of file
+            parent=str(folder.id),
+            objects=objects,
+            policy=response.PolicyModel(
+                id=str(policy.id),
+                name=policy.name,
+                type=policy.type,
+                max_size=policy.max_size,
+            ),
+        ).model_dump(mode='json')
+    )
@@ -1,7 +1,14 @@
-from fastapi import APIRouter, Depends, UploadFile
-from fastapi.responses import FileResponse
-from middleware.auth import SignRequired
+import uuid
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from middleware.auth import AuthRequired, SignRequired
+from middleware.dependencies import SessionDep
+from models import File, Folder, SourceLink, User
+from models.request import ArchiveRequest, CompressRequest, DecompressRequest, ThumbBatchRequest, UploadSessionRequest
 from models.response import ResponseModel
+from service import storage, task
 
 file_router = APIRouter(
     prefix="/file",
@@ -18,18 +25,35 @@ file_upload_router = APIRouter(
     summary='文件外链（直接输出文件数据）',
     description='Get file external link endpoint.',
 )
-def router_file_get(id: str, name: str) -> FileResponse:
+async def router_file_get(
+    session: SessionDep,
+    request: Request,
+    id: int,
+    name: str,
+) -> Response:
     """
     Get file external link endpoint.
     
+    Supports Range (single and multiple), If-Range, If-None-Match and If-Modified-Since,
+    so players can seek and download managers can resume without re-sending the whole file.
+    
     Args:
-        id (str): The ID of the file.
-        name (str): The name of the file.
+        id (int): The ID of the source link.
+        name (str): The name of the source link.
     
     Returns:
-        FileResponse: A response containing the file data.
+        Response: A response containing the file data.
     """
-    pass
+    link = await SourceLink.get(session, SourceLink.id == id)
+    if link is None or link.name != name:
+        raise HTTPException(status_code=404, detail="Source link not found")
+
+    file = await File.get_exist_one(session, link.file_id)
+    if 'range' not in request.headers:
+        # 只统计完整下载，断点续传与拖动进度条的分段请求不重复计数
+        await SourceLink.bulk_update(session, SourceLink.id == id, {'downloads': SourceLink.downloads + 1})
+        file = await File.get_exist_one(session, file.id)
+    return await storage.serve_file(session, request, file, inline=True)
 
 @file_router.get(
     path='/source/{id}/{name}',
@@ -54,100 +78,208 @@ def router_file_source(id: str, name: str) -> ResponseModel:
     summary='下载文件',
     description='Download file endpoint.',
 )
-def router_file_download(id: str) -> ResponseModel:
+async def router_file_download(
+    session: SessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    request: Request,
+    id: int,
+) -> Response:
     """
     Download file endpoint.
     
+    Supports Range (single and multiple), If-Range, If-None-Match and If-Modified-Since.
+    
     Args:
-        id (str): The ID of the file to download.
+        id (int): The ID of the file to download.
     
     Returns:
-        ResponseModel: A model containing the response data for the file download.
+        Response: A response containing the file data.
     """
-    pass
+    file = await File.get(session, File.id == id)
+    if file is None or file.user_id != user.id:
+        raise HTTPException(status_code=404, detail="File not found")
+    return await storage.serve_file(session, request, file, user_id=user.id)
 
 @file_upload_router.get(
     path='/archive/{sessionID}/archive.zip',
     summary='打包并下载文件',
     description='Archive and download files endpoint.',
 )
-def router_file_archive_download(sessionID: str) -> ResponseModel:
+async def router_file_archive_download(
+    session: SessionDep,
+    request: Request,
+    sessionID: uuid.UUID,
+) -> Response:
     """
     Archive and download files endpoint.
     
+    The archive is generated on the fly with no temporary file. When every entry is stored
+    (not deflated) and its CRC32 is known, the output is byte-for-byte deterministic,
+    so Content-Length and single Range requests are supported.
+    
     Args:
-        sessionID (str): The session ID for the archive.
+        sessionID (UUID): The session ID for the archive.
     
     Returns:
-        ResponseModel: A model containing the response data for the archived files download.
+        Response: A streaming response containing the ZIP archive.
     """
-    pass
+    archive = storage.ArchiveSessionStore.get(sessionID)
+    speed_limit = await storage.group_speed_limit(session, archive.user_id)
+    return storage.archive_response(
+        request, sessionID, archive, storage.download_buckets(speed_limit, archive.user_id),
+    )
 
 @file_upload_router.post(
     path='/{sessionID}/{index}',
     summary='文件上传',
-    description='File upload endpoint.',
+    description='File upload endpoint. The request body is the raw chunk data.',
 )
-def router_file_upload(sessionID: str, index: int, file: UploadFile) -> ResponseModel:
+async def router_file_upload(
+    session: SessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    request: Request,
+    sessionID: uuid.UUID,
+    index: int,
+) -> ResponseModel:
     """
     File upload endpoint.
     
+    The raw request body is streamed straight to the chunk's offset in the preallocated data file
+    with a bounded buffer, so memory use does not grow with chunk size and each byte is written to disk once.
+    Once the last chunk arrives the data file is moved into the storage policy and the file is created.
+    
     Args:
-        sessionID (str): The session ID for the upload.
-        index (int): The index of the file being uploaded.
+        sessionID (UUID): The session ID for the upload.
+        index (int): The index of the chunk being uploaded, starting from 0.
     
     Returns:
         ResponseModel: A model containing the response data.
     """
-    pass
+    upload = await storage.UploadSessionStore.get(session, sessionID, user.id)
+    content_length = request.headers.get('content-length')
+    written = await storage.write_chunk(
+        upload,
+        index,
+        int(content_length) if content_length and content_length.isdigit() else None,
+        request.stream(),
+    )
+    file = await storage.complete_upload(session, upload)
+    if file is None:
+        return ResponseModel(data={'index': index, 'size': written})
+    return ResponseModel(data={'index': index, 'size': written, 'file': {'id': file.id, 'name': file.name}})
+
+@file_upload_router.get(
+    path='/{sessionID}',
+    summary='获取上传会话状态',
+    description='Get upload session status for resuming an upload.',
+)
+async def router_file_upload_session_status(
+    session: SessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    sessionID: uuid.UUID,
+) -> ResponseModel:
+    """
+    Get upload session status for resuming an upload.
+    
+    Args:
+        sessionID (UUID): The session ID for the upload.
+    
+    Returns:
+        ResponseModel: A model containing the chunk layout and the indexes already received.
+    """
+    upload = await storage.UploadSessionStore.get(session, sessionID, user.id)
+    return ResponseModel(
+        data={
+            'sessionID': str(upload.id),
+            'chunkSize': upload.chunk_size,
+            'chunkCount': upload.chunk_count,
+            'expires': upload.expires.isoformat(),
+            'received': await storage.received_chunks(upload),
+        }
+    )
 
 @file_upload_router.put(
     path='/',
     summary='创建上传会话',
     description='Create an upload session endpoint.',
-    dependencies=[Depends(SignRequired)],
 )
-def router_file_upload_session() -> ResponseModel:
+async def router_file_upload_session(
+    session: SessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    request: UploadSessionRequest,
+) -> ResponseModel:
     """
     Create an upload session endpoint.
     
+    When the client supplies the file's SHA256 and the storage policy already holds the same content,
+    the file is created immediately and no session is opened (instant upload).
+    
+    Args:
+        request (UploadSessionRequest): Target folder path, file name, size and optional SHA256.
+    
     Returns:
-        ResponseModel: A model containing the response data for the upload session.
+        ResponseModel: A model containing the response data for the upload session, or the created file.
     """
-    pass
+    folder = await Folder.resolve(session, user.id, request.path)
+    if folder is None:
+        raise HTTPException(status_code=404, detail="Folder not found")
+
+    if request.sha256:
+        file = await storage.instant_upload(session, user.id, folder, request.name, request.size, request.sha256)
+        if file is not None:
+            return ResponseModel(data={'file': {'id': file.id, 'name': file.name}})
+
+    upload = await storage.create_session(session, user.id, folder, request.name, request.size)
+    return ResponseModel(
+        data={
+            'sessionID': str(upload.id),
+            'chunkSize': upload.chunk_size,
+            'chunkCount': upload.chunk_count,
+            'expires': upload.expires.isoformat(),
+        }
+    )
 
 @file_upload_router.delete(
     path='/{sessionID}',
     summary='删除上传会话',
     description='Delete an upload session endpoint.',
-    dependencies=[Depends(SignRequired)]
 )
-def router_file_upload_session_delete(sessionID: str) -> ResponseModel:
+async def router_file_upload_session_delete(
+    session: SessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    sessionID: uuid.UUID,
+) -> ResponseModel:
     """
     Delete an upload session endpoint.
     
     Args:
-        sessionID (str): The session ID to delete.
+        sessionID (UUID): The session ID to delete.
     
     Returns:
         ResponseModel: A model containing the response data for the deletion.
     """
-    pass
+    upload = await storage.UploadSessionStore.get(session, sessionID, user.id)
+    await storage.UploadSessionStore.delete(session, [upload.id])
+    return ResponseModel(data=str(upload.id))
 
 @file_upload_router.delete(
     path='/',
     summary='清除所有上传会话',
     description='Clear all upload sessions endpoint.',
-    dependencies=[Depends(SignRequired)]
 )
-def router_file_upload_session_clear() -> ResponseModel:
+async def router_file_upload_session_clear(
+    session: SessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+) -> ResponseModel:
     """
     Clear all upload sessions endpoint.
     
+    All of the user's sessions are removed with one DELETE, together with their chunk directories.
+    
     Returns:
-        ResponseModel: A model containing the response data for clearing all sessions.
+        ResponseModel: A model containing the number of sessions cleared.
     """
-    pass
+    return ResponseModel(data=await storage.UploadSessionStore.clear_user(session, user.id))
 
 @file_router.put(
     path='/update/{id}',
@@ -222,19 +354,33 @@ def router_file_preview(id: str) -> ResponseModel:
     path='/content/{id}',
     summary='获取文本文件内容',
     description='Get text file content endpoint.',
-    dependencies=[Depends(SignRequired)]
 )
-def router_file_content(id: str) -> ResponseModel:
+async def router_file_content(
+    session: SessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    id: int,
+    offset: int = Query(default=0, ge=0),
+    length: int | None = Query(default=None, ge=16),
+) -> ResponseModel:
     """
     Get text file content endpoint.
     
+    At most `maxEditSize` bytes are returned per request; larger files are read
+    window by window, continuing from the returned `end`.
+    
     Args:
-        id (str): The ID of the text file.
+        id (int): The ID of the text file.
+        offset (int): The byte offset to start reading from.
+        length (int | None): The maximum number of bytes to read.
     
     Returns:
-        ResponseModel: A model containing the response data for the text file content.
+        ResponseModel: The decoded text, its encoding and the byte range it covers.
     """
-    pass
+    file = await File.get(session, File.id == id)
+    if file is None or file.user_id != user.id:
+        raise HTTPException(status_code=404, detail="File not found")
+    window = await storage.read_file_text(session, file, offset, length)
+    return ResponseModel(data=window._asdict())
 
 @file_router.get(
     path='/doc/{id}',
@@ -258,19 +404,52 @@ def router_file_doc(id: str) -> ResponseModel:
     path='/thumb/{id}',
     summary='获取文件缩略图',
     description='Get file thumbnail endpoint.',
-    dependencies=[Depends(SignRequired)]
 )
-def router_file_thumb(id: str) -> ResponseModel:
+async def router_file_thumb(
+    session: SessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    request: Request,
+    id: int,
+) -> Response:
     """
     Get file thumbnail endpoint.
     
+    Thumbnails are generated once and served from the on-disk cache afterwards.
+    
     Args:
-        id (str): The ID of the file to get the thumbnail for.
+        id (int): The ID of the file to get the thumbnail for.
     
     Returns:
-        ResponseModel: A model containing the response data for the file thumbnail.
+        Response: A JPEG thumbnail.
     """
-    pass
+    file = await File.get(session, File.id == id)
+    if file is None or file.user_id != user.id:
+        raise HTTPException(status_code=404, detail="File not found")
+    return await storage.serve_thumb(session, request, file)
+
+@file_router.post(
+    path='/thumbs',
+    summary='批量获取文件缩略图',
+    description='Get thumbnails of multiple files in one multipart response.',
+)
+async def router_file_thumbs(
+    session: SessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    request: ThumbBatchRequest,
+) -> StreamingResponse:
+    """
+    Get thumbnails of multiple files in one multipart response.
+    
+    Parts are streamed as soon as each thumbnail is ready; the `X-File-Id` and
+    `X-Status` part headers identify the file and whether the part is a JPEG or an error.
+    
+    Args:
+        request (ThumbBatchRequest): The IDs of the files.
+    
+    Returns:
+        StreamingResponse: A `multipart/mixed` response.
+    """
+    return await storage.batch_thumb_response(session, user.id, request.ids)
 
 @file_router.post(
     path='/source/{id}',
@@ -294,55 +473,84 @@ def router_file_source(id: str) -> ResponseModel:
     path='/archive',
     summary='打包要下载的文件',
     description='Archive files for download endpoint.',
-    dependencies=[Depends(SignRequired)]
 )
-def router_file_archive(id: str) -> ResponseModel:
+async def router_file_archive(
+    session: SessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    request: ArchiveRequest,
+) -> ResponseModel:
     """
     Archive files for download endpoint.
     
+    Resolves the selected files and folders once and returns a short-lived download URL.
+    
     Args:
-        id (str): The ID of the file to archive.
+        request (ArchiveRequest): The files and folders to archive.
     
     Returns:
-        ResponseModel: A model containing the response data for the archived files.
+        ResponseModel: A model containing the archive download URL.
     """
-    pass
+    session_id = await storage.create_archive(
+        session, user.id, request.files, request.folders, compress=request.compress,
+    )
+    return ResponseModel(data={'url': f"/api/file/upload/archive/{session_id}/archive.zip"})
 
 @file_router.post(
     path='/compress',
     summary='创建文件压缩任务',
     description='Create file compression task endpoint.',
-    dependencies=[Depends(SignRequired)]
 )
-def router_file_compress(id: str) -> ResponseModel:
+async def router_file_compress(
+    session: SessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    request: CompressRequest,
+) -> ResponseModel:
     """
     Create file compression task endpoint.
     
+    The archive is built in the task process pool, so compression never blocks the API event loop.
+    Progress is reported through the task list.
+    
     Args:
-        id (str): The ID of the file to compress.
+        request (CompressRequest): The files and folders to compress, and where to save the archive.
     
     Returns:
-        ResponseModel: A model containing the response data for the file compression task.
-    """
-    pass
+        ResponseModel: A model containing the ID of the created task.
+    """
+    dst = await Folder.resolve(session, user.id, request.path)
+    if dst is None:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    task_id = await task.create_compress_task(
+        session, user.id, request.files, request.folders, dst, request.name, compress=request.compress,
+    )
+    return ResponseModel(data={'task_id': task_id})
 
 @file_router.post(
     path='/decompress',
     summary='创建文件解压任务',
     description='Create file extraction task endpoint.',
-    dependencies=[Depends(SignRequired)]
 )
-def router_file_decompress(id: str) -> ResponseModel:
+async def router_file_decompress(
+    session: SessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    request: DecompressRequest,
+) -> ResponseModel:
     """
     Create file extraction task endpoint.
     
+    Only ZIP archives are supported. Entries are streamed out in the task process pool.
+    
     Args:
-        id (str): The ID of the file to decompress.
+        request (DecompressRequest): The archive file and the folder to extract into.
     
     Returns:
-        ResponseModel: A model containing the response data for the file extraction task.
+        ResponseModel: A model containing the ID of the created task.
     """
-    pass
+    dst = await Folder.resolve(session, user.id, request.path)
+    if dst is None:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    task_id = await task.create_decompress_task(session, user.id, request.id, dst)
+    return ResponseModel(data={'task_id': task_id})
 
 @file_router.post(
     path='/relocate',
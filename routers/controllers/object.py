@@ -1,6 +1,10 @@
-from fastapi import APIRouter, Depends
-from middleware.auth import SignRequired
-from models.response import ResponseModel
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException
+from middleware.auth import AuthRequired, SignRequired
+from middleware.dependencies import ReadSessionDep
+from models import File, Folder, User
+from models.response import ObjectPropertyModel, ResponseModel
 
 object_router = APIRouter(
     prefix="/object",
@@ -71,16 +75,49 @@ def router_object_rename() -> ResponseModel:
     path='/property/{id}',
     summary='获取对象属性',
     description='Get object properties endpoint.',
-    dependencies=[Depends(SignRequired)]
 )
-def router_object_property(id: str) -> ResponseModel:
+async def router_object_property(
+    session: ReadSessionDep,
+    user: Annotated[User, Depends(AuthRequired)],
+    id: int,
+    is_folder: bool = False,
+) -> ResponseModel:
     """
     Get object properties endpoint.
     
+    Folder size and child counts come from the rollup columns maintained on write,
+    so this is a constant-time read regardless of how large the subtree is.
+    
     Args:
-        id (str): The ID of the object to retrieve properties for.
+        id (int): The ID of the object to retrieve properties for.
+        is_folder (bool): Whether the object is a folder.
     
     Returns:
         ResponseModel: A model containing the response data for the object properties.
     """
-    pass
\ No newline at end of file
+    if is_folder:
+        folder = await Folder.get(session, (Folder.id == id) & (Folder.owner_id == user.id), load=Folder.policy)
+        if folder is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        prop = ObjectPropertyModel(
+            created_at=folder.created_at,
+            updated_at=folder.updated_at,
+            policy=folder.policy.name,
+            size=folder.size,
+            child_folder_num=folder.folder_count,
+            child_file_num=folder.file_count,
+            path=Folder.parent_path(folder.path) or '/',
+        )
+    else:
+        file = await File.get(session, (File.id == id) & (File.user_id == user.id), load=File.policy)
+        if file is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        folder = await Folder.get_exist_one(session, file.folder_id)
+        prop = ObjectPropertyModel(
+            created_at=file.created_at,
+            updated_at=file.updated_at,
+            policy=file.policy.name,
+            size=file.size,
+            path=folder.path,
+        )
+    return ResponseModel(data=prop.model_dump(mode='json'))
@@ -1,29 +1,51 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response
 from middleware.auth import SignRequired
+from middleware.dependencies import SessionDep
+from models import File, Folder, Share
 from models.response import ResponseModel
+from service import storage
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+SHARE_THUMB_CACHE_CONTROL = "public, max-age=86400"
+"""公开分享的缩略图可以由 CDN 等共享缓存保存"""
 
 share_router = APIRouter(
     prefix='/share',
     tags=["share"],
 )
 
-@share_router.get(
-    path='/{info}/{id}',
-    summary='获取分享',
-    description='Get shared content by info type and ID.',
-)
-def router_share_get(info: str, id: str) -> ResponseModel:
+async def _get_share(session: AsyncSession, code: str) -> Share:
     """
-    Get shared content by info type and ID.
-    
-    Args:
-        info (str): The type of information being shared.
-        id (str): The ID of the shared content.
-    
-    Returns:
-        dict: A dictionary containing shared content information.
+    取出可以预览的分享。
+
+    :raises HTTPException: 分享不存在或已过期（404）、不允许预览或设有密码（403）
+    """
+    share = await Share.get(session, Share.code == code)
+    if share is None or (share.expires is not None and share.expires <= datetime.now()):
+        raise HTTPException(status_code=404, detail="Share not found")
+    if not share.preview_enabled or share.password:
+        raise HTTPException(status_code=403, detail="Preview is not allowed")
+    return share
+
+async def _get_shared_file(session: AsyncSession, share: Share, path: str) -> File:
     """
-    pass
+    取出分享中的文件；目录分享时 `path` 为文件在分享目录中的路径，文件分享时忽略。
+
+    :raises HTTPException: 文件不存在（404）
+    """
+    if share.file_id is not None:
+        target = await File.get(session, File.id == share.file_id)
+    else:
+        shared = await Folder.get_exist_one(session, share.folder_id)
+        parent, _, name = path.strip('/').rpartition('/')
+        folder = await Folder.resolve(session, share.user_id, f"{shared.path}{parent}")
+        target = folder and await File.get(session, (File.folder_id == folder.id) & (File.name == name))
+    if target is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return target
 
 @share_router.put(
     path='/download/{id}',
@@ -81,17 +103,32 @@ def router_share_doc(id: str) -> ResponseModel:
     summary='获取文本文件内容',
     description='Get text file content by ID.',
 )
-def router_share_content(id: str) -> ResponseModel:
+async def router_share_content(
+    session: SessionDep,
+    id: str,
+    path: str = '',
+    offset: int = Query(default=0, ge=0),
+    length: int | None = Query(default=None, ge=16),
+) -> ResponseModel:
     """
     Get text file content by ID.
     
+    At most `maxEditSize` bytes are returned per request; larger files are read
+    window by window, continuing from the returned `end`.
+    
     Args:
-        id (str): The ID of the text file.
+        id (str): The ID of the shared content.
+        path (str): The path of the file inside a shared folder.
+        offset (int): The byte offset to start reading from.
+        length (int | None): The maximum number of bytes to read.
     
     Returns:
-        str: The content of the text file.
+        ResponseModel: The decoded text, its encoding and the byte range it covers.
     """
-    pass
+    share = await _get_share(session, id)
+    target = await _get_shared_file(session, share, path)
+    window = await storage.read_file_text(session, target, offset, length)
+    return ResponseModel(data=window._asdict())
 
 @share_router.get(
     path='/list/{id}/{path:path}',
@@ -152,35 +189,58 @@ def router_share_archive(id: str) -> ResponseModel:
     summary='获取README文本文件内容',
     description='Get README text file content by ID.',
 )
-def router_share_readme(id: str) -> ResponseModel:
+async def router_share_readme(session: SessionDep, id: str, path: str = '') -> ResponseModel:
     """
     Get README text file content by ID.
     
+    Looks for a README in the given folder of a shared folder. The decoded content
+    is cached per file version, so repeated views do not read the file again.
+    
     Args:
-        id (str): The ID of the README file.
+        id (str): The ID of the shared content.
+        path (str): The path of the folder inside the shared folder.
     
     Returns:
-        str: The content of the README file.
-    """
-    pass
+        ResponseModel: The README name and its decoded content.
+    """
+    share = await _get_share(session, id)
+    if share.folder_id is None:
+        raise HTTPException(status_code=404, detail="README not found")
+    shared = await Folder.get_exist_one(session, share.folder_id)
+    folder = await Folder.resolve(session, share.user_id, f"{shared.path}{path.strip('/')}")
+    readme = folder and await storage.find_readme(session, folder.id)
+    if readme is None:
+        raise HTTPException(status_code=404, detail="README not found")
+    name = readme.name
+    window = await storage.ReadmeCache.get(session, readme)
+    return ResponseModel(data={'name': name, **window._asdict()})
 
 @share_router.get(
-    path='/thumb/{id}/{file}',
+    path='/thumb/{id}/{file:path}',
     summary='获取缩略图',
     description='Get thumbnail image by ID and file name.',
 )
-def router_share_thumb(id: str, file: str) -> ResponseModel:
+async def router_share_thumb(
+    session: SessionDep,
+    request: Request,
+    id: str,
+    file: str,
+) -> Response:
     """
     Get thumbnail image by ID and file name.
     
+    For a folder share, `file` is the path of the file inside the shared folder.
+    
     Args:
         id (str): The ID of the shared content.
         file (str): The name of the file for which to get the thumbnail.
     
     Returns:
-        str: A Base64 encoded string of the thumbnail image.
+        Response: A JPEG thumbnail.
     """
-    pass
+    share = await _get_share(session, id)
+    target = await _get_shared_file(session, share, file)
+    return await storage.serve_thumb(session, request, target, cache_control=SHARE_THUMB_CACHE_CONTROL)
 
 @share_router.post(
     path='/report/{id}',
@@ -217,6 +277,24 @@ def router_share_search_public(keywords: str, type: str = 'all') -> ResponseMode
     """
     pass
 
+@share_router.get(
+    path='/{info}/{id}',
+    summary='获取分享',
+    description='Get shared content by info type and ID.',
+)
+def router_share_get(info: str, id: str) -> ResponseModel:
+    """
+    Get shared content by info type and ID.
+    
+    Args:
+        info (str): The type of information being shared.
+        id (str): The ID of the shared content.
+    
+    Returns:
+        dict: A dictionary containing shared content information.
+    """
+    pass
+
 #####################
 # 需要登录的接口
 #####################
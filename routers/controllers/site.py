@@ -1,32 +1,80 @@
-from fastapi import APIRouter
-from sqlalchemy import and_
+import hashlib
 import json
 
-from middleware.dependencies import SessionDep
+from fastapi import APIRouter, Request, Response
+
+from middleware.dependencies import ReadSessionDep
 from models.response import ResponseModel
-from models.setting import Setting
+from models.setting import SettingsCache, SettingsType
 
 site_router = APIRouter(
     prefix="/site",
     tags=["site"],
 )
 
+_site_config_rendered: tuple[int, bytes, str] | None = None
+"""预渲染的站点配置：(设置缓存版本, 响应体, ETag)"""
+
 
-async def _get_setting(session: SessionDep, type_: str, name: str) -> str | None:
-    """获取设置值"""
-    setting = await Setting.get(session, and_(Setting.type == type_, Setting.name == name))
-    return setting.value if setting else None
+def _render_site_config() -> tuple[bytes, str]:
+    """
+    根据设置缓存渲染站点配置响应体，并计算弱 ETag。
 
+    ETag 只由配置内容决定，不含每次渲染都不同的 `instance_id`，
+    各工作进程与重启前后的 ETag 保持一致。响应体并非逐字节相同，所以只能是弱 ETag。
 
-async def _get_setting_bool(session: SessionDep, type_: str, name: str) -> bool:
-    """获取布尔类型设置值"""
-    value = await _get_setting(session, type_, name)
-    return value == "1" if value else False
+    :return: (JSON 响应体, ETag)
+    """
+    model = ResponseModel(
+        data={
+            "title": SettingsCache.get(SettingsType.BASIC, "siteName"),
+            "loginCaptcha": SettingsCache.get_bool(SettingsType.LOGIN, "login_captcha"),
+            "regCaptcha": SettingsCache.get_bool(SettingsType.LOGIN, "reg_captcha"),
+            "forgetCaptcha": SettingsCache.get_bool(SettingsType.LOGIN, "forget_captcha"),
+            "emailActive": SettingsCache.get_bool(SettingsType.LOGIN, "email_active"),
+            "QQLogin": None,
+            "themes": SettingsCache.get_json(SettingsType.BASIC, "themes"),
+            "defaultTheme": SettingsCache.get(SettingsType.BASIC, "defaultTheme"),
+            "score_enabled": None,
+            "share_score_rate": None,
+            "home_view_method": SettingsCache.get(SettingsType.VIEW, "home_view_method"),
+            "share_view_method": SettingsCache.get(SettingsType.VIEW, "share_view_method"),
+            "authn": SettingsCache.get_bool(SettingsType.AUTHN, "authn_enabled"),
+            "user": {},
+            "captcha_type": None,
+            "captcha_ReCaptchaKey": SettingsCache.get(SettingsType.CAPTCHA, "captcha_ReCaptchaKey"),
+            "captcha_CloudflareKey": SettingsCache.get(SettingsType.CAPTCHA, "captcha_CloudflareKey"),
+            "captcha_tcaptcha_appid": None,
+            "site_notice": None,
+            "registerEnabled": SettingsCache.get_bool(SettingsType.REGISTER, "register_enabled"),
+            "app_promotion": None,
+            "wopi_exts": None,
+            "app_feedback": None,
+            "app_forum": None,
+        }
+    )
+    body = model.model_dump_json().encode('utf-8')
+    content = json.dumps(model.data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    etag = f'W/"{hashlib.sha256(content).hexdigest()[:32]}"'
+    return body, etag
 
-async def _get_setting_json(session: SessionDep, type_: str, name: str) -> dict | list | None:
-    """获取 JSON 类型设置值"""
-    value = await _get_setting(session, type_, name)
-    return json.loads(value) if value else None
+
+def _is_etag_matched(if_none_match: str | None, etag: str) -> bool:
+    """
+    判断 If-None-Match 请求头是否命中 ETag（按 RFC 9110 使用弱比较）。
+
+    :param if_none_match: If-None-Match 请求头的值
+    :param etag: 当前资源的 ETag
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque_tag = etag.removeprefix('W/')
+    return any(
+        candidate.strip().removeprefix('W/') == opaque_tag
+        for candidate in if_none_match.split(',')
+    )
 
 
 @site_router.get(
@@ -68,38 +116,29 @@ def router_site_captcha():
     description='Get the configuration file.',
     response_model=ResponseModel,
 )
-async def router_site_config(session: SessionDep):
+async def router_site_config(session: ReadSessionDep, request: Request) -> Response:
     """
     Get the configuration file.
 
+    响应体按设置缓存版本预渲染，命中 If-None-Match 时直接返回 304。
+
     Returns:
         dict: The site configuration.
     """
-    return ResponseModel(
-        data={
-            "title": await _get_setting(session, "basic", "siteName"),
-            "loginCaptcha": await _get_setting_bool(session, "login", "login_captcha"),
-            "regCaptcha": await _get_setting_bool(session, "login", "reg_captcha"),
-            "forgetCaptcha": await _get_setting_bool(session, "login", "forget_captcha"),
-            "emailActive": await _get_setting_bool(session, "login", "email_active"),
-            "QQLogin": None,
-            "themes": await _get_setting_json(session, "basic", "themes"),
-            "defaultTheme": await _get_setting(session, "basic", "defaultTheme"),
-            "score_enabled": None,
-            "share_score_rate": None,
-            "home_view_method": await _get_setting(session, "view", "home_view_method"),
-            "share_view_method": await _get_setting(session, "view", "share_view_method"),
-            "authn": await _get_setting_bool(session, "authn", "authn_enabled"),
-            "user": {},
-            "captcha_type": None,
-            "captcha_ReCaptchaKey": await _get_setting(session, "captcha", "captcha_ReCaptchaKey"),
-            "captcha_CloudflareKey": await _get_setting(session, "captcha", "captcha_CloudflareKey"),
-            "captcha_tcaptcha_appid": None,
-            "site_notice": None,
-            "registerEnabled": await _get_setting_bool(session, "register", "register_enabled"),
-            "app_promotion": None,
-            "wopi_exts": None,
-            "app_feedback": None,
-            "app_forum": None,
-        }
-    )
\ No newline at end of file
+    global _site_config_rendered
+
+    await SettingsCache.ensure_loaded(session)
+
+    version = SettingsCache.version()
+    if _site_config_rendered is None or _site_config_rendered[0] != version:
+        body, etag = _render_site_config()
+        _site_config_rendered = (version, body, etag)
+    _, body, etag = _site_config_rendered
+
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'public, no-cache',
+    }
+    if _is_etag_matched(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
@@ -1,7 +1,14 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import FileResponse
-from middleware.auth import SignRequired
+import hashlib
+from pathlib import Path
+from typing import Annotated
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
+from middleware.auth import DownloadSignRequired, SignRequired
 from models.response import ResponseModel
+from pkg.sign.sign import SignedClaims
+from service import storage
 
 slave_router = APIRouter(
     prefix="/slave",
@@ -68,19 +75,30 @@ def router_slave_download(speed: int, path: str, name: str) -> ResponseModel:
     path='/download/{sign}',
     summary='根据签名下载文件',
     description='Download a file based on its signature.',
-    dependencies=[Depends(SignRequired)],
 )
-def router_slave_download_by_sign(sign: str) -> FileResponse:
+async def router_slave_download_by_sign(
+    request: Request,
+    claims: Annotated[SignedClaims, Depends(DownloadSignRequired)],
+) -> Response:
     """
     Download a file based on its signature.
     
+    The signature carries the file path, expiry, speed limit and user, so the slave
+    serves the download without calling back to the master.
+    
     Args:
         sign (str): The signature of the file to be downloaded.
     
     Returns:
-        FileResponse: A response containing the file to be downloaded.
+        Response: A response containing the file to be downloaded.
     """
-    pass
+    path = Path(claims.path)
+    return await storage.file_response(
+        request,
+        path,
+        filename=claims.name or path.name,
+        buckets=storage.download_buckets(claims.speed, claims.user_id),
+    )
 
 @slave_router.get(
     path='/source/{speed}/{path}/{name}',
@@ -106,37 +124,59 @@ def router_slave_source(speed: int, path: str, name: str) -> ResponseModel:
     path='/source/{sign}',
     summary='根据签名获取文件',
     description='Get a file based on its signature.',
-    dependencies=[Depends(SignRequired)],
 )
-def router_slave_source_by_sign(sign: str) -> FileResponse:
+async def router_slave_source_by_sign(
+    request: Request,
+    claims: Annotated[SignedClaims, Depends(DownloadSignRequired)],
+) -> Response:
     """
     Get a file based on its signature.
     
+    Same as the signed download, but served inline so browsers and players can open it directly.
+    
     Args:
         sign (str): The signature of the file to be retrieved.
     
     Returns:
-        FileResponse: A response containing the file to be retrieved.
+        Response: A response containing the file to be retrieved.
     """
-    pass
+    path = Path(claims.path)
+    return await storage.file_response(
+        request,
+        path,
+        filename=claims.name or path.name,
+        inline=True,
+        buckets=storage.download_buckets(claims.speed, claims.user_id),
+    )
 
 @slave_router.get(
-    path='/thumb/{id}',
+    path='/thumb/{sign}',
     summary='获取缩略图',
-    description='Get a thumbnail image based on its ID.',
-    dependencies=[Depends(SignRequired)],
+    description='Get a thumbnail image based on its signature.',
 )
-def router_slave_thumb(id: str) -> ResponseModel:
+async def router_slave_thumb(
+    request: Request,
+    claims: Annotated[SignedClaims, Depends(DownloadSignRequired)],
+) -> Response:
     """
-    Get a thumbnail image based on its ID.
+    Get a thumbnail image based on its signature.
+    
+    The slave has no database, so the cache key is derived from the path, size and
+    modification time of the source file.
     
     Args:
-        id (str): The ID of the thumbnail image.
+        sign (str): The signature of the source image.
     
     Returns:
-        ResponseModel: A response model containing the Base64 encoded thumbnail image.
+        Response: A JPEG thumbnail.
     """
-    pass
+    path = Path(claims.path)
+    try:
+        stat_result = await anyio.Path(path).stat()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    digest = hashlib.sha256(f"{path}:{stat_result.st_size}:{stat_result.st_mtime_ns}".encode()).hexdigest()
+    return await storage.thumb_response(request, digest, path)
 
 @slave_router.delete(
     path='/delete',
@@ -1,15 +1,14 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy import and_
 from webauthn import generate_registration_options
 from webauthn.helpers import options_to_json_dict
 
 import models
 import service
 from middleware.auth import AuthRequired
-from middleware.dependencies import SessionDep
+from middleware.dependencies import ReadSessionDep, SessionDep
 
 user_router = APIRouter(
     prefix="/user",
@@ -227,7 +226,8 @@ async def router_user_me(
     description='Get user storage information.',
     dependencies=[Depends(AuthRequired)],
 )
-def router_user_storage(
+async def router_user_storage(
+    session: SessionDep,
     user: Annotated[models.user.User, Depends(AuthRequired)],
 ) -> models.response.ResponseModel:
     """
@@ -236,11 +236,12 @@ def router_user_storage(
     Returns:
         dict: A dictionary containing user storage information.
     """
+    used, total = await service.storage.get_usage(session, user.id)
     return models.response.ResponseModel(
         data={
-            "used": 0,
-            "free": 0,
-            "total": 0,
+            "used": used,
+            "free": max(total - used, 0),
+            "total": total,
         }
     )
 
@@ -261,25 +262,17 @@ async def router_user_authn_start(
         dict: A dictionary containing WebAuthn initialization information.
     """
     # TODO: 检查 WebAuthn 是否开启，用户是否有注册过 WebAuthn 设备等
-    authn_setting = await models.Setting.get(
-        session,
-        and_(models.Setting.type == "authn", models.Setting.name == "authn_enabled")
-    )
-    if not authn_setting or authn_setting.value != "1":
+    await models.setting.SettingsCache.ensure_loaded(session)
+
+    if not models.setting.SettingsCache.get_bool(models.setting.SettingsType.AUTHN, "authn_enabled"):
         raise HTTPException(status_code=400, detail="WebAuthn is not enabled")
 
-    site_url_setting = await models.Setting.get(
-        session,
-        and_(models.Setting.type == "basic", models.Setting.name == "siteURL")
-    )
-    site_title_setting = await models.Setting.get(
-        session,
-        and_(models.Setting.type == "basic", models.Setting.name == "siteTitle")
-    )
+    site_url = models.setting.SettingsCache.get(models.setting.SettingsType.BASIC, "siteURL", "")
+    site_title = models.setting.SettingsCache.get(models.setting.SettingsType.BASIC, "siteTitle", "")
 
     options = generate_registration_options(
-        rp_id=site_url_setting.value if site_url_setting else "",
-        rp_name=site_title_setting.value if site_title_setting else "",
+        rp_id=site_url,
+        rp_name=site_title,
         user_name=user.username,
         user_display_name=user.nick or user.username,
     )
@@ -336,14 +329,55 @@ def router_user_settings_nodes() -> models.response.ResponseModel:
     description='Get user task queue.',
     dependencies=[Depends(AuthRequired)],
 )
-def router_user_settings_tasks() -> models.response.ResponseModel:
+async def router_user_settings_tasks(
+    session: ReadSessionDep,
+    user: Annotated[models.user.User, Depends(AuthRequired)],
+    cursor: str | None = None,
+    page_size: int = Query(default=20, ge=1, le=100),
+) -> models.response.ResponseModel:
     """
-    Get user task queue.
+    Get user task queue, newest first, with cursor pagination.
+    
+    Args:
+        cursor (str | None): The `next_cursor` returned by the previous page.
+        page_size (int): The number of tasks per page.
     
     Returns:
-        dict: A dictionary containing the user's task queue information.
+        dict: A dictionary containing the user's tasks and the next page cursor.
     """
-    pass
+    page = await models.Task.get_page(session, models.Task.user_id == user.id, cursor=cursor, limit=page_size)
+    return models.response.ResponseModel(
+        data={
+            'items': [task.model_dump(mode='json') for task in page.items],
+            'next_cursor': page.next_cursor,
+        }
+    )
+
+@user_settings_router.delete(
+    path='/tasks/{id}',
+    summary='取消任务',
+    description='Cancel a queued or running task.',
+    dependencies=[Depends(AuthRequired)],
+)
+async def router_user_settings_task_cancel(
+    session: SessionDep,
+    user: Annotated[models.user.User, Depends(AuthRequired)],
+    id: int,
+) -> models.response.ResponseModel:
+    """
+    Cancel a queued or running task. The worker process stops at its next progress check;
+    a task running in another server process stops after that process's next heartbeat.
+    
+    Args:
+        id (int): The ID of the task.
+    
+    Returns:
+        dict: Whether the task had not finished yet.
+    """
+    task = await models.Task.get(session, models.Task.id == id)
+    if task is None or task.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return models.response.ResponseModel(data={'cancelled': await service.task.TaskExecutor.cancel(id)})
 
 @user_settings_router.get(
     path='/',
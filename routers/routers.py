@@ -39,6 +39,7 @@ Router: list[APIRouter] = [
     admin.admin_file_router,
     admin.admin_aria2_router,
     admin.admin_policy_router,
+    admin.admin_share_router,
     admin.admin_task_router,
     admin.admin_vas_router,
     slave.slave_router,
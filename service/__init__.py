@@ -2,4 +2,6 @@
 服务层
 """
 
-from .user import login
\ No newline at end of file
+from .user import login
+from . import storage
+from . import task
@@ -0,0 +1,43 @@
+from .archive import ArchiveSessionStore, archive_response, create_archive, resolve_entries
+from .blob import blob_path, instant_upload, link_file, purge_blobs, store_blob
+from .download import (
+    ZeroCopyFileResponse,
+    download_buckets,
+    file_response,
+    group_speed_limit,
+    is_not_modified,
+    serve_file,
+)
+from .hashing import HASH_ALGORITHMS, MultiHasher
+from .quota import (
+    add_file,
+    calibrate_storage,
+    can_fit,
+    get_capacity,
+    get_usage,
+    invalidate_capacity,
+    invalidate_group_capacity,
+)
+from .rollup import reconcile_all_rollups, run_rollup_reconciler
+from .slave import node_base_url, slave_download_url, slave_request_headers
+from .text import README_NAMES, ReadmeCache, find_readme, max_edit_size, read_file_text
+from .thumb import (
+    THUMB_CACHE_CONTROL,
+    ThumbCache,
+    batch_thumb_response,
+    serve_thumb,
+    thumb_response,
+    thumb_root,
+)
+from .upload import (
+    UploadHashStore,
+    UploadSessionStore,
+    chunk_marker,
+    complete_lock,
+    complete_upload,
+    create_session,
+    data_path,
+    received_chunks,
+    session_dir,
+    write_chunk,
+)
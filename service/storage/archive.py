@@ -0,0 +1,234 @@
+import uuid
+from collections.abc import Sequence
+from pathlib import Path
+from typing import ClassVar, NamedTuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlmodel import and_
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.responses import FileResponse, MalformedRangeHeader, RangeNotSatisfiable
+
+from models.file import File
+from models.folder import Folder
+from models.policy import Policy
+from models.setting import SettingsCache, SettingsType
+from pkg.archive.zipstream import ZipEntry, ZipStream
+from pkg.cache.lru import LRUCache
+from pkg.conf import appmeta
+from pkg.ratelimit.bucket import TokenBucket, throttle
+
+ARCHIVE_NAME = "archive.zip"
+
+
+class ArchiveSession(NamedTuple):
+    """一次打包下载：创建时就解析好条目，下载时不再查询数据库"""
+
+    user_id: int
+    """发起打包的用户ID"""
+
+    entries: list[ZipEntry]
+    """压缩包条目"""
+
+    compress: bool
+    """是否压缩"""
+
+
+class ArchiveSessionStore:
+    """
+    打包下载会话，保存在内存中。
+
+    会话在 `archive_timeout` 秒后过期；同一会话可以多次下载，断点续传时重新请求同一地址即可。
+    每个会话都持有完整的条目列表，最多保存 `ARCHIVE_SESSION_CACHE_SIZE` 个，创建新会话时顺带清除已过期的会话。
+    """
+
+    _sessions: ClassVar[LRUCache[uuid.UUID, ArchiveSession]] = LRUCache(maxsize=appmeta.archive_session_cache_size)
+    """会话ID -> 会话"""
+
+    @classmethod
+    def add(cls, archive: ArchiveSession, ttl: float) -> uuid.UUID:
+        """
+        :param archive: 会话
+        :param ttl: 会话存活秒数
+        :return: 会话ID
+        """
+        cls._sessions.prune()
+        session_id = uuid.uuid4()
+        cls._sessions.set(session_id, archive, ttl=ttl)
+        return session_id
+
+    @classmethod
+    def get(cls, session_id: uuid.UUID) -> ArchiveSession:
+        """
+        :raises HTTPException: 会话不存在或已过期（404）
+        """
+        archive = cls._sessions.get(session_id)
+        if archive is None:
+            raise HTTPException(status_code=404, detail="Archive session not found")
+        return archive
+
+
+def _unique_name(name: str, used: set[str]) -> str:
+    """同一层出现重名时改为 `名称 (2).扩展名`"""
+    if name not in used:
+        used.add(name)
+        return name
+    stem, dot, extension = name.rpartition('.')
+    if not stem:
+        stem, dot, extension = name, '', ''
+    index = 2
+    while (candidate := f"{stem} ({index}){dot}{extension}") in used:
+        index += 1
+    used.add(candidate)
+    return candidate
+
+
+def _zip_entry(file: File, name: str) -> ZipEntry:
+    return ZipEntry(
+        name=name,
+        path=Path(file.source_name),
+        size=file.size,
+        mtime=file.updated_at,
+        crc32=int(file.crc32, 16) if file.crc32 else None,
+    )
+
+
+async def resolve_entries(
+        session: AsyncSession,
+        user_id: int,
+        file_ids: Sequence[int],
+        folder_ids: Sequence[int],
+) -> list[ZipEntry]:
+    """
+    把选中的文件与目录解析为压缩包条目。
+
+    选中的文件与目录放在压缩包的顶层，目录保留其下的完整结构（含空目录），顶层重名时自动改名。
+
+    :param session: 数据库会话
+    :param user_id: 用户ID，只能打包自己的文件
+    :param file_ids: 选中的文件ID
+    :param folder_ids: 选中的目录ID
+    :raises HTTPException: 未选择任何内容（400）、文件或目录不存在（404）、存储策略不是本地策略（501）
+    """
+    if not file_ids and not folder_ids:
+        raise HTTPException(status_code=400, detail="Nothing to archive")
+
+    selected: list[File] = []
+    if file_ids:
+        selected = await File.get(
+            session, and_(File.user_id == user_id, File.id.in_(file_ids)), fetch_mode="all", order_by=[File.name],
+        )
+        if len(selected) != len(set(file_ids)):
+            raise HTTPException(status_code=404, detail="File not found")
+
+    folders: list[Folder] = []
+    if folder_ids:
+        folders = await Folder.get(
+            session,
+            and_(Folder.owner_id == user_id, Folder.id.in_(folder_ids)),
+            fetch_mode="all",
+            order_by=[Folder.name],
+        )
+        if len(folders) != len(set(folder_ids)):
+            raise HTTPException(status_code=404, detail="Folder not found")
+
+    used: set[str] = set()
+    files: list[tuple[File, str]] = []
+    entries: list[ZipEntry] = []
+    for folder in folders:
+        # 目录在包内的前缀：目录ID -> `选中目录名/子路径/`
+        base = _unique_name(folder.name or "root", used) + '/'
+        prefixes: dict[int, str] = {}
+        for descendant in await folder.get_descendants(session, include_self=True):
+            prefixes[descendant.id] = base + descendant.path[len(folder.path):]
+            entries.append(ZipEntry(prefixes[descendant.id], None, 0, descendant.updated_at))
+
+        children: list[File] = await File.get(session, File.folder_id.in_(list(prefixes)), fetch_mode="all")
+        files.extend(sorted(((file, prefixes[file.folder_id] + file.name) for file in children), key=lambda x: x[1]))
+    files.extend((file, _unique_name(file.name, used)) for file in selected)
+
+    policy_ids = {file.policy_id for file, _ in files}
+    if policy_ids:
+        policies = await Policy.get(session, Policy.id.in_(policy_ids), fetch_mode="all")
+        if any(policy.type != 'local' for policy in policies):
+            raise HTTPException(status_code=501, detail="Only local storage policy is supported")
+    if any(not file.source_name for file, _ in files):
+        raise HTTPException(status_code=404, detail="File not found")
+    entries.extend(_zip_entry(file, name) for file, name in files)
+    return entries
+
+
+async def create_archive(
+        session: AsyncSession,
+        user_id: int,
+        file_ids: Sequence[int],
+        folder_ids: Sequence[int],
+        *,
+        compress: bool = True,
+) -> uuid.UUID:
+    """
+    创建打包下载会话，条目由 :func:`resolve_entries` 解析。
+
+    :param session: 数据库会话
+    :param user_id: 用户ID
+    :param file_ids: 选中的文件ID
+    :param folder_ids: 选中的目录ID
+    :param compress: 是否压缩
+    :return: 会话ID
+    """
+    entries = await resolve_entries(session, user_id, file_ids, folder_ids)
+    timeout = SettingsCache.get_int(SettingsType.TIMEOUT, "archive_timeout", 60)
+    return ArchiveSessionStore.add(ArchiveSession(user_id=user_id, entries=entries, compress=compress), timeout)
+
+
+def archive_response(
+        request: Request,
+        session_id: uuid.UUID,
+        archive: ArchiveSession,
+        buckets: Sequence[TokenBucket] = (),
+) -> Response:
+    """
+    流式输出压缩包。
+
+    全部条目都直接存储时带上 `Content-Length`；CRC32 也都已知时还支持单段 Range 与 `If-Range`，
+    同一会话的输出逐字节一致，下载器可以断点续传、多线程分段下载。多段 Range 按完整内容响应。
+
+    :param request: 请求
+    :param session_id: 会话ID，作为 ETag
+    :param archive: 会话
+    :param buckets: 限速使用的令牌桶，为空时不限速
+    :raises HTTPException: Range 无法满足（416）
+    """
+    stream = ZipStream(archive.entries, compress=archive.compress)
+    size = stream.size
+    etag = f'"{session_id.hex}"'
+    headers = {
+        'content-disposition': f'attachment; filename="{ARCHIVE_NAME}"',
+        'etag': etag,
+        'accept-ranges': 'bytes' if stream.seekable else 'none',
+    }
+    status_code, start, end = 200, 0, None
+
+    http_range = request.headers.get('range')
+    http_if_range = request.headers.get('if-range')
+    if stream.seekable and http_range and (http_if_range is None or http_if_range == etag):
+        try:
+            # 复用 FileResponse 的 Range 解析（私有方法），Starlette 的版本范围见 pyproject.toml
+            ranges = FileResponse._parse_range_header(http_range, size)
+        except MalformedRangeHeader as e:
+            raise HTTPException(status_code=400, detail=e.content)
+        except RangeNotSatisfiable:
+            raise HTTPException(status_code=416, headers={'content-range': f"bytes */{size}"})
+        if len(ranges) == 1:
+            status_code, (start, end) = 206, ranges[0]
+            headers['content-range'] = f"bytes {start}-{end - 1}/{size}"
+
+    if size is not None:
+        headers['content-length'] = str((end if end is not None else size) - start)
+
+    return StreamingResponse(
+        throttle(stream.stream(start, end), buckets),
+        status_code=status_code,
+        media_type='application/zip',
+        headers=headers,
+    )
@@ -0,0 +1,168 @@
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import anyio
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.blob import Blob
+from models.file import File
+from models.folder import Folder
+from models.policy import Policy
+from pkg.fs.zerocopy import move_file
+
+from .quota import add_file
+
+PURGE_GRACE = timedelta(minutes=10)
+"""引用计数降到 0 后至少保留这么久才清理，失败的上传可以在此期间重试并复用已入库的内容"""
+
+
+def blob_path(policy: Policy, sha256: str, token: uuid.UUID) -> Path:
+    """
+    本地存储策略下 Blob 的物理位置：`<策略路径>/blobs/<前两位>/<SHA256>_<入库令牌>`。
+
+    文件名带上入库时的唯一令牌，旧 Blob 正在被清理时写入同样内容的新 Blob 也不会互相覆盖。
+    """
+    return Path(policy.server or "uploads") / "blobs" / sha256[:2] / f"{sha256}_{token.hex}"
+
+
+async def store_blob(
+        session: AsyncSession,
+        policy: Policy,
+        source: Path,
+        size: int,
+        digests: dict[str, str],
+        token: uuid.UUID,
+) -> Blob:
+    """
+    按内容入库：已有相同内容时直接复用，否则把 `source` 移动到 Blob 目录并登记。
+
+    返回的 Blob 已为调用方持有一次引用，与复用或登记在同一事务内取得，挂上文件之前不会被清理任务删除；
+    调用方随后用 :func:`link_file` 把这次引用交给文件记录。
+    复用已有 Blob 时 `source` 保持不动，由调用方删除。调用方必须保证移动之后不再有人写入 `source`。
+
+    :param session: 数据库会话
+    :param policy: 存储策略
+    :param source: 完整的上传数据
+    :param size: 文件大小（字节）
+    :param digests: 算法名 -> 十六进制摘要，需包含 sha256
+    :param token: 入库令牌（上传会话ID）
+    :raises HTTPException: 抢先入库的相同内容已被清理（409），此时 `source` 保持不动
+    """
+    sha256 = digests['sha256']
+    # 取得引用会提交事务，`policy` 随之过期，先取出需要的字段
+    policy_id, destination = policy.id, blob_path(policy, sha256, token)
+    condition = Blob.content_condition(policy_id, sha256, size)
+    blob = await Blob.acquire(session, condition)
+    if blob is not None:
+        return blob
+
+    await anyio.to_thread.run_sync(move_file, source, destination)
+    try:
+        return await Blob(
+            sha256=sha256,
+            size=size,
+            md5=digests.get('md5'),
+            sha1=digests.get('sha1'),
+            crc32=digests.get('crc32'),
+            source_name=str(destination),
+            ref_count=1,
+            policy_id=policy_id,
+        ).save(session)
+    except IntegrityError:
+        # 相同内容的另一个上传抢先入库，取得它的引用之后才能删除刚移入的数据
+        await session.rollback()
+        blob = await Blob.acquire(session, condition)
+        if blob is None:
+            # 抢先入库的 Blob 随即被清理，数据移回原处，由调用方决定是否重试
+            await anyio.to_thread.run_sync(move_file, destination, source)
+            raise HTTPException(status_code=409, detail="Blob no longer exists")
+        await anyio.Path(destination).unlink(missing_ok=True)
+        return blob
+
+
+async def link_file(
+        session: AsyncSession,
+        blob_id: int,
+        user_id: int,
+        folder: Folder,
+        name: str,
+) -> File:
+    """
+    为 Blob 创建一个文件记录，调用方持有的那次引用（见 :func:`store_blob`）交给这个文件。
+    写入失败时放弃这次引用，Blob 的去留交给清理任务。
+
+    :param session: 数据库会话
+    :param blob_id: Blob ID，调用方已持有一次引用
+    :param user_id: 用户ID
+    :param folder: 所在目录
+    :param name: 文件名
+
+    :raises HTTPException: 同名文件已存在（409）、超出容量（413）
+    """
+    blob = await Blob.get_exist_one(session, blob_id)
+
+    file = File(
+        name=name,
+        source_name=blob.source_name,
+        size=blob.size,
+        md5=blob.md5,
+        sha1=blob.sha1,
+        crc32=blob.crc32,
+        sha256=blob.sha256,
+        user_id=user_id,
+        policy_id=blob.policy_id,
+        blob_id=blob.id,
+    )
+    try:
+        return await add_file(session, file, folder)
+    except BaseException:
+        await session.rollback()
+        await Blob.release_one(session, blob_id)
+        raise
+
+
+async def instant_upload(
+        session: AsyncSession,
+        user_id: int,
+        folder: Folder,
+        name: str,
+        size: int,
+        sha256: str,
+) -> File | None:
+    """
+    秒传：目标目录所在的存储策略中已有相同内容时，不传输数据直接创建文件。
+
+    :param session: 数据库会话
+    :param user_id: 用户ID
+    :param folder: 目标目录
+    :param name: 文件名
+    :param size: 文件大小（字节）
+    :param sha256: 客户端计算的 SHA256
+    :return: 新文件；没有相同内容时返回 None，客户端照常分块上传
+    """
+    folder_id, policy_id = folder.id, await folder.awaitable_attrs.policy_id
+    # 先取得引用再创建文件，清理任务不会在两步之间删除它
+    blob = await Blob.acquire(session, Blob.content_condition(policy_id, sha256, size))
+    if blob is None:
+        return None
+    blob_id = blob.id
+    # 取得引用提交了事务，之前取出的实例已过期，重新取出目录
+    folder = await Folder.get_exist_one(session, folder_id)
+    return await link_file(session, blob_id, user_id, folder, name)
+
+
+async def purge_blobs(session: AsyncSession) -> int:
+    """
+    删除不再被任何文件引用的 Blob 及其物理文件。
+
+    :param session: 数据库会话
+    :return: 删除的 Blob 数量
+    """
+    sources = await Blob.purge(session, datetime.now() - PURGE_GRACE)
+    await anyio.to_thread.run_sync(
+        lambda: [Path(source).unlink(missing_ok=True) for source in sources]
+    )
+    return len(sources)
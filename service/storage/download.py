@@ -0,0 +1,256 @@
+import os
+from collections.abc import Sequence
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from secrets import token_hex
+
+import anyio
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.file import File
+from models.group import Group
+from models.policy import Policy
+from models.setting import SettingsCache, SettingsType
+from models.user import User
+from pkg.ratelimit.bucket import SharedBuckets, TokenBucket, consume_all
+
+
+class ZeroCopyFileResponse(FileResponse):
+    """
+    在 FileResponse 的基础上支持 ASGI `http.response.zerocopy` 扩展。
+
+    Range（单段、多段）、`If-Range` 与 `http.response.pathsend` 由 FileResponse 处理；
+    服务器声明支持 zerocopy 时，整个文件与单段 Range 交给服务器用 sendfile 直接从内核发送，
+    数据不经过 Python。多段 Range 需要在各段之间插入分隔头，仍按块读取发送。
+
+    FileResponse 的多段 Range 把 `multipart/byteranges` 写进了 `Content-Range`，
+    `Content-Type` 仍是文件本身的类型，结尾还比 `Content-Length` 多发一个换行，客户端无法解析，这里一并修正。
+
+    传入令牌桶时按块限速发送，此时数据必须经过 Python，不使用 zerocopy 与 pathsend。
+
+    这里覆盖了 FileResponse 的私有方法 `_handle_simple` 等，pyproject.toml 中 Starlette 的版本范围
+    需要与之保持一致，升级前先核对这些方法的签名。
+    """
+
+    _zerocopy: bool = False
+
+    def __init__(self, *args, buckets: Sequence[TokenBucket] = (), **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = buckets
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.buckets:
+            self._zerocopy = "http.response.zerocopy" in scope.get("extensions", {})
+            return await super().__call__(scope, receive, send)
+
+        async def throttled_send(message) -> None:
+            if message["type"] == "http.response.body" and message.get("body"):
+                await consume_all(self.buckets, len(message["body"]))
+            await send(message)
+
+        extensions = {k: v for k, v in scope.get("extensions", {}).items() if k != "http.response.pathsend"}
+        await super().__call__({**scope, "extensions": extensions}, receive, throttled_send)
+
+    async def _send_zerocopy(self, send: Send, offset: int, count: int) -> None:
+        async with await anyio.open_file(self.path, 'rb') as file:
+            await send({
+                "type": "http.response.zerocopy",
+                "file": file.wrapped,
+                "offset": offset,
+                "count": count,
+                "more_body": False,
+            })
+
+    async def _handle_simple(self, send: Send, send_header_only: bool, send_pathsend: bool) -> None:
+        if not self._zerocopy or send_header_only or send_pathsend:
+            return await super()._handle_simple(send, send_header_only, send_pathsend)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await self._send_zerocopy(send, 0, int(self.headers["content-length"]))
+
+    async def _handle_single_range(
+            self, send: Send, start: int, end: int, file_size: int, send_header_only: bool
+    ) -> None:
+        if not self._zerocopy or send_header_only:
+            return await super()._handle_single_range(send, start, end, file_size, send_header_only)
+        self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        await self._send_zerocopy(send, start, end - start)
+
+    async def _handle_multiple_ranges(
+            self, send: Send, ranges: list[tuple[int, int]], file_size: int, send_header_only: bool
+    ) -> None:
+        boundary = token_hex(13)
+        content_length, header_generator = self.generate_multipart(
+            ranges, boundary, file_size, self.headers["content-type"]
+        )
+        self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+        self.headers["content-length"] = str(content_length)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        if send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            for start, end in ranges:
+                await send({"type": "http.response.body", "body": header_generator(start, end), "more_body": True})
+                await file.seek(start)
+                while start < end:
+                    chunk = await file.read(min(self.chunk_size, end - start))
+                    start += len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                await send({"type": "http.response.body", "body": b"\n", "more_body": True})
+        await send({"type": "http.response.body", "body": f"--{boundary}--\n".encode("latin-1"), "more_body": False})
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """`If-None-Match` 使用弱比较"""
+    if header.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque for tag in header.split(','))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """
+    按 `If-None-Match` / `If-Modified-Since` 判断客户端缓存是否仍然有效。
+
+    两者同时出现时只看 `If-None-Match`（RFC 9110 13.2.2）。
+
+    :param request: 请求
+    :param etag: 当前的 ETag
+    :param last_modified: 当前的修改时间（Unix 时间戳）
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since.timestamp()
+    return False
+
+
+def download_buckets(speed_limit: int, user_id: int | None = None) -> list[TokenBucket]:
+    """
+    按用户组限速构造一次下载使用的令牌桶。
+
+    每个连接各有一个桶；开启 `basic.speed_limit_per_user` 后，同一用户的全部连接还共享一个总桶，
+    多线程下载器不能靠多开连接绕过限速。
+
+    :param speed_limit: 限速（KB/s），0 为不限速
+    :param user_id: 共享总桶的用户ID
+    """
+    if speed_limit <= 0:
+        return []
+    rate = speed_limit * 1024
+    buckets = [TokenBucket(rate)]
+    if user_id is not None and SettingsCache.get_bool(SettingsType.BASIC, "speed_limit_per_user"):
+        buckets.append(SharedBuckets.get(user_id, rate))
+    return buckets
+
+
+async def group_speed_limit(session: AsyncSession, user_id: int) -> int:
+    """用户所在用户组的下载限速（KB/s），0 为不限速"""
+    return (await session.exec(
+        select(Group.speed_limit).join(User, User.group_id == Group.id).where(User.id == user_id)
+    )).first() or 0
+
+
+async def file_response(
+        request: Request,
+        path: Path,
+        *,
+        filename: str,
+        etag: str | None = None,
+        inline: bool = False,
+        buckets: Sequence[TokenBucket] = (),
+        cache_control: str | None = None,
+) -> Response:
+    """
+    输出本地文件，支持条件请求（304）、Range（206，单段与多段）与 `If-Range`。
+
+    :param request: 请求
+    :param path: 文件位置
+    :param filename: 下载时的文件名
+    :param etag: 强 ETag（含引号），为 None 时按修改时间与大小生成
+    :param inline: 是否在浏览器中直接打开（`Content-Disposition: inline`）
+    :param buckets: 限速使用的令牌桶，为空时不限速
+    :param cache_control: `Cache-Control` 响应头，304 响应也会带上
+    :raises HTTPException: 文件不存在时抛出 404
+    """
+    try:
+        stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    headers = {}
+    if etag:
+        headers['etag'] = etag
+    if cache_control:
+        headers['cache-control'] = cache_control
+    response = ZeroCopyFileResponse(
+        path,
+        filename=filename,
+        stat_result=stat_result,
+        headers=headers or None,
+        content_disposition_type='inline' if inline else 'attachment',
+        buckets=buckets,
+    )
+    if is_not_modified(request, response.headers['etag'], stat_result.st_mtime):
+        not_modified_headers = {
+            'etag': response.headers['etag'],
+            'last-modified': formatdate(stat_result.st_mtime, usegmt=True),
+        }
+        if cache_control:
+            not_modified_headers['cache-control'] = cache_control
+        return Response(status_code=304, headers=not_modified_headers)
+    return response
+
+
+async def serve_file(
+        session: AsyncSession,
+        request: Request,
+        file: File,
+        *,
+        inline: bool = False,
+        user_id: int | None = None,
+) -> Response:
+    """
+    输出文件内容。内容寻址存储下 SHA256 就是天然的强 ETag，同一内容的不同文件共享客户端缓存。
+
+    :param session: 数据库会话
+    :param request: 请求
+    :param file: 文件
+    :param inline: 是否在浏览器中直接打开
+    :param user_id: 按该用户所在用户组的 `speed_limit` 限速，默认为文件所有者
+    :raises HTTPException: 存储策略不是本地策略（501）、物理文件不存在（404）
+    """
+    policy = await Policy.get_exist_one(session, file.policy_id)
+    if policy.type != 'local':
+        raise HTTPException(status_code=501, detail="Only local storage policy is supported")
+    if not file.source_name:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    user_id = user_id if user_id is not None else file.user_id
+    speed_limit = await group_speed_limit(session, user_id)
+
+    return await file_response(
+        request,
+        Path(file.source_name),
+        filename=file.name,
+        etag=f'"{file.sha256}"' if file.sha256 else None,
+        inline=inline,
+        buckets=download_buckets(speed_limit, user_id),
+    )
@@ -0,0 +1,133 @@
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import func, or_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.file import File
+from models.folder import Folder
+from models.group import Group
+from models.storage_pack import StoragePack
+from models.user import User
+from pkg.cache.lru import LRUCache
+from pkg.conf import appmeta
+
+
+class _Capacity(NamedTuple):
+    group_id: int
+    """用户所在的用户组ID，用于按组失效"""
+
+    total: int
+    """容量上限（字节）"""
+
+    valid_until: datetime | None
+    """最早到期的容量包的过期时间，到达后需要重新计算"""
+
+
+_capacity_cache: LRUCache[int, _Capacity] = LRUCache(maxsize=appmeta.auth_cache_size, ttl=appmeta.quota_cache_ttl)
+"""用户ID -> 容量上限"""
+
+
+def invalidate_capacity(user_id: int) -> None:
+    """
+    用户更换用户组、购买或失效容量包后，使其容量缓存失效。
+
+    :param user_id: 用户ID
+    """
+    _capacity_cache.pop(user_id)
+
+
+def invalidate_group_capacity(group_id: int) -> None:
+    """
+    用户组的 `max_storage` 修改或用户组被删除后，使该组全部用户的容量缓存失效。
+
+    :param group_id: 用户组ID
+    """
+    _capacity_cache.pop_if(lambda _, capacity: capacity.group_id == group_id)
+
+
+async def get_capacity(session: AsyncSession, user_id: int) -> int:
+    """
+    获取用户的容量上限：用户组的 `max_storage` 加上当前生效的容量包。
+
+    结果按用户缓存，到最早到期的容量包过期时自动重新计算。
+
+    :param session: 数据库会话
+    :param user_id: 用户ID
+    :return: 容量上限（字节）
+    """
+    now = datetime.now()
+    cached = _capacity_cache.get(user_id)
+    if cached is not None and (cached.valid_until is None or cached.valid_until > now):
+        return cached.total
+
+    group_id, max_storage = (await session.exec(
+        select(Group.id, Group.max_storage).join(User, User.group_id == Group.id).where(User.id == user_id)
+    )).one()
+    pack_size, next_expire = (await session.exec(
+        select(func.coalesce(func.sum(StoragePack.size), 0), func.min(StoragePack.expired_time)).where(
+            StoragePack.user_id == user_id,
+            or_(StoragePack.active_time.is_(None), StoragePack.active_time <= now),
+            or_(StoragePack.expired_time.is_(None), StoragePack.expired_time > now),
+        )
+    )).one()
+
+    capacity = _Capacity(group_id, max_storage + pack_size, next_expire)
+    _capacity_cache.set(user_id, capacity)
+    return capacity.total
+
+
+async def get_usage(session: AsyncSession, user_id: int) -> tuple[int, int]:
+    """
+    获取用户的已用空间与容量上限。
+
+    :param session: 数据库会话
+    :param user_id: 用户ID
+    :return: `(已用, 上限)`，单位字节
+    """
+    used = (await session.exec(select(User.storage).where(User.id == user_id))).one()
+    return used, await get_capacity(session, user_id)
+
+
+async def can_fit(session: AsyncSession, user_id: int, size: int) -> bool:
+    """
+    上传前的快速检查：剩余空间是否还能放下 `size` 字节。
+
+    只是预检，最终以写入文件时 :meth:`User.adjust_storage` 的条件更新为准。
+
+    :param session: 数据库会话
+    :param user_id: 用户ID
+    :param size: 待上传的字节数
+    """
+    used, total = await get_usage(session, user_id)
+    return used + size <= total
+
+
+async def add_file(session: AsyncSession, file: File, folder: Folder) -> File:
+    """
+    按容量上限写入新文件，空间不足时抛出 413。
+
+    :param session: 数据库会话
+    :param file: 新文件
+    :param folder: 所在目录
+    """
+    return await file.add_to(session, folder, capacity=await get_capacity(session, file.user_id))
+
+
+async def calibrate_storage(session: AsyncSession, user_id: int | None = None) -> int:
+    """
+    按文件表重新计算用户的已用空间，一条 UPDATE 完成（关联子查询按 user_id 求和）。
+
+    :param session: 数据库会话
+    :param user_id: 只校准该用户，为 None 时校准全部用户
+    :return: 更新的用户数量
+    """
+    used = (
+        select(func.coalesce(func.sum(File.size), 0))
+        .where(File.user_id == User.id)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    condition = User.id == user_id if user_id is not None else None
+    return await User.bulk_update(session, condition, {'storage': used})
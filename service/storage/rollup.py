@@ -0,0 +1,43 @@
+import asyncio
+
+from loguru import logger as log
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.database import get_session
+from models.folder import Folder
+from models.setting import SettingsCache, SettingsType
+
+
+async def reconcile_all_rollups(session: AsyncSession) -> int:
+    """
+    逐个用户修复目录汇总字段（大小、文件数、目录数）的偏差。
+
+    :param session: 数据库会话
+    :return: 修复的目录总数
+    """
+    owner_ids = (await session.exec(select(Folder.owner_id).distinct())).all()
+    repaired = 0
+    for owner_id in owner_ids:
+        repaired += await Folder.reconcile_rollups(session, owner_id)
+    return repaired
+
+
+async def run_rollup_reconciler() -> None:
+    """
+    后台任务：按 `task.folder_rollup_interval` 设置的间隔（秒）定期修复目录汇总，设为 0 时暂停。
+    """
+    while True:
+        interval = SettingsCache.get_int(SettingsType.TASK, "folder_rollup_interval", 3600)
+        if interval <= 0:
+            await asyncio.sleep(60)
+            continue
+
+        await asyncio.sleep(interval)
+        try:
+            async for session in get_session():
+                repaired = await reconcile_all_rollups(session)
+            if repaired:
+                log.warning(f"目录汇总存在偏差，已修复 {repaired} 个目录")
+        except Exception as e:
+            log.error(f"目录汇总修复失败: {e}")
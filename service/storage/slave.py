@@ -0,0 +1,70 @@
+from urllib.parse import quote
+
+from models.node import Node
+from pkg.conf import appmeta
+from pkg.sign.sign import PURPOSE_REQUEST, Signer, request_digest
+
+
+def node_base_url(node: Node) -> str:
+    """节点的 API 地址，`Node.server` 未写协议时按 http 处理"""
+    server = node.server.rstrip('/')
+    if '://' not in server:
+        server = f"http://{server}"
+    return f"{server}/api"
+
+
+def slave_download_url(
+        node: Node,
+        path: str,
+        *,
+        ttl: int,
+        name: str | None = None,
+        speed: int = 0,
+        user_id: int | None = None,
+        inline: bool = False,
+) -> str:
+    """
+    生成由从机直接提供的下载链接。
+
+    文件位置、过期时间、限速与用户都写在用 `Node.slave_key` 签名的令牌中，
+    从机只需校验签名即可提供下载，不回调主机，也不访问数据库。
+
+    :param node: 从机节点
+    :param path: 文件在从机上的物理位置
+    :param ttl: 链接有效期（秒）
+    :param name: 下载时的文件名
+    :param speed: 限速（KB/s），0 为不限速
+    :param user_id: 发起下载的用户ID，用于按用户共享限速
+    :param inline: 是否在浏览器中直接打开
+    """
+    token = Signer(node.slave_key).create(path, ttl, speed=speed, user_id=user_id, name=name)
+    return f"{node_base_url(node)}/slave/{'source' if inline else 'download'}/{quote(token)}"
+
+
+def slave_request_headers(
+        node: Node,
+        path: str,
+        *,
+        method: str = 'GET',
+        query: str = '',
+        body: bytes = b'',
+) -> dict[str, str]:
+    """
+    主机调用从机 API 时的签名请求头。
+
+    签名覆盖请求方法、路径、查询参数与请求体，从机的 `SignRequired` 逐一校验，
+    截获的令牌不能用于其他请求。
+
+    :param node: 从机节点
+    :param path: 请求路径，例如 `/api/slave/delete`
+    :param method: 请求方法
+    :param query: 查询字符串（不含 `?`），需与实际发送的一致
+    :param body: 请求体，需与实际发送的一致
+    """
+    token = Signer(node.slave_key).create(
+        path,
+        appmeta.slave_sign_ttl,
+        request=request_digest(method, path, query, body),
+        purpose=PURPOSE_REQUEST,
+    )
+    return {'Authorization': f"Bearer {token}"}
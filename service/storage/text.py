@@ -0,0 +1,99 @@
+from pathlib import Path
+from typing import ClassVar
+
+import anyio
+from fastapi import HTTPException
+from sqlmodel import and_, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.file import File
+from models.policy import Policy
+from models.setting import SettingsCache, SettingsType
+from pkg.cache.lru import LRUCache
+from pkg.text.reader import TextWindow, read_text
+
+README_NAMES = ('readme.md', 'readme.markdown', 'readme.txt', 'readme')
+"""按优先级排列的 README 文件名（不区分大小写）"""
+
+
+def max_edit_size() -> int:
+    """单次读取文本的最大字节数"""
+    return SettingsCache.get_int(SettingsType.FILE_EDIT, "maxEditSize", 4 << 20)
+
+
+async def _source(session: AsyncSession, file: File) -> Path:
+    """
+    :raises HTTPException: 物理文件不存在（404）、存储策略不是本地策略（501）
+    """
+    if not file.source_name:
+        raise HTTPException(status_code=404, detail="File not found")
+    policy = await Policy.get_exist_one(session, file.policy_id)
+    if policy.type != 'local':
+        raise HTTPException(status_code=501, detail="Only local storage policy is supported")
+    return Path(file.source_name)
+
+
+async def read_file_text(session: AsyncSession, file: File, offset: int = 0, length: int | None = None) -> TextWindow:
+    """
+    读取文本文件中的一段。
+
+    每次最多读取 `file_edit.maxEditSize` 字节，更大的文件（如日志）按 `offset` 分段读取，
+    返回的 `end` 为下一段的起始位置。
+
+    :param session: 数据库会话
+    :param file: 文件
+    :param offset: 起始字节位置
+    :param length: 最多读取的字节数，`None` 或超过上限时按上限读取
+    :raises HTTPException: 物理文件不存在（404）、存储策略不是本地策略（501）
+    """
+    source = await _source(session, file)
+    limit = max_edit_size()
+    length = limit if length is None else min(length, limit)
+    try:
+        return await anyio.to_thread.run_sync(read_text, source, offset, length)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+
+
+class ReadmeCache:
+    """
+    分享页 README 的缓存。
+
+    打开分享页时都会取一次 README，缓存解码后的内容，同一版本的文件不再重复读取和解码。
+    键包含文件的物理位置、大小与摘要，文件被覆盖后自然换成新的键。
+    """
+
+    _cache: ClassVar[LRUCache[tuple, TextWindow]] = LRUCache(maxsize=256, ttl=3600)
+    """(文件ID, 物理位置, 大小, SHA256) -> README 内容"""
+
+    @classmethod
+    async def get(cls, session: AsyncSession, file: File) -> TextWindow:
+        """
+        读取 README，只读取开头的 `file_edit.maxEditSize` 字节。
+
+        :param session: 数据库会话
+        :param file: README 文件
+        :raises HTTPException: 同 :func:`read_file_text`
+        """
+        key = (file.id, file.source_name, file.size, file.sha256)
+        readme = cls._cache.get(key)
+        if readme is None:
+            readme = await read_file_text(session, file)
+            cls._cache.set(key, readme)
+        return readme
+
+
+async def find_readme(session: AsyncSession, folder_id: int) -> File | None:
+    """
+    在目录中查找 README 文件，按 :data:`README_NAMES` 的顺序取第一个。
+
+    :param session: 数据库会话
+    :param folder_id: 目录ID
+    """
+    files = await File.get(
+        session,
+        and_(File.folder_id == folder_id, func.lower(File.name).in_(README_NAMES)),
+        fetch_mode='all',
+    )
+    candidates = {file.name.lower(): file for file in files}
+    return next((candidates[name] for name in README_NAMES if name in candidates), None)
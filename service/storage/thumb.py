@@ -0,0 +1,305 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from secrets import token_hex
+from typing import ClassVar
+
+import anyio
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from loguru import logger as log
+from sqlmodel import and_
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.file import File
+from models.policy import Policy
+from models.setting import SettingsCache, SettingsType
+from pkg.thumb.thumbnail import is_supported, make_thumbnail
+
+from .download import file_response
+
+THUMB_CACHE_CONTROL = "private, max-age=86400"
+"""缩略图的 `Cache-Control`；地址按文件ID而非内容，不能标记为 immutable，过期后凭 ETag 重新验证只需一次 304"""
+
+
+def thumb_root() -> Path:
+    """缩略图缓存目录：`<temp_path>/thumbs/`"""
+    return Path(SettingsCache.get(SettingsType.PATH, "temp_path", "temp")) / "thumbs"
+
+
+def _scan(root: Path) -> list[tuple[str, int]]:
+    """列出已有的缩略图，按修改时间从旧到新，作为重启后的 LRU 初始顺序"""
+    found = []
+    for path in root.glob("*/*.jpg"):
+        try:
+            stat_result = path.stat()
+        except FileNotFoundError:
+            continue
+        found.append((stat_result.st_mtime, f"{path.parent.name}/{path.name}", stat_result.st_size))
+    found.sort()
+    return [(key, size) for _, key, size in found]
+
+
+class ThumbCache:
+    """
+    缩略图的磁盘 LRU 缓存。
+
+    键为 `<内容摘要前两位>/<内容摘要>_<宽>x<高>.jpg`：内容相同的文件共享缩略图，
+    调整缩略图尺寸后旧尺寸自然失效。内存中按访问顺序记录每个缩略图的大小，
+    总大小超过 `thumb.thumb_cache_max_size` 时删除最久未访问的缩略图。
+    首次使用时扫描一次目录恢复索引。
+
+    生成在专用线程池中进行，线程数由 `thumb.thumb_max_task_count` 决定（0 为 CPU 核数）；
+    同一缩略图的并发请求只生成一次，其余请求等待同一个结果。
+    """
+
+    _index: ClassVar[OrderedDict[str, int]] = OrderedDict()
+    """键 -> 缩略图大小（字节），按访问顺序排列"""
+
+    _total: ClassVar[int] = 0
+    """缓存的总大小（字节）"""
+
+    _root: ClassVar[Path | None] = None
+    """索引对应的缓存目录，`temp_path` 变化时重新扫描"""
+
+    _generating: ClassVar[dict[str, asyncio.Task[Path]]] = {}
+    """键 -> 正在生成该缩略图的任务"""
+
+    _executor: ClassVar[ThreadPoolExecutor | None] = None
+    """专用于生成缩略图的线程池，首次使用时创建"""
+
+    @staticmethod
+    def key(digest: str, width: int, height: int) -> str:
+        return f"{digest[:2]}/{digest}_{width}x{height}.jpg"
+
+    @classmethod
+    async def _ensure_loaded(cls) -> Path:
+        root = thumb_root()
+        if cls._root != root:
+            entries = await anyio.to_thread.run_sync(_scan, root)
+            cls._index = OrderedDict(entries)
+            cls._total = sum(size for _, size in entries)
+            cls._root = root
+        return root
+
+    @classmethod
+    async def _evict(cls, root: Path) -> None:
+        limit = SettingsCache.get_int(SettingsType.THUMB, "thumb_cache_max_size", 1 << 30)
+        evicted = []
+        while cls._total > limit and len(cls._index) > 1:
+            key, size = cls._index.popitem(last=False)
+            cls._total -= size
+            evicted.append(root / key)
+        if evicted:
+            await anyio.to_thread.run_sync(lambda: [path.unlink(missing_ok=True) for path in evicted])
+
+    @classmethod
+    def _pool(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            workers = SettingsCache.get_int(SettingsType.THUMB, "thumb_max_task_count", 0)
+            cls._executor = ThreadPoolExecutor(
+                max_workers=workers if workers > 0 else os.cpu_count() or 1,
+                thread_name_prefix='thumbnail',
+            )
+        return cls._executor
+
+    @classmethod
+    async def _generate(cls, root: Path, key: str, source: Path, width: int, height: int) -> Path:
+        destination = root / key
+        quality = SettingsCache.get_int(SettingsType.THUMB, "thumb_encode_quality", 85)
+        await asyncio.get_running_loop().run_in_executor(
+            cls._pool(), make_thumbnail, source, destination, width, height, quality,
+        )
+        size = (await anyio.Path(destination).stat()).st_size
+        cls._total += size - cls._index.get(key, 0)
+        cls._index[key] = size
+        cls._index.move_to_end(key)
+        await cls._evict(root)
+        return destination
+
+    @classmethod
+    async def get(cls, digest: str, source: Path) -> Path:
+        """
+        取得缩略图，缓存中没有时生成。
+
+        :param digest: 原图内容的摘要，作为缓存键
+        :param source: 原图位置
+        :return: 缩略图位置
+        :raises HTTPException: 原图无法解码（415）
+        """
+        root = await cls._ensure_loaded()
+        width = SettingsCache.get_int(SettingsType.THUMB, "thumb_width", 400)
+        height = SettingsCache.get_int(SettingsType.THUMB, "thumb_height", 300)
+        key = cls.key(digest, width, height)
+
+        if key in cls._index:
+            path = root / key
+            if await anyio.Path(path).exists():
+                cls._index.move_to_end(key)
+                return path
+            # 缩略图在缓存之外被删除（清理临时目录、其他进程淘汰等），从索引中去掉后重新生成
+            cls._total -= cls._index.pop(key, 0)
+
+        task = cls._generating.get(key)
+        if task is None:
+            task = asyncio.create_task(cls._generate(root, key, source, width, height))
+            cls._generating[key] = task
+            task.add_done_callback(lambda _: cls._generating.pop(key, None))
+        try:
+            # 发起请求的客户端断开时不取消生成，等待同一结果的其他请求与下次访问都用得上
+            return await asyncio.shield(task)
+        except OSError as e:
+            log.warning(f"生成缩略图失败 {source}: {e}")
+            raise HTTPException(status_code=415, detail="Unable to generate thumbnail")
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """关闭缩略图线程池，等待进行中的生成完成"""
+        if cls._executor is not None:
+            executor, cls._executor = cls._executor, None
+            await asyncio.to_thread(executor.shutdown, True)
+
+
+async def thumb_response(request: Request, digest: str, source: Path, *, cache_control: str = THUMB_CACHE_CONTROL) -> Response:
+    """
+    输出缩略图。ETag 由内容摘要与尺寸决定，浏览器重新验证时直接返回 304，不读取也不解码原图。
+
+    :param request: 请求
+    :param digest: 原图内容的摘要
+    :param source: 原图位置
+    :param cache_control: `Cache-Control` 响应头
+    """
+    path = await ThumbCache.get(digest, source)
+    return await file_response(
+        request,
+        path,
+        filename="thumb.jpg",
+        etag=f'"{path.stem}"',
+        inline=True,
+        cache_control=cache_control,
+    )
+
+
+def _thumb_source(file: File, policy: Policy) -> tuple[str, Path]:
+    """
+    :return: 缓存键使用的内容摘要与原图位置
+    :raises HTTPException: 不支持的类型（415）、存储策略不是本地策略（501）、物理文件不存在（404）
+    """
+    if not is_supported(file.name, file.size):
+        raise HTTPException(status_code=415, detail="Thumbnail is not supported for this file")
+    if not file.source_name:
+        raise HTTPException(status_code=404, detail="File not found")
+    if policy.type != 'local':
+        raise HTTPException(status_code=501, detail="Only local storage policy is supported")
+
+    # 早期没有摘要的文件按物理位置计算一个稳定的键
+    digest = file.sha256 or hashlib.sha256(f"{file.source_name}:{file.size}".encode()).hexdigest()
+    return digest, Path(file.source_name)
+
+
+async def serve_thumb(session: AsyncSession, request: Request, file: File, *, cache_control: str = THUMB_CACHE_CONTROL) -> Response:
+    """
+    输出文件的缩略图，以文件的 SHA256 作为缓存键。
+
+    :param session: 数据库会话
+    :param request: 请求
+    :param file: 文件
+    :param cache_control: `Cache-Control` 响应头
+    :raises HTTPException: 不支持的类型（415）、存储策略不是本地策略（501）、物理文件不存在（404）
+    """
+    policy = await Policy.get_exist_one(session, file.policy_id)
+    digest, source = _thumb_source(file, policy)
+    return await thumb_response(request, digest, source, cache_control=cache_control)
+
+
+def _batch_part(boundary: str, file_id: int, status: int, content_type: str, body: bytes, etag: str | None = None) -> bytes:
+    headers = [
+        f"--{boundary}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"X-File-Id: {file_id}",
+        f"X-Status: {status}",
+    ]
+    if etag is not None:
+        headers.append(f"ETag: {etag}")
+    return "\r\n".join(headers).encode("latin-1") + b"\r\n\r\n" + body + b"\r\n"
+
+
+async def batch_thumb_response(
+        session: AsyncSession,
+        user_id: int,
+        file_ids: list[int],
+        *,
+        cache_control: str = THUMB_CACHE_CONTROL,
+) -> StreamingResponse:
+    """
+    在一个 `multipart/mixed` 响应中输出多个文件的缩略图，供相册视图一次取得一屏缩略图。
+
+    文件与存储策略各一次查询取出；缓存中没有的缩略图并发生成，哪个先就绪先输出哪个，
+    因此各部分的顺序与请求顺序无关，由部分头 `X-File-Id` 标明对应的文件。
+    部分头 `X-Status` 为 200 时内容是 JPEG 缩略图，否则是 `{"detail": ...}` 形式的错误，
+    与单个缩略图接口返回的状态码一致；不属于该用户的文件按不存在处理。
+
+    :param session: 数据库会话
+    :param user_id: 用户ID
+    :param file_ids: 文件ID，重复的只输出一次
+    :param cache_control: `Cache-Control` 响应头
+    """
+    file_ids = list(dict.fromkeys(file_ids))
+    files = await File.get(session, and_(File.id.in_(file_ids), File.user_id == user_id), fetch_mode='all')
+    policy_ids = {file.policy_id for file in files}
+    policies = {policy.id: policy for policy in await Policy.get(session, Policy.id.in_(policy_ids), fetch_mode='all')}
+
+    # 响应体在依赖的数据库会话结束后才开始发送，这里先把需要的信息全部取出
+    sources: dict[int, tuple[str, Path]] = {}
+    errors: dict[int, HTTPException] = {
+        file_id: HTTPException(status_code=404, detail="File not found") for file_id in file_ids
+    }
+    for file in files:
+        try:
+            sources[file.id] = _thumb_source(file, policies[file.policy_id])
+            del errors[file.id]
+        except HTTPException as e:
+            errors[file.id] = e
+
+    boundary = token_hex(13)
+
+    def error_part(file_id: int, error: HTTPException) -> bytes:
+        body = json.dumps({'detail': error.detail}).encode()
+        return _batch_part(boundary, file_id, error.status_code, "application/json", body)
+
+    async def load(file_id: int, digest: str, source: Path) -> bytes:
+        # 单个文件的任何失败都只影响它自己的部分，不中断整个响应
+        try:
+            path = await ThumbCache.get(digest, source)
+            body = await anyio.Path(path).read_bytes()
+        except HTTPException as e:
+            return error_part(file_id, e)
+        except Exception as e:
+            log.warning(f"批量缩略图中的文件 {file_id} 生成失败: {e!r}")
+            return error_part(file_id, HTTPException(status_code=415, detail="Unable to generate thumbnail"))
+        return _batch_part(boundary, file_id, 200, "image/jpeg", body, etag=f'"{path.stem}"')
+
+    async def content():
+        for file_id, error in errors.items():
+            yield error_part(file_id, error)
+
+        tasks = [asyncio.create_task(load(file_id, *source)) for file_id, source in sources.items()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 客户端断开时不再等待，已开始的生成由 ThumbCache 继续完成
+            for task in tasks:
+                task.cancel()
+        yield f"--{boundary}--\r\n".encode("latin-1")
+
+    return StreamingResponse(
+        content(),
+        media_type=f"multipart/mixed; boundary={boundary}",
+        headers={'Cache-Control': "no-store"},
+    )
@@ -0,0 +1,507 @@
+import asyncio
+import json
+import os
+import shutil
+import uuid
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import ClassVar
+
+import anyio
+from fastapi import HTTPException
+from loguru import logger as log
+from sqlmodel import and_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.database import get_session
+from models.file import File
+from models.folder import Folder
+from models.policy import Policy
+from models.setting import SettingsCache, SettingsType
+from models.upload_session import UploadSession
+from pkg.cache.lru import LRUCache
+from pkg.conf import appmeta
+
+from .blob import link_file, purge_blobs, store_blob
+from .hashing import MultiHasher
+from .quota import can_fit
+
+
+COMPLETE_WAIT = 5
+"""完成上传时等待重复的分块请求退出的最长时间（秒）"""
+
+
+def uploads_root() -> Path:
+    """全部上传会话分块目录的父目录：`<temp_path>/uploads/`"""
+    return Path(SettingsCache.get(SettingsType.PATH, "temp_path", "temp")) / "uploads"
+
+
+def session_dir(session_id: uuid.UUID) -> Path:
+    """上传会话的分块目录：`<temp_path>/uploads/<会话ID>/`"""
+    return uploads_root() / session_id.hex
+
+
+def data_path(session_id: uuid.UUID) -> Path:
+    """
+    上传数据文件。创建会话时按文件总大小预分配，各分块按偏移直接写入，
+    全部到齐后它就是完整的文件，不需要再合并。
+    """
+    return session_dir(session_id) / "data"
+
+
+def chunk_marker(session_id: uuid.UUID, index: int) -> Path:
+    """第 `index` 块写入完成的标记文件（空文件）"""
+    return session_dir(session_id) / f"{index}.chunk"
+
+
+def complete_lock(session_id: uuid.UUID) -> Path:
+    """完成上传期间持有的标记文件，存在时不再接受任何分块写入"""
+    return session_dir(session_id) / "complete.lock"
+
+
+def _preallocate(path: Path, size: int) -> None:
+    with open(path, 'wb') as f:
+        f.truncate(size)
+
+
+def _pwrite_all(fd: int, data: bytearray, offset: int, hasher: MultiHasher | None = None) -> None:
+    if hasher is not None:
+        hasher.update(data)
+    view = memoryview(data)
+    while view:
+        n = os.pwrite(fd, view, offset)
+        view = view[n:]
+        offset += n
+
+
+def _list_received(directory: Path) -> list[int]:
+    try:
+        names = [entry.name for entry in directory.iterdir()]
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-6]) for name in names if name.endswith('.chunk') and name[:-6].isdigit())
+
+
+def _has_writers(directory: Path) -> bool:
+    try:
+        return any(entry.name.endswith('.part') for entry in directory.iterdir())
+    except FileNotFoundError:
+        return False
+
+
+async def received_chunks(upload: UploadSession) -> list[int]:
+    """
+    已完整接收的分块序号，用于断点续传。
+
+    分块写入期间持有 `.part` 标记，写完且大小正确后才重命名为 `.chunk`，所以目录里的 `.chunk` 标记就是可信的接收记录。
+    """
+    return await anyio.to_thread.run_sync(_list_received, session_dir(upload.id))
+
+
+class UploadSessionStore:
+    """
+    上传会话存储：数据库表为准，内存中保存已脱离会话的快照作为索引。
+
+    上传每个分块都要校验会话，命中内存索引时不访问数据库。
+    会话在 `upload_session_timeout` 秒后过期，由后台任务 :meth:`run_sweeper` 定期清理过期会话
+    及其分块，并删除 `temp_path/uploads/` 下没有对应会话的孤儿目录。
+    """
+
+    _sessions: ClassVar[LRUCache[uuid.UUID, UploadSession]] = LRUCache(maxsize=appmeta.auth_cache_size)
+    """会话ID -> 会话快照"""
+
+    @classmethod
+    def add(cls, upload: UploadSession) -> None:
+        """登记新建的会话"""
+        cls._sessions.set(upload.id, upload)
+
+    @classmethod
+    async def get(cls, session: AsyncSession, session_id: uuid.UUID, user_id: int) -> UploadSession:
+        """
+        读取属于该用户且未过期的会话。
+
+        :raises HTTPException: 会话不存在、不属于该用户或已过期时抛出 404
+        """
+        upload = cls._sessions.get(session_id)
+        if upload is None:
+            upload = await UploadSession.get(session, UploadSession.id == session_id)
+            if upload is not None:
+                session.expunge(upload)
+                cls._sessions.set(session_id, upload)
+
+        if upload is None or upload.user_id != user_id or upload.expires <= datetime.now():
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        return upload
+
+    @classmethod
+    async def _remove_dirs(cls, session_ids: list[uuid.UUID]) -> None:
+        for session_id in session_ids:
+            cls._sessions.pop(session_id)
+            UploadHashStore.discard(session_id)
+        await anyio.to_thread.run_sync(
+            lambda: [shutil.rmtree(session_dir(session_id), ignore_errors=True) for session_id in session_ids]
+        )
+
+    @classmethod
+    async def delete(cls, session: AsyncSession, session_ids: list[uuid.UUID]) -> int:
+        """
+        删除会话及其分块，数据库中一条 DELETE 完成。
+
+        :param session: 数据库会话
+        :param session_ids: 会话ID列表
+        :return: 删除的会话数量
+        """
+        if not session_ids:
+            return 0
+        count = await UploadSession.bulk_delete(session, UploadSession.id.in_(session_ids))
+        await cls._remove_dirs(session_ids)
+        return count
+
+    @classmethod
+    async def clear_user(cls, session: AsyncSession, user_id: int) -> int:
+        """
+        删除用户的全部上传会话及其分块。
+
+        :param session: 数据库会话
+        :param user_id: 用户ID
+        :return: 删除的会话数量
+        """
+        session_ids = list((await session.exec(
+            select(UploadSession.id).where(UploadSession.user_id == user_id)
+        )).all())
+        return await cls.delete(session, session_ids)
+
+    @classmethod
+    async def sweep(cls, session: AsyncSession) -> int:
+        """
+        清理过期会话，并删除没有对应会话的孤儿分块目录。
+
+        :param session: 数据库会话
+        :return: 清理的会话与孤儿目录总数
+        """
+        expired = list((await session.exec(
+            select(UploadSession.id).where(UploadSession.expires <= datetime.now())
+        )).all())
+        count = await cls.delete(session, expired)
+
+        # 先列目录再查询存活会话，避免误删刚刚创建的会话目录
+        root = uploads_root()
+        names = await anyio.to_thread.run_sync(
+            lambda: [entry.name for entry in root.iterdir() if entry.is_dir()] if root.is_dir() else []
+        )
+        alive = {session_id.hex for session_id in (await session.exec(select(UploadSession.id))).all()}
+        orphans = [uuid.UUID(hex=name) for name in names if name not in alive and _is_uuid_hex(name)]
+        await cls._remove_dirs(orphans)
+        return count + len(orphans)
+
+    @classmethod
+    async def run_sweeper(cls) -> None:
+        """
+        后台任务：按 `upload.upload_gc_interval` 设置的间隔（秒）清理上传会话与不再被引用的 Blob，设为 0 时暂停。
+        """
+        while True:
+            interval = SettingsCache.get_int(SettingsType.UPLOAD, "upload_gc_interval", 3600)
+            if interval <= 0:
+                await asyncio.sleep(60)
+                continue
+
+            await asyncio.sleep(interval)
+            try:
+                count = purged = 0
+                async for session in get_session():
+                    count = await cls.sweep(session)
+                    purged = await purge_blobs(session)
+                if count:
+                    log.info(f"已清理 {count} 个过期或孤儿上传会话")
+                if purged:
+                    log.info(f"已清理 {purged} 个不再被引用的 Blob")
+            except Exception as e:
+                log.error(f"清理上传会话失败: {e}")
+
+
+class _HashState:
+    """一个上传会话的摘要进度"""
+
+    def __init__(self) -> None:
+        self.hasher = MultiHasher()
+        """已按顺序计入前 `next_index` 个分块的摘要"""
+        self.next_index = 0
+        """下一个需要计入摘要的分块序号"""
+        self.lock = asyncio.Lock()
+        """同一时间只有一个请求推进摘要"""
+
+
+class UploadHashStore:
+    """
+    上传过程中增量计算文件摘要（MD5、SHA1、SHA256），完成上传时不必再把文件读三遍。
+
+    摘要必须按分块顺序计算：正好轮到的分块在写入磁盘的同时计入摘要；
+    提前到达的分块先落盘，等前面的空缺补齐后再从数据文件读回（此时多半仍在页缓存中）。
+    摘要进度保存在内存中，断点续传的后续请求接着计算；进程重启丢失进度时，
+    完成上传前从数据文件补算，结果不受影响。
+    """
+
+    _states: ClassVar[dict[uuid.UUID, _HashState]] = {}
+    """会话ID -> 摘要进度"""
+
+    @classmethod
+    def get(cls, session_id: uuid.UUID) -> _HashState:
+        state = cls._states.get(session_id)
+        if state is None:
+            state = cls._states[session_id] = _HashState()
+        return state
+
+    @classmethod
+    def discard(cls, session_id: uuid.UUID) -> None:
+        cls._states.pop(session_id, None)
+
+    @classmethod
+    async def _advance(cls, upload: UploadSession, state: _HashState) -> None:
+        # 调用方持有 state.lock。检查标记是同步的，"检查到空缺"与"释放锁"之间不会让出事件循环，
+        # 不会错过刚好在此时写完的分块。
+        while state.next_index < upload.chunk_count and chunk_marker(upload.id, state.next_index).exists():
+            await anyio.to_thread.run_sync(
+                state.hasher.update_from,
+                data_path(upload.id),
+                state.next_index * upload.chunk_size,
+                upload.expected_chunk_size(state.next_index),
+                appmeta.upload_buffer_size,
+            )
+            state.next_index += 1
+
+    @classmethod
+    async def catch_up(cls, upload: UploadSession) -> None:
+        """把已经落盘、且前面没有空缺的分块计入摘要；其他请求正在推进时直接返回"""
+        state = cls.get(upload.id)
+        if state.lock.locked():
+            return
+        async with state.lock:
+            await cls._advance(upload, state)
+
+    @classmethod
+    async def finish(cls, upload: UploadSession) -> dict[str, str]:
+        """
+        全部分块到齐后取出摘要，必要时等待其他请求算完或从数据文件补算。
+
+        :return: 算法名 -> 十六进制摘要
+        """
+        state = cls.get(upload.id)
+        async with state.lock:
+            await cls._advance(upload, state)
+            if state.next_index != upload.chunk_count:
+                raise HTTPException(status_code=409, detail="Upload is incomplete")
+            return state.hasher.hexdigests()
+
+
+def _is_uuid_hex(name: str) -> bool:
+    try:
+        return uuid.UUID(hex=name).hex == name
+    except ValueError:
+        return False
+
+
+async def create_session(
+        session: AsyncSession,
+        user_id: int,
+        folder: Folder,
+        name: str,
+        size: int,
+) -> UploadSession:
+    """
+    创建上传会话，提前检查文件名、存储策略、同名文件、单文件大小限制与剩余容量，
+    这些错误不必等到传完全部分块才发现。
+
+    :param session: 数据库会话
+    :param user_id: 用户ID
+    :param folder: 目标目录
+    :param name: 文件名
+    :param size: 文件大小（字节）
+    :raises HTTPException: 文件名非法（400）、同名文件已存在（409）、超过单文件大小限制或剩余容量不足（413）、
+        存储策略不是本地策略（501）
+    """
+    if not name or name in ('.', '..') or '/' in name or '\\' in name:
+        raise HTTPException(status_code=400, detail="Invalid file name")
+
+    policy = await Policy.get_exist_one(session, await folder.awaitable_attrs.policy_id)
+    if policy.type != 'local':
+        raise HTTPException(status_code=501, detail="Only local storage policy is supported")
+    if await File.get(session, and_(File.folder_id == folder.id, File.name == name)):
+        raise HTTPException(status_code=409, detail="File already exists")
+    if policy.max_size and size > policy.max_size:
+        raise HTTPException(status_code=413, detail="File too large")
+    if not await can_fit(session, user_id, size):
+        raise HTTPException(status_code=413, detail="Storage quota exceeded")
+
+    options = json.loads(policy.options) if policy.options else {}
+    chunk_size = int(options.get('chunk_size') or appmeta.upload_default_chunk_size)
+    timeout = SettingsCache.get_int(SettingsType.TIMEOUT, "upload_session_timeout", 86400)
+
+    upload = UploadSession(
+        name=name,
+        size=size,
+        chunk_size=chunk_size,
+        chunk_count=max(1, -(-size // chunk_size)),
+        expires=datetime.now() + timedelta(seconds=timeout),
+        user_id=user_id,
+        folder_id=folder.id,
+        policy_id=policy.id,
+    )
+    upload = await upload.save(session)
+    await anyio.Path(session_dir(upload.id)).mkdir(parents=True, exist_ok=True)
+    await anyio.to_thread.run_sync(_preallocate, data_path(upload.id), size)
+    session.expunge(upload)
+    UploadSessionStore.add(upload)
+    return upload
+
+
+async def write_chunk(
+        upload: UploadSession,
+        index: int,
+        content_length: int | None,
+        stream: AsyncIterator[bytes],
+) -> int:
+    """
+    把请求体直接流式写入数据文件中该分块的偏移处。
+
+    内存中最多只攒 `upload_buffer_size` 字节，整块只写一次磁盘，完成上传时也无需再合并。
+    正好轮到的分块在写盘的同一线程任务中计入摘要，见 :class:`UploadHashStore`。
+    序号越界、重复上传、`Content-Length` 与应有大小不符时，在读取请求体之前就拒绝。
+
+    先独占创建 `.part` 标记再检查 `.chunk` 与完成锁：已写完的分块、正在完成的上传都不会再被写入，
+    与 :func:`complete_upload` 互相排斥。
+
+    :param upload: 上传会话
+    :param index: 分块序号，从 0 开始
+    :param content_length: 请求头中的 `Content-Length`
+    :param stream: 请求体
+    :return: 写入的字节数
+    :raises HTTPException: 序号越界（416）、分块已上传或正在上传、上传正在完成（409）、大小不符（400）
+    """
+    if not 0 <= index < upload.chunk_count:
+        raise HTTPException(status_code=416, detail="Chunk index out of range")
+
+    expected = upload.expected_chunk_size(index)
+    if content_length is not None and content_length != expected:
+        raise HTTPException(status_code=400, detail="Chunk size mismatch")
+
+    final = anyio.Path(chunk_marker(upload.id, index))
+    part = final.with_suffix('.part')
+    try:
+        # 'x' 模式独占创建标记，同一分块的并发请求只有一个能写入
+        await (await anyio.open_file(part, 'xb')).aclose()
+    except FileExistsError:
+        raise HTTPException(status_code=409, detail="Chunk is being uploaded")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+
+    # 持有 `.part` 之后再检查，前一个请求写完并重命名后才到达的重复请求也会被拒绝
+    if await final.exists():
+        await part.unlink(missing_ok=True)
+        raise HTTPException(status_code=409, detail="Chunk already uploaded")
+    if await anyio.Path(complete_lock(upload.id)).exists():
+        await part.unlink(missing_ok=True)
+        raise HTTPException(status_code=409, detail="Upload is being completed")
+
+    # 正好轮到该分块且没有其他请求在推进摘要时，边写边算；失败时回退到写入前的摘要
+    state = UploadHashStore.get(upload.id)
+    inline = state.next_index == index and not state.lock.locked()
+    hasher = None
+    if inline:
+        await state.lock.acquire()
+        hasher = state.hasher.copy()
+
+    buffer_size = appmeta.upload_buffer_size
+    buffer = bytearray()
+    offset = index * upload.chunk_size
+    written = 0
+    fd = None
+    try:
+        fd = await anyio.to_thread.run_sync(os.open, data_path(upload.id), os.O_WRONLY)
+        async for data in stream:
+            written += len(data)
+            if written > expected:
+                raise HTTPException(status_code=400, detail="Chunk size mismatch")
+            buffer += data
+            if len(buffer) >= buffer_size:
+                await anyio.to_thread.run_sync(_pwrite_all, fd, buffer, offset, hasher)
+                offset += len(buffer)
+                buffer.clear()
+        if buffer:
+            await anyio.to_thread.run_sync(_pwrite_all, fd, buffer, offset, hasher)
+
+        if written != expected:
+            raise HTTPException(status_code=400, detail="Chunk size mismatch")
+        await part.rename(final)
+        if inline:
+            state.hasher = hasher
+            state.next_index += 1
+    except FileNotFoundError:
+        await part.unlink(missing_ok=True)
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    except BaseException:
+        await part.unlink(missing_ok=True)
+        raise
+    finally:
+        if fd is not None:
+            os.close(fd)
+        if inline:
+            state.lock.release()
+
+    await UploadHashStore.catch_up(upload)
+    return written
+
+
+async def complete_upload(session: AsyncSession, upload: UploadSession) -> File | None:
+    """
+    全部分块到齐后完成上传：按上传中算好的摘要入库为 Blob，再写入指向它的文件记录。
+
+    已有相同内容的 Blob 时直接复用，数据文件随会话删除；否则把数据文件移动到 Blob 目录，
+    它本身已经是完整文件，同一文件系统内只需一次 rename，跨文件系统时由
+    :func:`pkg.fs.zerocopy.move_file` 在内核中拷贝。
+
+    完成期间持有完成锁，且等到没有请求持有 `.part` 标记才开始移动数据文件，移动之后不会再有写入。
+    入库之前失败时释放完成锁，会话保留，可以重试；入库之后数据文件已经不在会话目录中，
+    写入文件记录失败（创建会话时已检查过同名与容量，只有期间发生变化才会失败）时会话随之删除，
+    错误即为最终结果。
+
+    :param session: 数据库会话
+    :param upload: 上传会话
+    :return: 新文件；分块未到齐或其他请求正在完成时返回 None
+    :raises HTTPException: 同名文件已存在（409）、超出容量（413）
+    """
+    if len(await received_chunks(upload)) != upload.chunk_count:
+        return None
+
+    lock = anyio.Path(complete_lock(upload.id))
+    try:
+        # 最后几个分块可能同时写完，只让一个请求执行完成流程
+        await (await anyio.open_file(lock, 'xb')).aclose()
+    except (FileExistsError, FileNotFoundError):
+        return None
+
+    file = None
+    try:
+        # 分块都已到齐，此时仍持有 `.part` 的只能是即将被拒绝的重复请求，等它们退出
+        with anyio.move_on_after(COMPLETE_WAIT):
+            while await anyio.to_thread.run_sync(_has_writers, session_dir(upload.id)):
+                await anyio.sleep(0.01)
+        if await anyio.to_thread.run_sync(_has_writers, session_dir(upload.id)):
+            return None
+
+        policy = await Policy.get_exist_one(session, upload.policy_id)
+        digests = await UploadHashStore.finish(upload)
+        blob = await store_blob(session, policy, data_path(upload.id), upload.size, digests, upload.id)
+        blob_id = blob.id
+        try:
+            folder = await Folder.get_exist_one(session, upload.folder_id)
+            file = await link_file(session, blob_id, upload.user_id, folder, upload.name)
+        finally:
+            # 无论成败会话都已无法再完成，留着只会在重试时找不到数据文件
+            await UploadSessionStore.delete(session, [upload.id])
+    finally:
+        if file is None:
+            await lock.unlink(missing_ok=True)
+
+    await session.refresh(file)
+    return file
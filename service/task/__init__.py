@@ -0,0 +1,2 @@
+from .archive import create_compress_task, create_decompress_task
+from .executor import TaskExecutor, raise_if_cancelled, task_dir
@@ -0,0 +1,169 @@
+import json
+import uuid
+from pathlib import Path
+
+from fastapi import HTTPException
+from sqlmodel import and_
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.file import File
+from models.folder import Folder
+from models.group import Group
+from models.policy import Policy
+from models.task import Task, TaskType
+from models.user import User
+from service.storage import get_usage, link_file, resolve_entries, store_blob
+
+from . import worker
+from .executor import TaskExecutor, raise_if_cancelled
+
+
+async def _require_archive_task(session: AsyncSession, user_id: int) -> None:
+    """
+    :raises HTTPException: 用户组未开启压缩/解压任务（403）
+    """
+    user = await User.get_exist_one(session, user_id)
+    group = await Group.get_exist_one(session, user.group_id)
+    if not (group.options or {}).get('archive_task'):
+        raise HTTPException(status_code=403, detail="Archive tasks are not allowed for this group")
+
+
+async def _require_local(session: AsyncSession, policy_id: int) -> Policy:
+    policy = await Policy.get_exist_one(session, policy_id)
+    if policy.type != 'local':
+        raise HTTPException(status_code=501, detail="Only local storage policy is supported")
+    return policy
+
+
+async def create_compress_task(
+        session: AsyncSession,
+        user_id: int,
+        file_ids: list[int],
+        folder_ids: list[int],
+        dst: Folder,
+        name: str,
+        *,
+        compress: bool = True,
+) -> int:
+    """
+    创建压缩任务并在后台执行，压缩结果保存为 `dst` 下名为 `name` 的文件。
+
+    文件名非法或 `dst` 下已有同名文件时直接拒绝，不必等压缩完才失败。
+
+    :param session: 数据库会话
+    :param user_id: 用户ID
+    :param file_ids: 要压缩的文件ID
+    :param folder_ids: 要压缩的目录ID
+    :param dst: 保存到的目录
+    :param name: 压缩包文件名
+    :param compress: 是否压缩，为 False 时只打包
+    :return: 任务ID
+    :raises HTTPException: 文件名非法（400）、用户组未开启压缩/解压任务（403）、同名文件已存在（409），
+        以及 :func:`resolve_entries` 的各种错误
+    """
+    if not name or name in ('.', '..') or '/' in name or '\\' in name:
+        raise HTTPException(status_code=400, detail="Invalid file name")
+    await _require_archive_task(session, user_id)
+    await _require_local(session, dst.policy_id)
+    if await File.get(session, and_(File.folder_id == dst.id, File.name == name)):
+        raise HTTPException(status_code=409, detail="File already exists")
+    # 提前校验选择是否有效，执行时再按最新状态重新解析
+    await resolve_entries(session, user_id, file_ids, folder_ids)
+
+    props = {'files': file_ids, 'folders': folder_ids, 'dst': dst.id, 'name': name, 'compress': compress}
+    task = await Task(type=TaskType.COMPRESS, props=json.dumps(props), user_id=user_id).save(session)
+    task_id = task.id
+    TaskExecutor.submit(task_id, run_compress)
+    return task_id
+
+
+async def run_compress(session: AsyncSession, task: Task, workdir: Path) -> None:
+    task_id, user_id, props = task.id, task.user_id, json.loads(task.props)
+    entries = await resolve_entries(session, user_id, props['files'], props['folders'])
+
+    path, size, digests = await TaskExecutor.run_in_pool(
+        worker.compress, task_id, workdir, entries, deflate=props['compress'],
+    )
+    raise_if_cancelled(workdir)
+
+    dst = await Folder.get_exist_one(session, props['dst'])
+    policy = await _require_local(session, dst.policy_id)
+    blob = await store_blob(session, policy, path, size, digests, uuid.uuid4())
+    blob_id = blob.id
+    # 入库提交了事务，之前取出的实例已过期，重新取出目录
+    dst = await Folder.get_exist_one(session, props['dst'])
+    await link_file(session, blob_id, user_id, dst, props['name'])
+
+
+async def create_decompress_task(session: AsyncSession, user_id: int, file_id: int, dst: Folder) -> int:
+    """
+    创建解压任务并在后台执行，压缩包中的目录结构在 `dst` 下重建，已存在的同名目录直接合并。
+    已存在的同名文件保持不变，对应的条目跳过并记录在任务属性的 `skipped` 中，其余条目照常解压。
+
+    只支持 ZIP 格式。
+
+    :param session: 数据库会话
+    :param user_id: 用户ID
+    :param file_id: 压缩包文件ID
+    :param dst: 解压到的目录
+    :return: 任务ID
+    :raises HTTPException: 用户组未开启压缩/解压任务（403）、文件不存在（404）、存储策略不是本地策略（501）
+    """
+    await _require_archive_task(session, user_id)
+    file = await File.get(session, File.id == file_id)
+    if file is None or file.user_id != user_id or not file.source_name:
+        raise HTTPException(status_code=404, detail="File not found")
+    await _require_local(session, file.policy_id)
+    await _require_local(session, dst.policy_id)
+
+    props = {'file': file_id, 'dst': dst.id}
+    task = await Task(type=TaskType.DECOMPRESS, props=json.dumps(props), user_id=user_id).save(session)
+    task_id = task.id
+    TaskExecutor.submit(task_id, run_decompress)
+    return task_id
+
+
+async def run_decompress(session: AsyncSession, task: Task, workdir: Path) -> None:
+    task_id, user_id, props = task.id, task.user_id, json.loads(task.props)
+    source = Path((await File.get_exist_one(session, props['file'])).source_name)
+    used, capacity = await get_usage(session, user_id)
+
+    folders, files = await TaskExecutor.run_in_pool(
+        worker.decompress, task_id, workdir, source, max(capacity - used, 0),
+    )
+    raise_if_cancelled(workdir)
+
+    dst = await Folder.get_exist_one(session, props['dst'])
+    policy_id = (await _require_local(session, dst.policy_id)).id
+
+    # 目录按各级名称排序，父目录总在子目录之前
+    folder_ids: dict[tuple[str, ...], int] = {(): dst.id}
+    for parts in folders:
+        parent = await Folder.get_exist_one(session, folder_ids[parts[:-1]])
+        existing = await Folder.resolve(session, user_id, f"{await parent.awaitable_attrs.path}{parts[-1]}/")
+        folder = existing or await parent.create_child(session, parts[-1])
+        folder_ids[parts] = folder.id
+
+    # 每个文件写入都会提交事务，之前取出的实例随之过期，每次重新取出
+    skipped: list[str] = []
+    for extracted in files:
+        folder_id, name = folder_ids[extracted.parts[:-1]], extracted.parts[-1]
+        # 同名文件先检查再入库，冲突的条目跳过而不是中断，避免只解压出一部分
+        if await File.get(session, and_(File.folder_id == folder_id, File.name == name)):
+            skipped.append('/'.join(extracted.parts))
+            continue
+        policy = await Policy.get_exist_one(session, policy_id)
+        blob = await store_blob(session, policy, extracted.path, extracted.size, extracted.digests, uuid.uuid4())
+        blob_id = blob.id
+        folder = await Folder.get_exist_one(session, folder_id)
+        try:
+            await link_file(session, blob_id, user_id, folder, name)
+        except HTTPException as e:
+            # 检查之后才出现的同名文件
+            if e.status_code != 409:
+                raise
+            skipped.append('/'.join(extracted.parts))
+
+    if skipped:
+        props['skipped'] = skipped
+        await Task.bulk_update(session, Task.id == task_id, {'props': json.dumps(props)})
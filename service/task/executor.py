@@ -0,0 +1,263 @@
+import asyncio
+import multiprocessing
+import queue
+import shutil
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from multiprocessing.queues import Queue
+from pathlib import Path
+from typing import ClassVar, TypeVar
+
+import anyio
+from loguru import logger as log
+from sqlmodel import and_, col, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.database import get_session
+from models.setting import SettingsCache, SettingsType
+from models.task import Task, TaskStatus
+
+from .worker import CANCEL_MARKER, TaskCancelled, init_worker
+
+T = TypeVar("T")
+
+HEARTBEAT_INTERVAL = timedelta(seconds=15)
+"""执行任务的进程刷新 `Task.heartbeat`、处理跨进程取消请求的间隔"""
+
+HEARTBEAT_TIMEOUT = timedelta(minutes=2)
+"""心跳超过这么久没有刷新的未完成任务视为执行它的进程已经退出"""
+
+TaskHandler = Callable[[AsyncSession, Task, Path], Awaitable[None]]
+"""任务处理函数：接收数据库会话、任务与工作目录，失败时抛出异常"""
+
+
+def task_dir(task_id: int) -> Path:
+    """任务的工作目录：`<temp_path>/tasks/<任务ID>/`"""
+    return Path(SettingsCache.get(SettingsType.PATH, "temp_path", "temp")) / "tasks" / str(task_id)
+
+
+def raise_if_cancelled(workdir: Path) -> None:
+    """
+    进程池中的计算完成后、结果入库前再检查一次取消标记。
+
+    :raises TaskCancelled: 任务已被取消
+    """
+    if (workdir / CANCEL_MARKER).exists():
+        raise TaskCancelled()
+
+
+class TaskExecutor:
+    """
+    压缩、解压等 CPU 密集型任务的执行器。
+
+    计算在独立的进程池中进行，进程数由 `task.max_worker_num` 设置决定（首次使用时读取），
+    与处理 API 请求的事件循环互不争抢 CPU，也不受 GIL 影响。
+    事件循环只负责查询数据库、提交计算与写回结果。
+
+    工作进程通过队列按秒级间隔上报进度，由 :meth:`_write_progress` 合并后写入 `Task.progress`；
+    取消时在任务工作目录中写入标记文件，工作进程在下一次上报进度时发现并停止。
+
+    部署多个服务进程时，任务只在创建它的进程中执行。该进程按 :data:`HEARTBEAT_INTERVAL`
+    刷新 `Task.heartbeat`；其他进程收到的取消请求记录在 `Task.cancel_requested` 中，
+    由执行任务的进程在下一次心跳时处理。心跳超时的任务才会被 :meth:`recover` 标记为错误。
+    """
+
+    _pool: ClassVar[ProcessPoolExecutor | None] = None
+    """任务进程池，首次使用时创建"""
+
+    _progress: ClassVar[Queue | None] = None
+    """工作进程上报进度的队列，元素为 `(任务ID, 百分比)`"""
+
+    _progress_writer: ClassVar[asyncio.Task | None] = None
+    """把进度写入数据库的后台任务"""
+
+    _running: ClassVar[dict[int, asyncio.Task]] = {}
+    """任务ID -> 正在执行的任务"""
+
+    @classmethod
+    def _ensure_pool(cls) -> ProcessPoolExecutor:
+        if cls._pool is None:
+            # 事件循环所在进程有多个线程，fork 不安全，使用 spawn 启动工作进程
+            context = multiprocessing.get_context('spawn')
+            cls._progress = context.Queue()
+            cls._pool = ProcessPoolExecutor(
+                max_workers=max(SettingsCache.get_int(SettingsType.TASK, "max_worker_num", 10), 1),
+                mp_context=context,
+                initializer=init_worker,
+                initargs=(cls._progress,),
+            )
+            cls._progress_writer = asyncio.create_task(cls._write_progress(cls._progress))
+        return cls._pool
+
+    @classmethod
+    async def run_in_pool(cls, func: Callable[..., T], *args, **kwargs) -> T:
+        """在任务进程池中执行 `func`，参数与返回值需要可以被 pickle"""
+        return await asyncio.get_running_loop().run_in_executor(cls._ensure_pool(), partial(func, *args, **kwargs))
+
+    @classmethod
+    def submit(cls, task_id: int, handler: TaskHandler) -> None:
+        """
+        在后台执行任务，立即返回。
+
+        任务状态随执行推进：排队中 -> 处理中 -> 完成 / 错误。
+
+        :param task_id: 任务ID
+        :param handler: 处理函数
+        """
+        cls._running[task_id] = asyncio.create_task(cls._run(task_id, handler), name=f"task-{task_id}")
+
+    @classmethod
+    async def _run(cls, task_id: int, handler: TaskHandler) -> None:
+        workdir = task_dir(task_id)
+        status, error = TaskStatus.COMPLETE, None
+        try:
+            await anyio.Path(workdir).mkdir(parents=True, exist_ok=True)
+            async for session in get_session():
+                task = await Task.get_exist_one(session, task_id)
+                await handler(session, task, workdir)
+        except TaskCancelled:
+            status, error = TaskStatus.ERROR, "Cancelled"
+        except Exception as e:
+            log.error(f"任务 {task_id} 执行失败: {e!r}")
+            status, error = TaskStatus.ERROR, getattr(e, 'detail', None) or str(e) or type(e).__name__
+        finally:
+            cls._running.pop(task_id, None)
+            await anyio.to_thread.run_sync(shutil.rmtree, workdir, True)
+
+        values = {'status': status, 'error': error}
+        if status == TaskStatus.COMPLETE:
+            values['progress'] = 100
+        async for session in get_session():
+            await Task.bulk_update(session, Task.id == task_id, values)
+
+    @classmethod
+    async def cancel(cls, task_id: int) -> bool:
+        """
+        取消正在执行或排队中的任务。
+
+        任务由其他服务进程执行时只记录取消请求，该进程在下一次心跳时停止任务。
+
+        :return: 任务是否尚未结束
+        """
+        if task_id in cls._running:
+            await cls._mark_cancelled(task_id)
+            return True
+        count = 0
+        async for session in get_session():
+            count = await Task.bulk_update(
+                session,
+                and_(Task.id == task_id, Task.status <= TaskStatus.PROCESSING),
+                {'cancel_requested': True},
+            )
+        return count > 0
+
+    @classmethod
+    async def _mark_cancelled(cls, task_id: int) -> None:
+        """在本进程执行的任务的工作目录中写入取消标记"""
+        workdir = task_dir(task_id)
+        await anyio.Path(workdir).mkdir(parents=True, exist_ok=True)
+        await anyio.Path(workdir / CANCEL_MARKER).touch()
+
+    @classmethod
+    def _next_progress(cls, progress: Queue) -> dict[int, int]:
+        """在工作线程中等待进度，并把已经到达的进度按任务合并，只保留最新值"""
+        latest: dict[int, int] = {}
+        try:
+            task_id, percent = progress.get(timeout=0.5)
+            latest[task_id] = percent
+            while True:
+                task_id, percent = progress.get_nowait()
+                latest[task_id] = percent
+        except queue.Empty:
+            pass
+        return latest
+
+    @classmethod
+    async def _write_progress(cls, progress: Queue) -> None:
+        """后台任务：把工作进程上报的进度写入数据库，已结束的任务不会被迟到的进度改回处理中"""
+        while True:
+            latest = await anyio.to_thread.run_sync(cls._next_progress, progress)
+            if not latest:
+                continue
+            try:
+                async for session in get_session():
+                    for task_id, percent in latest.items():
+                        await Task.bulk_update(
+                            session,
+                            and_(Task.id == task_id, Task.status <= TaskStatus.PROCESSING),
+                            {'status': TaskStatus.PROCESSING, 'progress': percent},
+                        )
+            except Exception as e:
+                log.error(f"写入任务进度失败: {e}")
+
+    @classmethod
+    async def _beat(cls, session: AsyncSession) -> None:
+        """刷新本进程正在执行的任务的心跳，并处理其他进程记录的取消请求"""
+        task_ids = list(cls._running)
+        if not task_ids:
+            return
+        await Task.bulk_update(
+            session,
+            and_(col(Task.id).in_(task_ids), Task.status <= TaskStatus.PROCESSING),
+            {'heartbeat': datetime.now()},
+        )
+        cancelled = (await session.exec(
+            select(Task.id).where(col(Task.id).in_(task_ids), Task.cancel_requested == True)
+        )).all()
+        for task_id in cancelled:
+            if task_id in cls._running:
+                await cls._mark_cancelled(task_id)
+
+    @classmethod
+    async def recover(cls) -> None:
+        """
+        把心跳超时的未完成任务标记为错误，执行它们的进程已经退出。
+
+        其他服务进程仍在执行的任务会持续刷新心跳，不受影响。
+        """
+        async for session in get_session():
+            count = await Task.bulk_update(
+                session,
+                and_(
+                    Task.status <= TaskStatus.PROCESSING,
+                    col(Task.id).not_in(list(cls._running)),
+                    or_(Task.heartbeat == None, Task.heartbeat < datetime.now() - HEARTBEAT_TIMEOUT),
+                ),
+                {'status': TaskStatus.ERROR, 'error': "Interrupted by server restart"},
+            )
+            if count:
+                log.warning(f"{count} 个任务因执行它的服务进程退出而中断")
+
+    @classmethod
+    async def run_heartbeat(cls) -> None:
+        """后台任务：按 :data:`HEARTBEAT_INTERVAL` 刷新心跳，并回收心跳超时的任务"""
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL.total_seconds())
+            try:
+                async for session in get_session():
+                    await cls._beat(session)
+                await cls.recover()
+            except Exception as e:
+                log.error(f"刷新任务心跳失败: {e}")
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """取消全部任务并关闭进程池"""
+        running = list(cls._running.items())
+        for task_id, _ in running:
+            await cls._mark_cancelled(task_id)
+        if running:
+            await asyncio.gather(*(task for _, task in running), return_exceptions=True)
+
+        if cls._progress_writer is not None:
+            cls._progress_writer.cancel()
+            await asyncio.gather(cls._progress_writer, return_exceptions=True)
+            cls._progress_writer = None
+        if cls._pool is not None:
+            pool, cls._pool = cls._pool, None
+            await asyncio.to_thread(pool.shutdown, True, cancel_futures=True)
+        if cls._progress is not None:
+            cls._progress.close()
+            cls._progress = None
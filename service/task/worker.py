@@ -0,0 +1,230 @@
+"""
+在任务进程池中执行的函数。
+
+这里的函数运行在独立进程里，只做文件读写与压缩计算，不访问数据库；
+参数与返回值都必须可以被 pickle。进度通过进程池初始化时传入的队列发回主进程，
+取消通过任务工作目录中的标记文件传达。
+"""
+import time
+import zipfile
+from multiprocessing.queues import Queue
+from pathlib import Path
+from typing import NamedTuple
+
+from pkg.archive.zipstream import ZipEntry, should_store
+from service.storage.hashing import MultiHasher
+
+BUFFER_SIZE = 1024 * 1024
+"""读写缓冲区大小"""
+
+PROGRESS_INTERVAL = 1.0
+"""上报进度、检查取消标记的最小间隔（秒）"""
+
+CANCEL_MARKER = "cancel"
+"""工作目录中存在该文件时任务应尽快停止"""
+
+_progress_queue: Queue | None = None
+"""进度队列，由 :func:`init_worker` 在进程启动时设置"""
+
+
+def init_worker(queue: Queue) -> None:
+    """进程池的初始化函数"""
+    global _progress_queue
+    _progress_queue = queue
+
+
+class TaskCancelled(Exception):
+    """任务被取消"""
+
+
+class TaskLimitExceeded(Exception):
+    """解压出的数据超过了允许的大小"""
+
+
+class _Progress:
+    """按时间节流地上报进度并检查取消标记，每秒最多一次跨进程通信与一次 stat"""
+
+    def __init__(self, task_id: int, workdir: Path, total: int) -> None:
+        self.task_id = task_id
+        self.cancel_marker = workdir / CANCEL_MARKER
+        self.total = max(total, 1)
+        self.done = 0
+        self._last_report = 0.0
+        self._last_percent = -1
+        self.check()
+
+    def advance(self, n: int) -> None:
+        self.done += n
+        if time.monotonic() - self._last_report >= PROGRESS_INTERVAL:
+            self.check()
+
+    def check(self) -> None:
+        """
+        :raises TaskCancelled: 存在取消标记
+        """
+        self._last_report = time.monotonic()
+        if self.cancel_marker.exists():
+            raise TaskCancelled()
+        # 完成前最多报 99%，100% 由主进程在结果入库后写入
+        percent = min(self.done * 100 // self.total, 99)
+        if percent != self._last_percent and _progress_queue is not None:
+            self._last_percent = percent
+            _progress_queue.put((self.task_id, percent))
+
+
+class _HashingWriter:
+    """
+    只追加、不可 seek 的输出：写入的同时计算摘要。
+
+    zipfile 检测到不能 seek 时改用数据描述符，全程顺序写出，
+    写完摘要也就算好了，不必再把压缩包读一遍。
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._file = open(path, 'xb')
+        self.hasher = MultiHasher()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self._file.write(data)
+        self.hasher.update(data)
+        self.size += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.size
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def compress(
+        task_id: int,
+        workdir: Path,
+        entries: list[ZipEntry],
+        *,
+        deflate: bool = True,
+) -> tuple[Path, int, dict[str, str]]:
+    """
+    把条目逐个流式写入 `workdir` 下的压缩包，任何时候只有一个缓冲区的数据在内存中。
+
+    已经压缩过的类型直接存储，其余按 `deflate` 决定是否压缩。
+
+    :param task_id: 任务ID
+    :param workdir: 任务工作目录
+    :param entries: 压缩包条目
+    :param deflate: 是否压缩
+    :return: (压缩包位置, 大小, 摘要)
+    :raises TaskCancelled: 任务被取消
+    """
+    progress = _Progress(task_id, workdir, sum(entry.size for entry in entries))
+    output = workdir / "output.zip"
+    writer = _HashingWriter(output)
+    try:
+        with zipfile.ZipFile(writer, 'w', allowZip64=True) as archive:
+            for entry in entries:
+                # ZIP 的时间戳从 1980 年开始
+                date_time = entry.mtime.timetuple()[:6] if entry.mtime.year >= 1980 else (1980, 1, 1, 0, 0, 0)
+                info = zipfile.ZipInfo(entry.name, date_time)
+                if entry.path is None:
+                    info.external_attr = (0o40755 << 16) | 0x10
+                    archive.writestr(info, b'')
+                    continue
+
+                info.external_attr = 0o100644 << 16
+                info.compress_type = (
+                    zipfile.ZIP_DEFLATED if deflate and not should_store(entry.name) else zipfile.ZIP_STORED
+                )
+                info.file_size = entry.size
+                with open(entry.path, 'rb') as src, archive.open(info, 'w') as dst:
+                    while data := src.read(BUFFER_SIZE):
+                        dst.write(data)
+                        progress.advance(len(data))
+    finally:
+        writer.close()
+    return output, writer.size, writer.hasher.hexdigests()
+
+
+class ExtractedFile(NamedTuple):
+    """解压出的一个文件"""
+
+    parts: tuple[str, ...]
+    """包内路径的各级名称，最后一级是文件名"""
+
+    path: Path
+    """解压到的临时位置"""
+
+    size: int
+    """大小（字节）"""
+
+    digests: dict[str, str]
+    """摘要"""
+
+
+def _safe_parts(name: str) -> tuple[str, ...] | None:
+    """
+    把包内路径拆分为各级名称，去掉 `.` 与空段。
+
+    含 `..` 的路径直接丢弃，防止写到目标目录之外（Zip Slip）。
+    """
+    parts = tuple(part for part in name.replace('\\', '/').split('/') if part not in ('', '.'))
+    if not parts or '..' in parts or any(len(part) > 255 for part in parts):
+        return None
+    return parts
+
+
+def decompress(
+        task_id: int,
+        workdir: Path,
+        source: Path,
+        limit: int,
+) -> tuple[list[tuple[str, ...]], list[ExtractedFile]]:
+    """
+    流式解压 ZIP：每个成员边读边写到 `workdir` 下的临时文件，同时计算摘要，不把整个成员读进内存。
+
+    :param task_id: 任务ID
+    :param workdir: 任务工作目录
+    :param source: 压缩包位置
+    :param limit: 解压出的数据总量上限（字节），按实际写出的字节数计，声明的大小不可信
+    :return: (目录列表, 文件列表)，目录按各级名称给出
+    :raises TaskCancelled: 任务被取消
+    :raises TaskLimitExceeded: 超出 `limit`
+    :raises zipfile.BadZipFile: 不是有效的 ZIP 文件
+    """
+    folders: set[tuple[str, ...]] = set()
+    files: list[ExtractedFile] = []
+    output = workdir / "extracted"
+    output.mkdir()
+
+    with zipfile.ZipFile(source) as archive:
+        members = archive.infolist()
+        progress = _Progress(task_id, workdir, sum(info.file_size for info in members))
+        written = 0
+        for index, info in enumerate(members):
+            parts = _safe_parts(info.filename)
+            if parts is None:
+                continue
+            if info.is_dir():
+                folders.add(parts)
+                continue
+            folders.update(parts[:i] for i in range(1, len(parts)))
+
+            hasher = MultiHasher()
+            path = output / str(index)
+            size = 0
+            with archive.open(info) as src, open(path, 'xb') as dst:
+                while data := src.read(BUFFER_SIZE):
+                    size += len(data)
+                    written += len(data)
+                    if written > limit:
+                        raise TaskLimitExceeded("Extracted data exceeds the remaining capacity")
+                    dst.write(data)
+                    hasher.update(data)
+                    progress.advance(len(data))
+            files.append(ExtractedFile(parts, path, size, hasher.hexdigests()))
+
+    return sorted(folders), files
+
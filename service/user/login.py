@@ -39,8 +39,8 @@ async def Login(session: AsyncSession, login_request: LoginRequest) -> TokenMode
         log.debug(f"Cannot find user with username: {login_request.username}")
         return None
 
-    # 验证密码是否正确
-    if not Password.verify(user.password, login_request.password):
+    # 验证密码是否正确（在专用线程池中执行，池满时抛出 429）
+    if not await Password.verify_async(user.password, login_request.password):
         log.debug(f"Password verification failed for user: {login_request.username}")
         return None
 
@@ -49,9 +49,16 @@ async def Login(session: AsyncSession, login_request: LoginRequest) -> TokenMode
         # 未完成注册 or 账号已被封禁
         return False
 
+    # 哈希参数变更后，趁持有明文密码时透明地重新哈希
+    if Password.needs_rehash(user.password):
+        user.password = await Password.hash_async(login_request.password)
+        user = await user.save(session)
+        log.debug(f"Password rehashed for user: {login_request.username}")
+
     # 创建令牌
-    access_token, access_expire = create_access_token(data={'sub': user.username})
-    refresh_token, refresh_expire = create_refresh_token(data={'sub': user.username})
+    # uid 供鉴权缓存按用户ID查找
+    access_token, access_expire = create_access_token(data={'sub': user.username, 'uid': user.id})
+    refresh_token, refresh_expire = create_refresh_token(data={'sub': user.username, 'uid': user.id})
 
     return TokenModel(
         access_token=access_token,
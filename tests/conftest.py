@@ -2,8 +2,97 @@
 Pytest配置文件
 """
 import pytest
+import pytest_asyncio
 import os
 import sys
+import uuid
+from pathlib import Path
+from typing import NamedTuple
 
 # 添加项目根目录到Python路径，确保可以导入项目模块
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+class StorageUser(NamedTuple):
+    """:func:`make_user` 创建的测试用户"""
+
+    user_id: int
+    group_id: int
+    policy_id: int
+    root_id: int
+
+
+@pytest_asyncio.fixture
+async def session():
+    """执行过迁移的数据库会话"""
+    from models import database, migration
+
+    await database.init_db(url='sqlite+aiosqlite:///:memory:')
+    await migration.migration()
+    async for session in database.get_session():
+        yield session
+
+
+@pytest.fixture
+def temp_path(tmp_path, monkeypatch) -> Path:
+    """把 `path.temp_path` 设置指向本测试的临时目录"""
+    from models.setting import SettingsCache, SettingsType
+
+    monkeypatch.setitem(SettingsCache._values, (SettingsType.PATH, "temp_path"), str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def make_user(session, tmp_path):
+    """
+    创建用户组、用户、本地存储策略（存储在 `tmp_path/store`）与根目录。
+
+    测试数据库是持久化的文件，名称都带随机后缀，重复运行不会撞上唯一约束。
+    """
+    from models.folder import Folder
+    from models.group import Group, GroupOptions
+    from models.policy import Policy
+    from models.user import User
+
+    async def make_user(
+            *,
+            max_storage: int = 1000,
+            group_options: dict | None = None,
+            policy_options: str | None = None,
+    ) -> StorageUser:
+        suffix = uuid.uuid4().hex[:8]
+        options = group_options if group_options is not None else GroupOptions().model_dump()
+        group_id = (await Group(name=f"test_group_{suffix}", max_storage=max_storage, options=options).save(session)).id
+        user_id = (await User(username=f"test_user_{suffix}", password="x", group_id=group_id).save(session)).id
+        policy_id = (await Policy(
+            name=f"test_policy_{suffix}", type="local", server=str(tmp_path / "store"), options=policy_options,
+        ).save(session)).id
+        root_id = (await Folder.create_root(session, user_id, policy_id)).id
+        return StorageUser(user_id, group_id, policy_id, root_id)
+
+    return make_user
+
+
+@pytest.fixture
+def body():
+    """把若干段字节包装成请求体流"""
+    async def body(*pieces: bytes):
+        for piece in pieces:
+            yield piece
+
+    return body
+
+
+@pytest.fixture
+def upload(session, temp_path, body):
+    """把整个内容作为一个分块上传到目录，返回新文件"""
+    from models.folder import Folder
+    from service import storage
+
+    async def upload(user_id: int, folder_id: int, name: str, content: bytes):
+        folder = await Folder.get_exist_one(session, folder_id)
+        upload_session = await storage.create_session(session, user_id, folder, name, len(content))
+        await storage.write_chunk(upload_session, 0, len(content), body(content))
+        return await storage.complete_upload(session, upload_session)
+
+    return upload
@@ -0,0 +1,26 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_sqlite_pragmas(tmp_path):
+    """测试 SQLite 文件数据库的连接会设置 WAL 等 PRAGMA"""
+    from sqlalchemy import text
+
+    from models.database import PoolMetrics, create_engine
+    from pkg.conf import appmeta
+
+    test_engine = create_engine(f"sqlite+aiosqlite:///{tmp_path / 'pragma.db'}")
+    try:
+        checkouts = PoolMetrics.checkouts
+        async with test_engine.connect() as conn:
+            journal_mode = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+            busy_timeout = (await conn.execute(text("PRAGMA busy_timeout"))).scalar()
+
+        assert journal_mode.lower() == appmeta.sqlite_journal_mode.lower()
+        assert busy_timeout == appmeta.sqlite_busy_timeout
+        assert PoolMetrics.checkouts == checkouts + 1
+
+        snapshot = PoolMetrics.snapshot(test_engine)
+        assert snapshot['size'] == appmeta.database_pool_size
+        assert snapshot['checked_out'] == 0
+    finally:
+        await test_engine.dispose()
@@ -0,0 +1,42 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_replica_routing(tmp_path):
+    """测试 SELECT 走副本、写入与读己之写走主库、副本不可用时回退主库"""
+    from sqlalchemy import select, text
+
+    from models.database import (
+        ReplicaRouter,
+        RoutingSession,
+        create_engine,
+        current_user_id,
+        engine,
+    )
+
+    replica = create_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    broken = create_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    ReplicaRouter.configure([replica, broken])
+    try:
+        await ReplicaRouter.check_health()
+        assert ReplicaRouter.pick() is replica
+
+        session = RoutingSession()
+        assert session.get_bind(clause=select(text("1"))) is replica.sync_engine
+        assert session.get_bind(clause=text("UPDATE x SET y = 1")) is engine.sync_engine
+
+        token = current_user_id.set(42)
+        try:
+            ReplicaRouter.mark_write(42)
+            assert RoutingSession().get_bind(clause=select(text("1"))) is engine.sync_engine
+        finally:
+            current_user_id.reset(token)
+        assert RoutingSession().get_bind(clause=select(text("1"))) is replica.sync_engine
+
+        ReplicaRouter.configure([broken])
+        await ReplicaRouter.check_health()
+        assert RoutingSession().get_bind(clause=select(text("1"))) is engine.sync_engine
+    finally:
+        ReplicaRouter.configure([])
+        ReplicaRouter._sticky_until.clear()
+        await replica.dispose()
+        await broken.dispose()
@@ -0,0 +1,87 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_bulk_operations():
+    """测试 TableBase 的批量增、改、删"""
+    from models import database, migration
+    from models.tag import Tag
+    from models.user import User
+
+    await database.init_db(url='sqlite+aiosqlite:///:memory:')
+
+    await migration.migration()
+
+    async for session in database.get_session():
+        admin = await User.get(session, User.username == "admin")
+
+        # 测试批量增，主键应通过 RETURNING 回填
+        tags = [Tag(name=f"bulk_{i}", user_id=admin.id) for i in range(2500)]
+        await Tag.bulk_add(session, tags, batch_size=1000)
+
+        assert all(tag.id is not None for tag in tags)
+        assert len({tag.id for tag in tags}) == len(tags)
+        first = await Tag.get(session, Tag.id == tags[0].id)
+        assert first.name == "bulk_0"
+
+        # 测试批量改
+        count = await Tag.bulk_update(session, Tag.name.like("bulk_%"), {'color': '#ffffff'})
+        assert count == len(tags)
+        colored = await Tag.get(session, Tag.color == '#ffffff', fetch_mode="all")
+        assert len(colored) == len(tags)
+
+        # 测试批量删
+        count = await Tag.bulk_delete(session, Tag.name.like("bulk_%"))
+        assert count == len(tags)
+        assert await Tag.get(session, Tag.name.like("bulk_%")) is None
+
+@pytest.mark.asyncio
+async def test_cursor_pagination():
+    """测试游标分页：逐页遍历不重不漏，同一时间戳按主键区分"""
+    from fastapi import HTTPException
+
+    from models import database, migration
+    from models.base.table_base import encode_cursor, now
+    from models.download import Download
+    from models.tag import Tag
+    from models.user import User
+
+    await database.init_db(url='sqlite+aiosqlite:///:memory:')
+
+    await migration.migration()
+
+    async for session in database.get_session():
+        admin = await User.get(session, User.username == "admin")
+
+        same_time = now()
+        tags = [Tag(name=f"page_{i}", user_id=admin.id, created_at=same_time) for i in range(25)]
+        await Tag.bulk_add(session, tags)
+        condition = Tag.name.like("page_%")
+
+        seen: list[int] = []
+        cursor = None
+        while True:
+            page = await Tag.get_page(session, condition, cursor=cursor, limit=10)
+            seen.extend(tag.id for tag in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        assert seen == sorted((tag.id for tag in tags), reverse=True)
+
+        ascending = await Tag.get_page(session, condition, limit=30, descending=False)
+        assert [tag.id for tag in ascending.items] == sorted(tag.id for tag in tags)
+        assert ascending.next_cursor is None
+
+        with pytest.raises(HTTPException):
+            await Tag.get_page(session, condition, cursor="not-a-cursor")
+
+        # 主键类型不符的游标同样返回 400
+        for bad_id in ("not-a-uuid", None, [1]):
+            with pytest.raises(HTTPException) as e:
+                await Download.get_page(session, None, cursor=encode_cursor(same_time, bad_id))
+            assert e.value.status_code == 400
+            with pytest.raises(HTTPException) as e:
+                await Tag.get_page(session, condition, cursor=encode_cursor(same_time, bad_id))
+            assert e.value.status_code == 400
+
+        await Tag.bulk_delete(session, condition)
@@ -0,0 +1,184 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_folder_materialized_path():
+    """测试目录物化路径在创建、移动、重命名、删除时保持一致"""
+    from fastapi import HTTPException
+
+    from models import database, migration
+    from models.folder import Folder
+    from models.user import User
+
+    await database.init_db(url='sqlite+aiosqlite:///:memory:')
+
+    await migration.migration()
+
+    async for session in database.get_session():
+        admin = await User.get(session, User.username == "admin")
+        admin_id = admin.id
+
+        # 迁移时已为管理员创建根目录
+        root = await Folder.resolve(session, admin_id, '/')
+        assert root is not None and root.parent_id is None
+        base = await root.create_child(session, "folder_test")
+
+        a = await base.create_child(session, "a")
+        b = await a.create_child(session, "b")
+        c = await b.create_child(session, "c")
+        a_100 = await base.create_child(session, "a_100")
+        assert await c.awaitable_attrs.path == "/folder_test/a/b/c/"
+
+        # 测试按路径定位
+        resolved = await Folder.resolve(session, admin_id, "folder_test//a/b/c")
+        assert resolved.id == c.id
+        assert await Folder.resolve(session, admin_id, "/folder_test/a/x") is None
+        with pytest.raises(HTTPException):
+            await Folder.resolve(session, admin_id, "/folder_test/../a")
+
+        # 测试子孙查询不包含同前缀的兄弟目录
+        descendants = await a.get_descendants(session)
+        assert [folder.id for folder in descendants] == [b.id, c.id]
+
+        with pytest.raises(HTTPException):
+            await base.create_child(session, "a")
+
+        # 测试移动与重命名改写整棵子树的路径
+        with pytest.raises(HTTPException):
+            await a.move(session, new_parent=c)
+
+        await b.move(session, new_parent=a_100, new_name="moved")
+        assert await b.awaitable_attrs.path == "/folder_test/a_100/moved/"
+        moved_c = await Folder.resolve(session, admin_id, "/folder_test/a_100/moved/c")
+        assert moved_c is not None and moved_c.id == c.id
+        assert await a.get_descendants(session) == []
+
+        # 测试删除整棵子树
+        deleted = await base.delete_tree(session)
+        assert deleted == 5
+        assert await Folder.resolve(session, admin_id, "/folder_test") is None
+        assert await Folder.resolve(session, admin_id, "/") is not None
+
+@pytest.mark.asyncio
+async def test_folder_rollups():
+    """测试目录汇总字段随文件/目录变更增量维护，并能由后台修复"""
+    from models import database, migration
+    from models.file import File
+    from models.folder import Folder
+    from models.policy import Policy
+    from models.user import User
+
+    await database.init_db(url='sqlite+aiosqlite:///:memory:')
+
+    await migration.migration()
+
+    async def rollup(folder_id: int) -> tuple[int, int, int]:
+        folder = await Folder.get_exist_one(session, folder_id)
+        await session.refresh(folder)
+        return folder.size, folder.file_count, folder.folder_count
+
+    async for session in database.get_session():
+        admin_id = (await User.get(session, User.username == "admin")).id
+        policy = await Policy.get(session, Policy.name == "test_rollup_policy")
+        if policy is None:
+            policy = await Policy(name="test_rollup_policy", type="local").save(session)
+        policy_id = policy.id
+
+        root = await Folder.resolve(session, admin_id, '/')
+        base = await root.create_child(session, "rollup_test")
+        base_id = base.id
+        a = await base.create_child(session, "a")
+        a_id = a.id
+        b = await a.create_child(session, "b")
+        b_id = b.id
+        other = await base.create_child(session, "other")
+        other_id = other.id
+
+        f1 = await File(name="1.bin", size=100, user_id=admin_id, policy_id=policy_id).add_to(session, b)
+        f2 = await File(name="2.bin", size=50, user_id=admin_id, policy_id=policy_id).add_to(session, a)
+        assert await rollup(base_id) == (150, 2, 3)
+        assert await rollup(a_id) == (150, 2, 1)
+        assert await rollup(b_id) == (100, 1, 0)
+
+        # 移动文件：共同祖先不变
+        await f1.move_to(session, other)
+        assert await rollup(base_id) == (150, 2, 3)
+        assert await rollup(a_id) == (50, 1, 1)
+        assert await rollup(other_id) == (100, 1, 0)
+
+        # 移动目录：子树汇总随之转移
+        b = await Folder.get_exist_one(session, b_id)
+        await File(name="3.bin", size=7, user_id=admin_id, policy_id=policy_id).add_to(session, b)
+        other = await Folder.get_exist_one(session, other_id)
+        await b.move(session, new_parent=other)
+        assert await rollup(a_id) == (50, 1, 0)
+        assert await rollup(other_id) == (107, 2, 1)
+        assert await rollup(base_id) == (157, 3, 3)
+
+        # 删除文件与子树
+        await f2.remove(session)
+        assert await rollup(base_id) == (107, 2, 3)
+        other = await Folder.get_exist_one(session, other_id)
+        await other.delete_tree(session)
+        assert await rollup(base_id) == (0, 0, 1)
+
+        # 人为制造偏差后由修复任务还原
+        await Folder.bulk_update(session, Folder.id == base_id, {'size': 999, 'file_count': 9})
+        assert await Folder.reconcile_rollups(session, admin_id) == 1
+        assert await rollup(base_id) == (0, 0, 1)
+
+        # 计算修正量与写回之间发生的增量不会被覆盖
+        await Folder.bulk_update(session, Folder.id == base_id, {'size': 999})
+        corrections = await Folder._rollup_corrections(session, admin_id)
+        await Folder.adjust_rollups(session, admin_id, ['/', '/rollup_test/'], size=5)
+        await session.commit()
+        await Folder._apply_rollup_corrections(session, corrections)
+        assert await rollup(base_id) == (5, 0, 1)
+        assert await Folder.reconcile_rollups(session, admin_id) == 2
+        assert await rollup(base_id) == (0, 0, 1)
+
+        base = await Folder.get_exist_one(session, base_id)
+        await base.delete_tree(session)
+
+@pytest.mark.asyncio
+async def test_folder_backfill():
+    """测试迁移时为缺少根目录的用户补建根目录，并回填旧数据的目录路径"""
+    import uuid
+
+    from models import database, migration
+    from models.folder import Folder
+    from models.group import Group, GroupOptions
+    from models.user import User
+
+    await database.init_db(url='sqlite+aiosqlite:///:memory:')
+
+    await migration.migration()
+
+    suffix = uuid.uuid4().hex[:8]
+    async for session in database.get_session():
+        group_id = (await Group(name=f"backfill_group_{suffix}", options=GroupOptions().model_dump()).save(session)).id
+        user_id = (await User(username=f"backfill_user_{suffix}", password="x", group_id=group_id).save(session)).id
+        assert await Folder.resolve(session, user_id, '/') is None
+
+    await migration.init_folder_tree()
+
+    async for session in database.get_session():
+        root = await Folder.resolve(session, user_id, '/')
+        assert root is not None
+        root_id = root.id
+        a = await root.create_child(session, "a")
+        a_id = a.id
+        b = await a.create_child(session, "b")
+        b_id = b.id
+
+        # 模拟路径与父目录不一致的旧数据
+        await Folder.bulk_update(session, Folder.id == a_id, {'path': '/stale_a/'})
+        await Folder.bulk_update(session, Folder.id == b_id, {'path': '/stale_b/'})
+        assert await Folder.backfill_paths(session) == 2
+        assert (await Folder.resolve(session, user_id, '/a/b')).id == b_id
+        assert await Folder.backfill_paths(session) == 0
+
+        # 父目录链构成环时明确报错，而不是无限循环
+        await Folder.bulk_update(session, Folder.id == a_id, {'parent_id': b_id})
+        with pytest.raises(RuntimeError):
+            await Folder.backfill_paths(session)
+        await Folder.bulk_update(session, Folder.id == a_id, {'parent_id': root_id})
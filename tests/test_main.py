@@ -35,4 +35,34 @@ def test_read_main():
     assert json_response['data'] is not None
     assert json_response['msg'] is None
     assert 'instance_id' in json_response
-    is_valid_instance_id(json_response['instance_id'])
\ No newline at end of file
+    is_valid_instance_id(json_response['instance_id'])
+
+def test_site_config_etag():
+    response = client.get("/api/site/config")
+    etag = response.headers.get('etag')
+
+    assert response.status_code == 200
+    assert etag is not None
+    assert etag.startswith('W/"') and etag.endswith('"')
+
+    response = client.get("/api/site/config", headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers.get('etag') == etag
+    assert response.content == b''
+
+    # 弱比较：去掉 W/ 前缀的同一 ETag 也命中
+    response = client.get("/api/site/config", headers={'If-None-Match': etag.removeprefix('W/')})
+    assert response.status_code == 304
+
+    response = client.get("/api/site/config", headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+    assert response.json()['code'] == 0
+
+def test_site_config_etag_stable():
+    from routers.controllers.site import _render_site_config
+
+    first_body, first_etag = _render_site_config()
+    second_body, second_etag = _render_site_config()
+    # 每次渲染的 instance_id 不同，ETag 仍然一致
+    assert first_body != second_body
+    assert first_etag == second_etag
@@ -0,0 +1,104 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_auth_user_cache():
+    """测试鉴权缓存命中时不访问数据库，失效后重新读取"""
+    import uuid
+
+    from sqlalchemy import event
+
+    from middleware import auth
+    from models import database, migration
+    from models.group import Group, GroupOptions
+    from models.user import User
+    from pkg.JWT import jwt as JWT
+
+    await database.init_db(url='sqlite+aiosqlite:///:memory:')
+    await migration.migration()
+    await JWT.load_secret_key()
+
+    statements: list[str] = []
+
+    def count_statements(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    suffix = uuid.uuid4().hex[:8]
+    async for session in database.get_session():
+        group = await Group(name=f'auth_cache_group_{suffix}', options=GroupOptions().model_dump()).save(session)
+        user = await User(username=f'auth_cache_user_{suffix}', password='x', group_id=group.id).save(session)
+        user_id = user.id
+
+        token, _ = JWT.create_access_token(data={'sub': user.username, 'uid': user_id})
+
+        # 第一次请求：缓存未命中，读取数据库
+        authed = await auth.AuthRequired(session, token)
+        assert authed.id == user_id
+
+        event.listen(database.engine.sync_engine, 'before_cursor_execute', count_statements)
+        try:
+            # 第二次请求：命中缓存，连同 AdminRequired 都不访问数据库
+            authed = await auth.AuthRequired(session, token)
+            assert authed.username == f'auth_cache_user_{suffix}'
+            with pytest.raises(auth.HTTPException):
+                await auth.AdminRequired(authed)
+            assert statements == []
+
+            # 失效后重新读取
+            auth.invalidate_group(group.id)
+            authed = await auth.AuthRequired(session, token)
+            assert authed.id == user_id
+            assert len(statements) > 0
+        finally:
+            event.remove(database.engine.sync_engine, 'before_cursor_execute', count_statements)
+
+        auth.invalidate_user(user_id)
+        break
+
+@pytest.mark.asyncio
+async def test_sign_required(monkeypatch):
+    """测试从机校验主机的请求签名：密钥、方法、路径、查询参数、请求体、用途都必须一致"""
+    from fastapi import HTTPException
+    from starlette.requests import Request
+
+    from middleware import auth
+    from models.node import Node
+    from pkg.conf import appmeta
+    from pkg.sign.sign import PURPOSE_REQUEST, Signer
+    from service import storage
+
+    def request(path: str, method: str = 'DELETE', query: bytes = b'', body: bytes = b'') -> Request:
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        scope = {'type': 'http', 'method': method, 'path': path, 'headers': [], 'query_string': query}
+        return Request(scope, receive)
+
+    node = Node(name='slave', server='slave.example.com', slave_key='slave-key')
+    token = storage.slave_request_headers(
+        node, '/api/slave/delete', method='DELETE', query='b=2&a=1', body=b'["/data/a"]',
+    )['Authorization'].removeprefix('Bearer ')
+
+    with pytest.raises(HTTPException) as exc_info:
+        await auth.SignRequired(request('/api/slave/delete', query=b'a=1&b=2', body=b'["/data/a"]'), token)
+    assert exc_info.value.status_code == 403  # 未开启从机模式
+
+    monkeypatch.setattr(appmeta, 'slave_secret', 'slave-key')
+    # 查询参数的顺序不影响签名
+    claims = await auth.SignRequired(request('/api/slave/delete', query=b'a=1&b=2', body=b'["/data/a"]'), token)
+    assert claims.path == '/api/slave/delete'
+
+    # 换路径、方法、查询参数或请求体重放都会被拒绝
+    for forged in (
+            request('/api/slave/thumb/1', query=b'a=1&b=2', body=b'["/data/a"]'),
+            request('/api/slave/delete', method='POST', query=b'a=1&b=2', body=b'["/data/a"]'),
+            request('/api/slave/delete', query=b'a=1&b=3', body=b'["/data/a"]'),
+            request('/api/slave/delete', query=b'a=1&b=2', body=b'["/etc"]'),
+    ):
+        with pytest.raises(HTTPException):
+            await auth.SignRequired(forged, token)
+    with pytest.raises(HTTPException):
+        await auth.DownloadSignRequired(token)
+
+    # 没有请求摘要的令牌（只签了路径）不再被接受
+    path_only = Signer('slave-key').create('/api/slave/delete', 60, purpose=PURPOSE_REQUEST)
+    with pytest.raises(HTTPException):
+        await auth.SignRequired(request('/api/slave/delete'), path_only)
@@ -0,0 +1,87 @@
+import io
+import zipfile
+import zlib
+from datetime import datetime
+
+import pytest
+
+from pkg.archive.zipstream import ZipEntry, ZipStream, should_store
+
+async def collect(stream: ZipStream, *args) -> bytes:
+    return b''.join([chunk async for chunk in stream.stream(*args)])
+
+def make_entries(tmp_path, with_crc: bool) -> list[ZipEntry]:
+    contents = {
+        "docs/readme.txt": b"hello zip " * 50000,
+        "docs/photo.jpg": bytes(range(256)) * 2000,
+        "docs/empty.txt": b"",
+        "中文.txt": "你好".encode() * 1000,
+    }
+    entries = [ZipEntry("docs/", None, 0, datetime(2024, 5, 1, 12, 30))]
+    for index, (name, content) in enumerate(contents.items()):
+        path = tmp_path / f"{index}.bin"
+        path.write_bytes(content)
+        crc32 = zlib.crc32(content) if with_crc else None
+        entries.append(ZipEntry(name, path, len(content), datetime(2024, 5, 1, 12, 30), crc32))
+    return entries
+
+def test_should_store():
+    assert should_store("a.JPG") and should_store("b.tar.gz") and should_store("c.docx")
+    assert not should_store("a.txt") and not should_store("jpg") and not should_store("Makefile")
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compress", [True, False])
+@pytest.mark.parametrize("with_crc", [True, False])
+async def test_zipstream_roundtrip(tmp_path, compress, with_crc):
+    """测试生成的压缩包能被 zipfile 正确读取，并且只在能确定时给出大小"""
+    entries = make_entries(tmp_path, with_crc)
+    stream = ZipStream(entries, compress=compress)
+    data = await collect(stream)
+
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.testzip() is None
+    assert archive.namelist() == [entry.name for entry in entries]
+    for entry in entries:
+        info = archive.getinfo(entry.name)
+        assert info.is_dir() == (entry.path is None)
+        assert info.date_time == (2024, 5, 1, 12, 30, 0)
+        if entry.path is not None:
+            assert archive.read(entry.name) == entry.path.read_bytes()
+
+    # 已经压缩过的类型总是直接存储
+    assert archive.getinfo("docs/photo.jpg").compress_type == zipfile.ZIP_STORED
+    expected = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    assert archive.getinfo("docs/readme.txt").compress_type == expected
+
+    assert stream.size == (None if compress else len(data))
+    assert stream.seekable == (not compress and with_crc)
+
+@pytest.mark.asyncio
+async def test_zipstream_ranges(tmp_path):
+    """测试可寻址的压缩包从任意位置输出的内容与完整输出一致"""
+    stream = ZipStream(make_entries(tmp_path, with_crc=True), compress=False)
+    data = await collect(stream)
+    size = len(data)
+
+    for start, end in [(0, 1), (10, 100), (100, 300000), (300000, size), (size - 22, size), (0, size)]:
+        assert await collect(stream, start, end) == data[start:end]
+
+    # 不可寻址时拒绝部分输出
+    with pytest.raises(ValueError):
+        await collect(ZipStream(make_entries(tmp_path, with_crc=False), compress=False), 10)
+
+@pytest.mark.asyncio
+async def test_zipstream_zip64_records():
+    """测试条目数超过 65535 时写入 ZIP64 结尾记录"""
+    entries = [ZipEntry(f"d{i}/", None, 0, datetime(2024, 1, 1)) for i in range(70000)]
+    stream = ZipStream(entries)
+    data = await collect(stream)
+    assert stream.size == len(data)
+    assert len(zipfile.ZipFile(io.BytesIO(data)).namelist()) == 70000
+
+@pytest.mark.asyncio
+async def test_zipstream_missing_file(tmp_path):
+    """测试读取出错时异常传递给发送方"""
+    entries = [ZipEntry("gone.txt", tmp_path / "gone.txt", 10, datetime(2024, 1, 1))]
+    with pytest.raises(FileNotFoundError):
+        await collect(ZipStream(entries))
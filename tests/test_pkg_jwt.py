@@ -0,0 +1,59 @@
+import pytest
+import jwt
+from datetime import datetime, timedelta, timezone
+
+from pkg.JWT.jwt import JWTKeyring, UnknownKeyIdError
+
+def _payload(expires_delta: timedelta = timedelta(hours=1)) -> dict:
+    return {'sub': 'user', 'uid': 1, 'exp': datetime.now(timezone.utc) + expires_delta}
+
+def test_keyring_roundtrip():
+    keyring = JWTKeyring()
+    keyring.load('old-secret')
+    token = keyring.encode(_payload())
+
+    assert jwt.get_unverified_header(token)['kid'] == keyring.active_kid
+    assert keyring.decode(token)['uid'] == 1
+    # 与 PyJWT 的完整校验结果一致
+    assert jwt.decode(token, 'old-secret', algorithms=['HS256'])['uid'] == 1
+
+def test_keyring_rotation():
+    keyring = JWTKeyring()
+    keyring.load('old-secret')
+    old_token = keyring.encode(_payload())
+
+    # 轮换期间新旧密钥同时有效
+    keyring.load('new-secret', ['old-secret'])
+    new_token = keyring.encode(_payload())
+    assert keyring.decode(old_token)['sub'] == 'user'
+    assert keyring.decode(new_token)['sub'] == 'user'
+
+    # 旧密钥移除后，旧令牌的 kid 不再被识别
+    keyring.load('new-secret')
+    with pytest.raises(UnknownKeyIdError):
+        keyring.decode(old_token)
+
+def test_keyring_rejects_invalid_tokens():
+    keyring = JWTKeyring()
+    keyring.load('secret')
+
+    expired = keyring.encode(_payload(timedelta(seconds=-10)))
+    with pytest.raises(jwt.ExpiredSignatureError):
+        keyring.decode(expired)
+
+    token = keyring.encode(_payload())
+    header, payload, signature = token.split('.')
+    tampered = '.'.join([header, payload, signature[:-2] + ('AA' if signature[-2:] != 'AA' else 'BB')])
+    with pytest.raises(jwt.InvalidSignatureError):
+        keyring.decode(tampered)
+
+    with pytest.raises(jwt.InvalidTokenError):
+        keyring.decode('not-a-token')
+
+    none_alg = jwt.encode(_payload(), None, algorithm='none')
+    with pytest.raises(jwt.InvalidAlgorithmError):
+        keyring.decode(none_alg)
+
+    # 没有 kid 的旧令牌仍可用密钥环中的密钥校验
+    legacy = jwt.encode(_payload(), 'secret', algorithm='HS256')
+    assert keyring.decode(legacy)['uid'] == 1
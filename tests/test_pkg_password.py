@@ -5,4 +5,34 @@ def test_password():
     for i in range(10):
         password = Password.generate()
         hashed_password = Password.hash(password)
-        assert Password.verify(hashed_password, password)
\ No newline at end of file
+        assert Password.verify(hashed_password, password)
+
+@pytest.mark.asyncio
+async def test_password_async():
+    password = Password.generate()
+    hashed_password = await Password.hash_async(password)
+    assert await Password.verify_async(hashed_password, password)
+    assert not await Password.verify_async(hashed_password, 'wrong password')
+    assert not await Password.verify_async('not a hash', password)
+
+def test_password_needs_rehash():
+    from argon2 import PasswordHasher
+
+    password = Password.generate()
+    assert not Password.needs_rehash(Password.hash(password))
+
+    weak_hash = PasswordHasher(time_cost=1, memory_cost=8, parallelism=1).hash(password)
+    assert Password.verify(weak_hash, password)
+    assert Password.needs_rehash(weak_hash)
+
+@pytest.mark.asyncio
+async def test_password_pool_backpressure(monkeypatch):
+    from fastapi import HTTPException
+    from pkg.conf import appmeta
+
+    monkeypatch.setattr(appmeta, 'password_hash_queue', 0)
+    monkeypatch.setattr(Password, '_pending', appmeta.password_hash_workers)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await Password.hash_async('password')
+    assert exc_info.value.status_code == 429
@@ -0,0 +1,49 @@
+import gc
+import time
+
+import pytest
+
+from pkg.ratelimit.bucket import SharedBuckets, TokenBucket, consume_all, throttle
+
+def test_bucket_reserve():
+    bucket = TokenBucket(1000)
+    # 初始为满桶，一秒的量可以立即发送
+    assert bucket.reserve(1000) == 0
+    # 透支 500 字节需要等待约 0.5 秒
+    assert bucket.reserve(500) == pytest.approx(0.5, abs=0.05)
+    # 透支会累积，后来者排在后面
+    assert bucket.reserve(500) == pytest.approx(1.0, abs=0.05)
+
+def test_shared_buckets():
+    bucket = SharedBuckets.get("user-1", 100)
+    assert SharedBuckets.get("user-1", 100) is bucket
+    # 速率变化时就地更新
+    assert SharedBuckets.get("user-1", 200) is bucket and bucket.rate == 200
+
+    # 没有连接持有时自动释放
+    del bucket
+    gc.collect()
+    assert "user-1" not in SharedBuckets._buckets
+
+@pytest.mark.asyncio
+async def test_throttle_rate():
+    async def chunks():
+        for _ in range(10):
+            yield b"x" * 5000
+
+    bucket = TokenBucket(100_000, capacity=10_000)
+    start = time.monotonic()
+    received = sum([len(chunk) async for chunk in throttle(chunks(), [bucket])])
+    elapsed = time.monotonic() - start
+
+    assert received == 50_000
+    # 扣除初始的 10000 字节后按 100 KB/s 发送，约 0.4 秒
+    assert 0.3 <= elapsed < 1.0
+
+@pytest.mark.asyncio
+async def test_consume_all_uses_slowest_bucket():
+    fast = TokenBucket(1_000_000, capacity=0)
+    slow = TokenBucket(10_000, capacity=0)
+    start = time.monotonic()
+    await consume_all([fast, slow], 1000)
+    assert 0.08 <= time.monotonic() - start < 0.5
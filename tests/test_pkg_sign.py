@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from pkg.sign.sign import (
+    PURPOSE_DOWNLOAD,
+    PURPOSE_REQUEST,
+    SignatureError,
+    SignatureExpiredError,
+    SignedClaims,
+    Signer,
+    request_digest,
+)
+
+def test_sign_roundtrip():
+    signer = Signer('slave-key')
+    token = signer.create('/data/文件.iso', 60, speed=512, user_id=7, name='文件.iso')
+
+    claims = signer.verify(token)
+    assert (claims.path, claims.speed, claims.user_id, claims.name) == ('/data/文件.iso', 512, 7, '文件.iso')
+    assert claims.expires > time.time()
+
+def test_sign_rejects_tampering():
+    signer = Signer('slave-key')
+    token = signer.create('/data/a.iso', 60)
+    body, signature = token.split('.')
+
+    # 用其他密钥签名、篡改声明、篡改签名、格式错误都会被拒绝
+    with pytest.raises(SignatureError):
+        Signer('other-key').verify(token)
+    forged = Signer('other-key').sign(SignedClaims('/etc/passwd', int(time.time()) + 60))
+    with pytest.raises(SignatureError):
+        signer.verify(f"{forged.split('.')[0]}.{signature}")
+    with pytest.raises(SignatureError):
+        signer.verify(f"{body}.{signature[:-2]}AA")
+    with pytest.raises(SignatureError):
+        signer.verify('not-a-token')
+
+    # 不同用途的签名不能混用
+    with pytest.raises(SignatureError):
+        signer.verify(token, PURPOSE_REQUEST)
+    assert signer.verify(signer.create('/api/slave/delete', 60, purpose=PURPOSE_REQUEST), PURPOSE_REQUEST)
+
+def test_sign_expiry():
+    signer = Signer('slave-key')
+    token = signer.create('/data/a.iso', 10)
+    assert signer.verify(token, PURPOSE_DOWNLOAD, now=time.time() + 5)
+    with pytest.raises(SignatureExpiredError):
+        signer.verify(token, PURPOSE_DOWNLOAD, now=time.time() + 11)
+
+def test_slave_signed_download(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from main import app
+    from models.node import Node
+    from pkg.conf import appmeta
+    from service import storage
+
+    monkeypatch.setattr(appmeta, 'slave_secret', 'slave-key')
+    path = tmp_path / 'a.iso'
+    path.write_bytes(b'0123456789')
+    node = Node(name='slave', server='slave.example.com', slave_key='slave-key')
+
+    url = storage.slave_download_url(node, str(path), ttl=60, name='b.iso')
+    assert url.startswith('http://slave.example.com/api/slave/download/')
+    token = url.rsplit('/', 1)[1]
+
+    client = TestClient(app)
+    response = client.get(f'/api/slave/download/{token}', headers={'Range': 'bytes=2-4'})
+    assert response.status_code == 206 and response.content == b'234'
+    assert 'b.iso' in response.headers['content-disposition']
+
+    # 主机用错误的密钥签名
+    node.slave_key = 'wrong-key'
+    token = storage.slave_download_url(node, str(path), ttl=60).rsplit('/', 1)[1]
+    assert client.get(f'/api/slave/download/{token}').status_code == 403
+
+def test_request_digest():
+    digest = request_digest('delete', '/api/slave/delete', 'b=2&a=1', b'{}')
+    assert digest == request_digest('DELETE', '/api/slave/delete', 'a=1&b=2', b'{}')
+    assert digest != request_digest('POST', '/api/slave/delete', 'a=1&b=2', b'{}')
+    assert digest != request_digest('DELETE', '/api/slave/delete', 'a=1', b'{}')
+    assert digest != request_digest('DELETE', '/api/slave/delete', 'a=1&b=2', b'{"x":1}')
+
+    signer = Signer('slave-key')
+    token = signer.create('/api/slave/delete', 60, request=digest, purpose=PURPOSE_REQUEST)
+    assert signer.verify(token, PURPOSE_REQUEST).request == digest
@@ -0,0 +1,42 @@
+import codecs
+
+import pytest
+
+from pkg.text.reader import detect_encoding, read_text
+
+def read_all(path, length: int) -> str:
+    text, offset = '', 0
+    while True:
+        window = read_text(path, offset, length)
+        text += window.text
+        if window.end >= window.size:
+            return text
+        offset = window.end
+
+def test_detect_encoding():
+    assert detect_encoding(codecs.BOM_UTF8 + b"abc") == ('utf-8', 3)
+    assert detect_encoding(codecs.BOM_UTF32_LE + b"a\0\0\0") == ('utf-32-le', 4)
+    assert detect_encoding(codecs.BOM_UTF16_BE + b"\0a") == ('utf-16-be', 2)
+    # 样本截断在多字节字符中间仍判断为 UTF-8
+    assert detect_encoding("日志".encode()[:-1]) == ('utf-8', 0)
+    assert detect_encoding("日志".encode('gb18030')) == ('gb18030', 0)
+    assert detect_encoding(b"a\x80b") == ('latin-1', 0)
+
+@pytest.mark.parametrize("encoding", ['utf-8', 'utf-8-sig', 'utf-16', 'gb18030'])
+def test_read_text_windows(tmp_path, encoding):
+    """测试按窗口分段读取文本"""
+    text = "第 1 行 log line ✓\n" * 300
+    path = tmp_path / "app.log"
+    path.write_bytes(text.encode(encoding))
+
+    whole = read_text(path)
+    assert whole.text == text and whole.end == whole.size == path.stat().st_size
+    # 从上一段的 end 继续读，拼接结果与整体读取一致
+    assert read_all(path, 37) == text
+    window = read_text(path, 5, 100)
+    assert window.end - window.offset <= 100 and window.size == whole.size
+
+def test_read_text_empty(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.touch()
+    assert read_text(path, 10, 10) == ('', 'utf-8', 0, 0, 0)
@@ -0,0 +1,534 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_storage_quota(session, make_user):
+    """测试用户已用空间的原子增减、容量上限与校准"""
+    from fastapi import HTTPException
+
+    from models.file import File
+    from models.folder import Folder
+    from models.storage_pack import StoragePack
+    from models.user import User
+    from service import storage
+
+    user_id, _, policy_id, root_id = await make_user()
+    root = await Folder.get_exist_one(session, root_id)
+
+    assert await storage.get_capacity(session, user_id) == 1000
+
+    # 容量包生效后需要使缓存失效
+    await StoragePack(name="pack", size=500, user_id=user_id).save(session)
+    assert await storage.get_capacity(session, user_id) == 1000
+    storage.invalidate_capacity(user_id)
+    assert await storage.get_capacity(session, user_id) == 1500
+
+    file = await storage.add_file(session, File(name="a.bin", size=1200, user_id=user_id, policy_id=policy_id), root)
+    assert await storage.get_usage(session, user_id) == (1200, 1500)
+    assert await storage.can_fit(session, user_id, 300)
+    assert not await storage.can_fit(session, user_id, 301)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await storage.add_file(session, File(name="b.bin", size=400, user_id=user_id, policy_id=policy_id), root)
+    assert exc_info.value.status_code == 413
+    assert await storage.get_usage(session, user_id) == (1200, 1500)
+
+    await file.remove(session)
+    assert await storage.get_usage(session, user_id) == (0, 1500)
+
+    # 人为制造偏差后校准
+    await User.bulk_update(session, User.id == user_id, {'storage': 12345})
+    await File(name="c.bin", size=10, user_id=user_id, policy_id=policy_id).add_to(session, root)
+    assert await storage.calibrate_storage(session, user_id) == 1
+    assert await storage.get_usage(session, user_id) == (10, 1500)
+
+@pytest.mark.asyncio
+async def test_chunked_upload(session, temp_path, make_user, body, monkeypatch):
+    """测试分块流式写入：断点续传记录、越界/重复/大小不符的分块被拒绝、增量摘要、并发与完成失败"""
+    import asyncio
+    import hashlib
+    import uuid
+    from datetime import timedelta
+    from pathlib import Path
+
+    from fastapi import HTTPException
+
+    from models.folder import Folder
+    from models.policy import Policy
+    from models.user import User
+    from pkg.conf import appmeta
+    from service import storage
+
+    monkeypatch.setattr(appmeta, "upload_buffer_size", 4)
+
+    user_id, _, _, root_id = await make_user(policy_options='{"chunk_size": 10}')
+    root = await Folder.get_exist_one(session, root_id)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await storage.create_session(session, user_id, root, "big.bin", 1001)
+    assert exc_info.value.status_code == 413
+
+    upload = await storage.create_session(session, user_id, root, "a.bin", 25)
+    assert (upload.chunk_size, upload.chunk_count) == (10, 3)
+    assert upload.expected_chunk_size(2) == 5
+
+    assert await storage.write_chunk(upload, 1, 10, body(b"0123", b"456789")) == 10
+    assert await storage.received_chunks(upload) == [1]
+    assert storage.data_path(upload.id).read_bytes() == b"\0" * 10 + b"0123456789" + b"\0" * 5
+
+    for index, length, pieces, status in [
+        (3, 10, [b"0123456789"], 416),          # 越界
+        (1, 10, [b"0123456789"], 409),          # 重复
+        (0, 9, [b"012345678"], 400),            # Content-Length 不符
+        (0, None, [b"0123456789", b"x"], 400),  # 实际数据超长
+        (2, None, [b"012"], 400),               # 实际数据不足
+    ]:
+        with pytest.raises(HTTPException) as exc_info:
+            await storage.write_chunk(upload, index, length, body(*pieces))
+        assert exc_info.value.status_code == status
+
+    # 失败的分块不会留下半截文件
+    assert await storage.received_chunks(upload) == [1]
+    assert sorted(path.name for path in storage.session_dir(upload.id).iterdir()) == ["1.chunk", "data"]
+    assert await storage.complete_upload(session, upload) is None
+
+    await storage.write_chunk(upload, 2, 5, body(b"abcde"))
+    await storage.write_chunk(upload, 0, None, body(b"ABCDEFGHIJ"))
+    assert await storage.received_chunks(upload) == [0, 1, 2]
+    # 分块 0 边写边算，提前到达的 1、2 随后从数据文件补算
+    assert storage.UploadHashStore.get(upload.id).next_index == 3
+
+    # 分块到齐后数据文件即完整文件，完成上传只需移动
+    content = b"ABCDEFGHIJ0123456789abcde"
+    file = await storage.complete_upload(session, upload)
+    assert (file.name, file.size) == ("a.bin", 25)
+    assert (file.md5, file.sha1, file.sha256) == (
+        hashlib.md5(content).hexdigest(), hashlib.sha1(content).hexdigest(), hashlib.sha256(content).hexdigest(),
+    )
+    assert Path(file.source_name).read_bytes() == content
+    assert not storage.session_dir(upload.id).exists()
+    assert (await User.get_exist_one(session, user_id)).storage == 25
+
+    # 进程重启丢失摘要进度时，完成上传前从数据文件补算
+    upload = await storage.create_session(session, user_id, root, "b.bin", 3)
+    await storage.write_chunk(upload, 0, 3, body(b"xyz"))
+    storage.UploadHashStore.discard(upload.id)
+    file = await storage.complete_upload(session, upload)
+    assert file.sha256 == hashlib.sha256(b"xyz").hexdigest()
+
+    # 目标目录已有同名文件、存储策略不是本地策略时，创建会话就拒绝
+    with pytest.raises(HTTPException) as exc_info:
+        await storage.create_session(session, user_id, root, "b.bin", 3)
+    assert exc_info.value.status_code == 409
+    remote_id = (await Policy(name=f"test_remote_policy_{uuid.uuid4().hex[:8]}", type="remote").save(session)).id
+    root = await Folder.get_exist_one(session, root_id)
+    remote_folder_id = (await root.create_child(session, "remote")).id
+    await Folder.bulk_update(session, Folder.id == remote_folder_id, {'policy_id': remote_id})
+    with pytest.raises(HTTPException) as exc_info:
+        await storage.create_session(session, user_id, await Folder.get_exist_one(session, remote_folder_id), "c.bin", 3)
+    assert exc_info.value.status_code == 501
+
+    # 同一分块的并发请求只有一个写入，完成上传期间不再接受写入
+    async def slow_body(content: bytes):
+        for byte in content:
+            await asyncio.sleep(0)
+            yield bytes([byte])
+
+    root = await Folder.get_exist_one(session, root_id)
+    upload = await storage.create_session(session, user_id, root, "c.bin", 15)
+    results = await asyncio.gather(
+        *(storage.write_chunk(upload, 0, 10, slow_body(b"0123456789")) for _ in range(3)),
+        return_exceptions=True,
+    )
+    assert results.count(10) == 1
+    assert sorted(e.status_code for e in results if isinstance(e, HTTPException)) == [409, 409]
+    storage.complete_lock(upload.id).touch()
+    with pytest.raises(HTTPException) as exc_info:
+        await storage.write_chunk(upload, 1, 5, body(b"abcde"))
+    assert exc_info.value.status_code == 409
+    storage.complete_lock(upload.id).unlink()
+
+    # 完成时写入文件记录失败：数据已入库，会话随之删除，错误即为最终结果；之后清理掉没有引用的 Blob
+    await storage.write_chunk(upload, 1, 5, body(b"abcde"))
+    conflict = await storage.create_session(session, user_id, await Folder.get_exist_one(session, root_id), "c.bin", 15)
+    await storage.write_chunk(conflict, 0, 10, body(b"9876543210"))
+    await storage.write_chunk(conflict, 1, 5, body(b"edcba"))
+    await storage.complete_upload(session, conflict)
+    with pytest.raises(HTTPException) as exc_info:
+        await storage.complete_upload(session, upload)
+    assert exc_info.value.status_code == 409
+    assert not storage.session_dir(upload.id).exists()
+
+    monkeypatch.setattr(storage.blob, "PURGE_GRACE", timedelta(seconds=-1))
+    assert await storage.purge_blobs(session) >= 1
+    with pytest.raises(HTTPException) as exc_info:
+        await storage.UploadSessionStore.get(session, upload.id, user_id)
+    assert exc_info.value.status_code == 404
+    assert await storage.complete_upload(session, upload) is None
+
+@pytest.mark.asyncio
+async def test_blob_dedup(session, tmp_path, make_user, upload, monkeypatch):
+    """测试相同内容只存一份、秒传、引用计数与清理"""
+    import hashlib
+    import uuid
+    from datetime import timedelta
+    from pathlib import Path
+
+    from fastapi import HTTPException
+    from sqlalchemy import insert
+
+    from models.blob import Blob
+    from models.file import File
+    from models.folder import Folder
+    from models.policy import Policy
+    from models.user import User
+    from service import storage
+
+    monkeypatch.setattr(storage.blob, "PURGE_GRACE", timedelta(seconds=-1))
+
+    async def ref_count(blob_id: int) -> int:
+        blob = await Blob.get_exist_one(session, blob_id)
+        await session.refresh(blob)
+        return blob.ref_count
+
+    content = b"same iso content"
+    sha256 = hashlib.sha256(content).hexdigest()
+
+    user_id, _, policy_id, root_id = await make_user()
+    root = await Folder.get_exist_one(session, root_id)
+
+    # 没有相同内容时不能秒传
+    assert await storage.instant_upload(session, user_id, root, "x.iso", len(content), sha256) is None
+
+    first = await upload(user_id, root_id, "a.iso", content)
+    first_id, blob_id, source = first.id, first.blob_id, first.source_name
+    assert await ref_count(blob_id) == 1
+
+    # 分块上传相同内容：复用已有 Blob，不再多存一份
+    second = await upload(user_id, root_id, "b.iso", content)
+    second_id = second.id
+    assert (second.blob_id, second.source_name) == (blob_id, source)
+    assert len(list((tmp_path / "store" / "blobs").rglob("*_*"))) == 1
+
+    # 秒传：不传输数据直接创建文件，仍计入用户已用空间
+    root = await Folder.get_exist_one(session, root_id)
+    third = await storage.instant_upload(session, user_id, root, "c.iso", len(content), sha256.upper())
+    assert third.blob_id == blob_id
+    assert await ref_count(blob_id) == 3
+    assert (await User.get_exist_one(session, user_id)).storage == 3 * len(content)
+
+    # 秒传失败（同名）时引用计数一起回滚
+    root = await Folder.get_exist_one(session, root_id)
+    with pytest.raises(HTTPException):
+        await storage.instant_upload(session, user_id, root, "c.iso", len(content), sha256)
+    assert await ref_count(blob_id) == 3
+
+    # 删除文件释放引用，计数归零后才清理物理文件
+    for file_id in (first_id, second_id):
+        await (await File.get_exist_one(session, file_id)).remove(session)
+    await storage.purge_blobs(session)
+    assert Path(source).exists()
+
+    root = await Folder.get_exist_one(session, root_id)
+    await root.delete_tree(session)
+    assert await ref_count(blob_id) == 0
+
+    # 复用已有 Blob 时在同一事务内取得引用，挂上文件之前不会被清理
+    policy = await Policy.get_exist_one(session, policy_id)
+    held = await storage.store_blob(session, policy, tmp_path / "unused", len(content), {'sha256': sha256}, uuid.uuid4())
+    assert held.id == blob_id
+    assert await ref_count(blob_id) == 1
+    await storage.purge_blobs(session)
+    assert Path(source).exists()
+
+    await Blob.release_one(session, blob_id)
+    assert await storage.purge_blobs(session) >= 1
+    assert not Path(source).exists()
+    assert await Blob.get(session, Blob.id == blob_id) is None
+
+    # 入库时撞上相同内容的 Blob、而它随即被清理：数据移回原处，不会丢失
+    other = b"raced content"
+    other_sha256 = hashlib.sha256(other).hexdigest()
+    await session.exec(insert(Blob).values(sha256=other_sha256, size=len(other), source_name="gone", policy_id=policy_id))
+    await session.commit()
+
+    async def purged(cls, session, condition, *, commit=True):
+        return None
+
+    monkeypatch.setattr(Blob, "acquire", classmethod(purged))
+    upload_data = tmp_path / "raced.bin"
+    upload_data.write_bytes(other)
+    policy = await Policy.get_exist_one(session, policy_id)
+    with pytest.raises(HTTPException) as exc_info:
+        await storage.store_blob(session, policy, upload_data, len(other), {'sha256': other_sha256}, uuid.uuid4())
+    assert exc_info.value.status_code == 409
+    assert upload_data.read_bytes() == other
+
+@pytest.mark.asyncio
+async def test_zerocopy_copy_file(tmp_path):
+    """测试内核拷贝与回退路径得到一致的结果"""
+    import os
+
+    from pkg.fs import zerocopy
+
+    src = tmp_path / "src.bin"
+    src.write_bytes(os.urandom(3 * 1024 * 1024 + 7))
+
+    zerocopy.copy_file(src, tmp_path / "dst.bin")
+    assert (tmp_path / "dst.bin").read_bytes() == src.read_bytes()
+
+    zerocopy.move_file(tmp_path / "dst.bin", tmp_path / "sub" / "moved.bin")
+    assert (tmp_path / "sub" / "moved.bin").read_bytes() == src.read_bytes()
+    assert not (tmp_path / "dst.bin").exists()
+
+@pytest.mark.asyncio
+async def test_upload_session_store(session, temp_path, make_user):
+    """测试上传会话的内存索引、过期清理、孤儿目录清理与一次性清空"""
+    import uuid
+    from datetime import datetime, timedelta
+
+    from fastapi import HTTPException
+
+    from models.folder import Folder
+    from models.upload_session import UploadSession
+    from service import storage
+    from service.storage import UploadSessionStore
+
+    user_id, _, _, root_id = await make_user()
+    root = await Folder.get_exist_one(session, root_id)
+
+    alive = await storage.create_session(session, user_id, root, "alive.bin", 10)
+    expired = await storage.create_session(session, user_id, root, "expired.bin", 10)
+    await UploadSession.bulk_update(
+        session, UploadSession.id == expired.id, {'expires': datetime.now() - timedelta(seconds=1)}
+    )
+    UploadSessionStore._sessions.pop(expired.id)
+    orphan = storage.session_dir(uuid.uuid4())
+    orphan.mkdir(parents=True)
+
+    assert (await UploadSessionStore.get(session, alive.id, user_id)).name == "alive.bin"
+    with pytest.raises(HTTPException):
+        await UploadSessionStore.get(session, alive.id, user_id + 1)
+    with pytest.raises(HTTPException):
+        await UploadSessionStore.get(session, expired.id, user_id)
+
+    assert await UploadSessionStore.sweep(session) == 2
+    assert not storage.session_dir(expired.id).exists()
+    assert not orphan.exists()
+    assert storage.session_dir(alive.id).exists()
+
+    await storage.create_session(session, user_id, root, "another.bin", 10)
+    assert await UploadSessionStore.clear_user(session, user_id) == 2
+    assert list(storage.session_dir(alive.id).parent.iterdir()) == []
+    with pytest.raises(HTTPException):
+        await UploadSessionStore.get(session, alive.id, user_id)
+
+@pytest.mark.asyncio
+async def test_file_response_ranges(tmp_path):
+    """测试下载的 Range、多段 Range、If-Range 与条件请求"""
+    from email.utils import formatdate
+
+    from fastapi import FastAPI, Request
+    from fastapi.testclient import TestClient
+
+    from pkg.ratelimit.bucket import TokenBucket
+    from service import storage
+
+    path = tmp_path / "video.bin"
+    path.write_bytes(bytes(range(256)) * 4)
+    etag = '"abc"'
+
+    app = FastAPI()
+
+    @app.get("/f")
+    async def download(request: Request):
+        return await storage.file_response(request, path, filename="video.bin", etag=etag)
+
+    @app.get("/slow")
+    async def slow_download(request: Request):
+        return await storage.file_response(request, path, filename="video.bin", buckets=[TokenBucket(1 << 20)])
+
+    client = TestClient(app)
+
+    response = client.get("/f")
+    assert response.status_code == 200 and response.content == path.read_bytes()
+    assert response.headers["etag"] == etag
+    last_modified = response.headers["last-modified"]
+
+    response = client.get("/f", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 10-19/1024"
+    assert response.content == path.read_bytes()[10:20]
+
+    response = client.get("/f", headers={"Range": "bytes=0-1,-2"})
+    assert response.status_code == 206
+    boundary = response.headers["content-type"].removeprefix("multipart/byteranges; boundary=")
+    assert boundary != response.headers["content-type"]
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert response.content.count(f"--{boundary}".encode()) == 3
+    assert b"Content-Range: bytes 1022-1023/1024" in response.content
+
+    assert client.get("/f", headers={"Range": "bytes=5000-"}).status_code == 416
+
+    # If-Range 不匹配时返回完整内容
+    assert client.get("/f", headers={"Range": "bytes=0-9", "If-Range": '"old"'}).status_code == 200
+    assert client.get("/f", headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+
+    assert client.get("/f", headers={"If-None-Match": f'W/"x", {etag}'}).status_code == 304
+    assert client.get("/f", headers={"If-None-Match": '"x"'}).status_code == 200
+    assert client.get("/f", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/f", headers={"If-Modified-Since": formatdate(0, usegmt=True)}).status_code == 200
+
+    # 服务器支持 zerocopy 扩展时，单段 Range 直接交给服务器发送
+    messages = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopy":
+            message = {**message, "file": message["file"].fileno() >= 0}
+        messages.append(message)
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/f", "query_string": b"", "root_path": "",
+        "headers": [(b"range", b"bytes=100-199")],
+        "extensions": {"http.response.zerocopy": {}},
+    }
+    await app(scope, receive, send)
+    assert messages[0]["status"] == 206
+    assert messages[1] == {
+        "type": "http.response.zerocopy", "file": True, "offset": 100, "count": 100, "more_body": False,
+    }
+
+    # 限速时数据必须经过令牌桶，不能交给服务器直接发送
+    messages.clear()
+    await app({**scope, "path": "/slow"}, receive, send)
+    assert messages[0]["status"] == 206
+    assert [message["type"] for message in messages[1:]] == ["http.response.body"]
+    assert messages[1]["body"] == path.read_bytes()[100:200]
+
+@pytest.mark.asyncio
+async def test_archive_download(session, temp_path, make_user, upload, monkeypatch):
+    """测试打包下载：目录结构、重名处理，以及直接存储时的 Content-Length 与 Range"""
+    import asyncio
+    import io
+    import zipfile
+
+    from fastapi import HTTPException, Request
+
+    from models.folder import Folder
+    from models.setting import SettingsCache, SettingsType
+    from service import storage
+
+    async def download(session_id, headers: dict[str, str] | None = None) -> tuple[int, dict[str, str], bytes]:
+        scope = {
+            "type": "http", "method": "GET", "path": "/archive.zip", "query_string": b"", "root_path": "",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        }
+        response = storage.archive_response(Request(scope), session_id, storage.ArchiveSessionStore.get(session_id))
+        messages = []
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+
+        await response(scope, receive, send)
+        content = b"".join(message.get("body", b"") for message in messages[1:])
+        return messages[0]["status"], {k.decode(): v.decode() for k, v in messages[0]["headers"]}, content
+
+    user_id, _, _, root_id = await make_user(max_storage=1 << 20)
+    root = await Folder.get_exist_one(session, root_id)
+    docs = await root.create_child(session, "docs")
+    docs_id = docs.id
+    await (await Folder.get_exist_one(session, docs_id)).create_child(session, "empty")
+
+    readme = b"readme " * 1000
+    await upload(user_id, docs_id, "a.txt", readme)
+    top_id = (await upload(user_id, root_id, "docs", b"same name as folder")).id
+
+    with pytest.raises(HTTPException):
+        await storage.create_archive(session, user_id, [], [])
+    with pytest.raises(HTTPException):
+        await storage.create_archive(session, user_id + 1, [top_id], [])
+
+    session_id = await storage.create_archive(session, user_id, [top_id], [docs_id], compress=False)
+    status, headers, content = await download(session_id)
+    assert status == 200 and headers["accept-ranges"] == "bytes"
+    assert int(headers["content-length"]) == len(content)
+
+    archive = zipfile.ZipFile(io.BytesIO(content))
+    assert archive.namelist() == ["docs/", "docs/empty/", "docs/a.txt", "docs (2)"]
+    assert archive.read("docs/a.txt") == readme
+
+    # 断点续传
+    status, headers, partial = await download(session_id, {"Range": "bytes=100-"})
+    assert status == 206 and partial == content[100:]
+    assert headers["content-range"] == f"bytes 100-{len(content) - 1}/{len(content)}"
+    status, _, _ = await download(session_id, {"Range": "bytes=100-", "If-Range": '"other"'})
+    assert status == 200
+    with pytest.raises(HTTPException):
+        await download(session_id, {"Range": f"bytes={len(content)}-"})
+
+    # 压缩时大小无法提前确定，不支持 Range
+    session_id = await storage.create_archive(session, user_id, [], [docs_id])
+    status, headers, content = await download(session_id, {"Range": "bytes=100-"})
+    assert status == 200 and "content-length" not in headers and headers["accept-ranges"] == "none"
+    assert zipfile.ZipFile(io.BytesIO(content)).read("docs/a.txt") == readme
+
+    # 会话按 archive_timeout 过期，创建新会话时顺带清除过期的会话
+    monkeypatch.setitem(SettingsCache._values, (SettingsType.TIMEOUT, "archive_timeout"), "-1")
+    expired_id = await storage.create_archive(session, user_id, [], [docs_id])
+    with pytest.raises(HTTPException) as exc_info:
+        storage.ArchiveSessionStore.get(expired_id)
+    assert exc_info.value.status_code == 404
+    expired_id = await storage.create_archive(session, user_id, [], [docs_id])
+    assert expired_id in storage.ArchiveSessionStore._sessions._data
+    await storage.create_archive(session, user_id, [], [docs_id])
+    assert expired_id not in storage.ArchiveSessionStore._sessions._data
+
+@pytest.mark.asyncio
+async def test_text_content_and_readme(session, temp_path, make_user, upload, monkeypatch):
+    """测试文本分段读取与 README 缓存"""
+    from models.setting import SettingsCache, SettingsType
+    from pkg.text import reader
+    from service import storage
+
+    monkeypatch.setitem(SettingsCache._values, (SettingsType.FILE_EDIT, "maxEditSize"), "64")
+
+    reads = []
+    read_text = reader.read_text
+
+    def counting_read_text(*args):
+        reads.append(args)
+        return read_text(*args)
+
+    monkeypatch.setattr("service.storage.text.read_text", counting_read_text)
+
+    user_id, _, _, root_id = await make_user(max_storage=1 << 20)
+
+    log = "".join(f"第{i}行\n" for i in range(100))
+    log_file = await upload(user_id, root_id, "app.log", log.encode())
+
+    # 单次读取不超过 maxEditSize，从 end 继续读完整个文件
+    text, offset = "", 0
+    while True:
+        window = await storage.read_file_text(session, log_file, offset, 1 << 20)
+        assert window.end - window.offset <= 64
+        text += window.text
+        if window.end == window.size:
+            break
+        offset = window.end
+    assert text == log
+
+    await upload(user_id, root_id, "notes.txt", b"not a readme")
+    await upload(user_id, root_id, "README.md", "# 标题\n".encode())
+    readme = await storage.find_readme(session, root_id)
+    assert readme.name == "README.md"
+
+    # 同一版本的 README 只读取一次
+    reads.clear()
+    first = await storage.ReadmeCache.get(session, readme)
+    second = await storage.ReadmeCache.get(session, readme)
+    assert first.text == second.text == "# 标题\n" and len(reads) == 1
@@ -0,0 +1,167 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_archive_tasks(session, temp_path, make_user, upload, monkeypatch):
+    """测试压缩、解压任务在进程池中执行并写回结果"""
+    import json
+    import zipfile
+
+    from fastapi import HTTPException
+
+    from models.file import File
+    from models.folder import Folder
+    from models.group import Group, GroupOptions
+    from models.setting import SettingsCache, SettingsType
+    from models.task import Task, TaskStatus
+    from service.task import TaskExecutor, create_compress_task, create_decompress_task
+
+    monkeypatch.setitem(SettingsCache._values, (SettingsType.TASK, "max_worker_num"), "2")
+
+    async def finish(task_id: int) -> Task:
+        await TaskExecutor._running[task_id]
+        task = await Task.get_exist_one(session, task_id)
+        await session.refresh(task)
+        return task
+
+    user_id, group_id, _, root_id = await make_user(
+        max_storage=1 << 20, group_options=GroupOptions(archive_task=True).model_dump(),
+    )
+    try:
+        root = await Folder.get_exist_one(session, root_id)
+        docs_id = (await root.create_child(session, "docs")).id
+        out_id = (await (await Folder.get_exist_one(session, root_id)).create_child(session, "out")).id
+
+        text = b"compress me " * 5000
+        await upload(user_id, docs_id, "a.txt", text)
+        await upload(user_id, docs_id, "b.jpg", b"\xff\xd8 not really a jpeg")
+
+        # 压缩 docs 目录，保存到根目录
+        root = await Folder.get_exist_one(session, root_id)
+        task_id = await create_compress_task(session, user_id, [], [docs_id], root, "docs.zip")
+        task = await finish(task_id)
+        assert (task.status, task.progress, task.error) == (TaskStatus.COMPLETE, 100, None)
+
+        archive_file = await File.get(session, (File.user_id == user_id) & (File.name == "docs.zip"))
+        archive_id = archive_file.id
+        archive = zipfile.ZipFile(archive_file.source_name)
+        assert archive.read("docs/a.txt") == text
+        assert archive.getinfo("docs/a.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert archive.getinfo("docs/b.jpg").compress_type == zipfile.ZIP_STORED
+        assert archive_file.size < len(text)
+
+        # 解压到 out 目录，目录结构随之重建
+        out = await Folder.get_exist_one(session, out_id)
+        task_id = await create_decompress_task(session, user_id, archive_id, out)
+        task = await finish(task_id)
+        assert task.status == TaskStatus.COMPLETE, task.error
+
+        extracted = await Folder.resolve(session, user_id, "/out/docs/")
+        extracted_a = await File.get(session, (File.folder_id == extracted.id) & (File.name == "a.txt"))
+        assert extracted_a.sha256 == (await File.get(session, (File.folder_id == docs_id) & (File.name == "a.txt"))).sha256
+
+        # 再解压一次，已存在的同名文件跳过，其余条目照常解压，跳过的条目记录在任务属性中
+        await extracted_a.remove(session)
+        out = await Folder.get_exist_one(session, out_id)
+        task = await finish(await create_decompress_task(session, user_id, archive_id, out))
+        assert task.status == TaskStatus.COMPLETE, task.error
+        assert json.loads(task.props)['skipped'] == ["docs/b.jpg"]
+        extracted = await Folder.resolve(session, user_id, "/out/docs/")
+        assert await File.get(session, (File.folder_id == extracted.id) & (File.name == "a.txt")) is not None
+
+        # 文件名非法、目标目录已有同名文件时不创建压缩任务
+        for name, status in [("", 400), ("a/b.zip", 400), ("..", 400), ("docs.zip", 409)]:
+            root = await Folder.get_exist_one(session, root_id)
+            with pytest.raises(HTTPException) as exc_info:
+                await create_compress_task(session, user_id, [], [docs_id], root, name)
+            assert exc_info.value.status_code == status
+
+        # 不是 ZIP 的文件解压失败
+        not_zip_id = (await File.get(session, (File.folder_id == docs_id) & (File.name == "b.jpg"))).id
+        out = await Folder.get_exist_one(session, out_id)
+        task = await finish(await create_decompress_task(session, user_id, not_zip_id, out))
+        assert task.status == TaskStatus.ERROR
+
+        # 用户组未开启时不能创建任务
+        await Group.bulk_update(session, Group.id == group_id, {'options': GroupOptions().model_dump()})
+        root = await Folder.get_exist_one(session, root_id)
+        with pytest.raises(HTTPException):
+            await create_compress_task(session, user_id, [], [docs_id], root, "again.zip")
+    finally:
+        await TaskExecutor.shutdown()
+
+@pytest.mark.asyncio
+async def test_task_heartbeat(session, temp_path, make_user, monkeypatch):
+    """测试只回收心跳超时的任务，取消请求由执行任务的进程在心跳时处理"""
+    from datetime import datetime, timedelta
+
+    from models.task import Task, TaskStatus, TaskType
+    from service.task import TaskExecutor, task_dir
+    from service.task.worker import CANCEL_MARKER
+
+    user_id = (await make_user()).user_id
+
+    async def add_task(heartbeat: datetime | None) -> int:
+        task_id = (await Task(type=TaskType.COMPRESS, status=TaskStatus.PROCESSING, user_id=user_id).save(session)).id
+        await Task.bulk_update(session, Task.id == task_id, {'heartbeat': heartbeat})
+        return task_id
+
+    async def get_task(task_id: int) -> Task:
+        task = await Task.get_exist_one(session, task_id)
+        await session.refresh(task)
+        return task
+
+    alive_id = await add_task(datetime.now())
+    stale_id = await add_task(datetime.now() - timedelta(hours=1))
+    # 旧版本遗留的任务没有心跳
+    legacy_id = await add_task(None)
+
+    # 其他进程仍在执行的任务不受影响
+    await TaskExecutor.recover()
+    assert (await get_task(alive_id)).status == TaskStatus.PROCESSING
+    assert (await get_task(stale_id)).status == TaskStatus.ERROR
+    assert (await get_task(legacy_id)).status == TaskStatus.ERROR
+
+    # 不在本进程执行的任务只记录取消请求，已结束的任务无法取消
+    assert await TaskExecutor.cancel(alive_id)
+    assert (await get_task(alive_id)).cancel_requested
+    assert not await TaskExecutor.cancel(stale_id)
+
+    # 执行任务的进程在心跳时刷新心跳并写入取消标记
+    before = (await get_task(alive_id)).heartbeat
+    monkeypatch.setitem(TaskExecutor._running, alive_id, None)
+    await TaskExecutor._beat(session)
+    assert (await get_task(alive_id)).heartbeat > before
+    assert (task_dir(alive_id) / CANCEL_MARKER).exists()
+
+def test_worker_cancel_and_zip_slip(tmp_path):
+    """测试工作进程函数的取消、解压大小限制与路径穿越防护"""
+    import zipfile
+    from datetime import datetime
+
+    from pkg.archive.zipstream import ZipEntry
+    from service.task import worker
+
+    source = tmp_path / "evil.zip"
+    with zipfile.ZipFile(source, 'w') as archive:
+        archive.writestr("../escape.txt", b"x")
+        archive.writestr("/abs/./ok.txt", b"hello")
+        archive.writestr("big.bin", b"\0" * 1000)
+
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    folders, files = worker.decompress(1, workdir, source, limit=10_000)
+    assert folders == [("abs",)]
+    assert [(f.parts, f.size) for f in files] == [(("abs", "ok.txt"), 5), (("big.bin",), 1000)]
+    assert not (tmp_path / "escape.txt").exists()
+
+    workdir = tmp_path / "limited"
+    workdir.mkdir()
+    with pytest.raises(worker.TaskLimitExceeded):
+        worker.decompress(2, workdir, source, limit=100)
+
+    workdir = tmp_path / "cancelled"
+    workdir.mkdir()
+    (workdir / worker.CANCEL_MARKER).touch()
+    entry = ZipEntry("a.txt", source, source.stat().st_size, datetime(2024, 1, 1))
+    with pytest.raises(worker.TaskCancelled):
+        worker.compress(3, workdir, [entry])
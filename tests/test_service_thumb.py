@@ -0,0 +1,202 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_thumb_cache(tmp_path, monkeypatch):
+    """测试缩略图生成、缓存命中、并发合并与 LRU 淘汰"""
+    import asyncio
+    import struct
+    from collections import OrderedDict
+
+    from fastapi import HTTPException
+    from PIL import Image
+
+    from models.setting import SettingsCache, SettingsType
+    from pkg.thumb import thumbnail
+    from service.storage import ThumbCache
+
+    monkeypatch.setitem(SettingsCache._values, (SettingsType.PATH, "temp_path"), str(tmp_path))
+    monkeypatch.setitem(SettingsCache._values, (SettingsType.THUMB, "thumb_width"), "40")
+    monkeypatch.setitem(SettingsCache._values, (SettingsType.THUMB, "thumb_height"), "30")
+    monkeypatch.setattr(ThumbCache, "_index", OrderedDict())
+    monkeypatch.setattr(ThumbCache, "_root", None)
+    monkeypatch.setattr(ThumbCache, "_total", 0)
+
+    generated = []
+    make_thumbnail = thumbnail.make_thumbnail
+
+    def counting_make_thumbnail(source, *args):
+        generated.append(source)
+        make_thumbnail(source, *args)
+
+    monkeypatch.setattr("service.storage.thumb.make_thumbnail", counting_make_thumbnail)
+
+    sources = []
+    for i, (mode, size) in enumerate([('RGB', (400, 200)), ('RGBA', (100, 300))]):
+        path = tmp_path / f"{i}.png"
+        Image.new(mode, size, (i * 80, 0, 0)).save(path)
+        sources.append(path)
+
+    try:
+        # 并发请求同一缩略图只生成一次
+        paths = await asyncio.gather(*(ThumbCache.get("aa" * 32, sources[0]) for _ in range(5)))
+        assert len(set(paths)) == 1 and generated == [sources[0]]
+        with Image.open(paths[0]) as image:
+            assert image.format == 'JPEG' and image.size == (40, 20)
+
+        # 命中缓存不再解码原图
+        assert await ThumbCache.get("aa" * 32, sources[0]) == paths[0]
+        assert generated == [sources[0]]
+
+        # 透明图片铺白底后按比例缩小
+        with Image.open(await ThumbCache.get("bb" * 32, sources[1])) as image:
+            assert image.mode == 'RGB' and image.size == (10, 30)
+
+        # 超过缓存上限时淘汰最久未访问的缩略图，刚访问过的保留
+        await ThumbCache.get("aa" * 32, sources[0])
+        monkeypatch.setitem(SettingsCache._values, (SettingsType.THUMB, "thumb_cache_max_size"), str(ThumbCache._total))
+        await ThumbCache.get("cc" * 32, sources[1])
+        assert not (tmp_path / "thumbs" / ThumbCache.key("bb" * 32, 40, 30)).exists()
+        assert paths[0].exists()
+        assert list(ThumbCache._index) == [ThumbCache.key("aa" * 32, 40, 30), ThumbCache.key("cc" * 32, 40, 30)]
+
+        # 重启后从磁盘恢复索引
+        monkeypatch.setattr(ThumbCache, "_root", None)
+        await ThumbCache.get("aa" * 32, sources[0])
+        assert len(generated) == 3
+
+        # 缩略图在缓存之外被删除时重新生成
+        paths[0].unlink()
+        assert await ThumbCache.get("aa" * 32, sources[0]) == paths[0]
+        assert paths[0].exists() and len(generated) == 4
+
+        # 无法解码的文件返回 415
+        broken = tmp_path / "broken.jpg"
+        broken.write_bytes(b"not an image")
+        with pytest.raises(HTTPException) as e:
+            await ThumbCache.get("dd" * 32, broken)
+        assert e.value.status_code == 415
+
+        # Pillow 对损坏的 PNG 抛出 ValueError 等非 OSError 异常，同样返回 415
+        truncated = tmp_path / "truncated.png"
+        truncated.write_bytes(b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 5) + b"IHDR" + b"\0" * 9)
+        with pytest.raises(HTTPException) as e:
+            await ThumbCache.get("ee" * 32, truncated)
+        assert e.value.status_code == 415
+    finally:
+        await ThumbCache.shutdown()
+
+def test_thumb_response(tmp_path, monkeypatch):
+    """测试缩略图响应的缓存头与 304"""
+    import asyncio
+    from collections import OrderedDict
+
+    from fastapi import FastAPI, Request
+    from fastapi.testclient import TestClient
+    from PIL import Image
+
+    from models.setting import SettingsCache, SettingsType
+    from service import storage
+    from service.storage import ThumbCache
+
+    monkeypatch.setitem(SettingsCache._values, (SettingsType.PATH, "temp_path"), str(tmp_path))
+    monkeypatch.setattr(ThumbCache, "_index", OrderedDict())
+    monkeypatch.setattr(ThumbCache, "_root", None)
+    monkeypatch.setattr(ThumbCache, "_total", 0)
+
+    source = tmp_path / "photo.jpg"
+    Image.new('RGB', (1600, 1200), (0, 128, 255)).save(source)
+
+    app = FastAPI()
+
+    @app.get("/thumb")
+    async def thumb(request: Request):
+        return await storage.thumb_response(request, "ee" * 32, source)
+
+    client = TestClient(app)
+    try:
+        response = client.get("/thumb")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/jpeg"
+        assert response.headers["cache-control"] == storage.THUMB_CACHE_CONTROL
+        etag = response.headers["etag"]
+
+        response = client.get("/thumb", headers={"If-None-Match": etag})
+        assert response.status_code == 304 and response.content == b""
+        assert response.headers["cache-control"] == storage.THUMB_CACHE_CONTROL
+    finally:
+        client.close()
+        asyncio.run(ThumbCache.shutdown())
+
+@pytest.mark.asyncio
+async def test_batch_thumbs(session, temp_path, make_user, upload, monkeypatch):
+    """测试批量缩略图：一次响应输出多张缩略图与各自的错误"""
+    import io
+    import struct
+    from collections import OrderedDict
+
+    from PIL import Image
+
+    from service import storage
+    from service.storage import ThumbCache
+
+    monkeypatch.setattr(ThumbCache, "_index", OrderedDict())
+    monkeypatch.setattr(ThumbCache, "_root", None)
+    monkeypatch.setattr(ThumbCache, "_total", 0)
+
+    async def upload_file(name: str, content: bytes) -> int:
+        return (await upload(user_id, root_id, name, content)).id
+
+    def image(size: tuple[int, int]) -> bytes:
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 100, 0)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    user_id, _, _, root_id = await make_user(max_storage=1 << 24)
+    other_id = (await make_user()).user_id
+    try:
+
+        ids = [await upload_file(f"{i}.png", image((800 + i, 600))) for i in range(3)]
+        text_id = await upload_file("notes.txt", b"hello")
+        # 文件头完整但 IHDR 被截断，Pillow 抛出 ValueError
+        corrupt_id = await upload_file("corrupt.png", image((64, 64))[:8] + struct.pack(">I", 5) + b"IHDR" + b"\0" * 9)
+
+        response = await storage.batch_thumb_response(session, user_id, ids + [ids[0], text_id, corrupt_id, 9999])
+        assert response.media_type.startswith("multipart/mixed; boundary=")
+        boundary = response.media_type.partition("boundary=")[2].encode()
+        content = b"".join([chunk async for chunk in response.body_iterator])
+
+        assert content.endswith(b"--" + boundary + b"--\r\n")
+        parts = {}
+        for raw in content.split(b"--" + boundary + b"\r\n")[1:]:
+            head, _, payload = raw.partition(b"\r\n\r\n")
+            headers = dict(line.split(": ", 1) for line in head.decode().split("\r\n"))
+            length = int(headers["Content-Length"])
+            parts[int(headers["X-File-Id"])] = (int(headers["X-Status"]), payload[:length])
+
+        # 重复的ID只输出一次，不支持的类型、损坏的图片与不存在的文件返回对应状态，其余缩略图照常输出
+        assert sorted(parts) == sorted(ids + [text_id, corrupt_id, 9999])
+        assert parts[text_id][0] == 415 and parts[corrupt_id][0] == 415 and parts[9999][0] == 404
+        for file_id in ids:
+            status, payload = parts[file_id]
+            assert status == 200
+            with Image.open(io.BytesIO(payload)) as thumb:
+                assert thumb.format == 'JPEG' and thumb.size[0] <= 400
+        assert len(ThumbCache._index) == 3
+
+        # 生成时的意外异常也只影响对应的部分
+        def failing_make_thumbnail(*args):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr("service.storage.thumb.make_thumbnail", failing_make_thumbnail)
+        fresh_id = await upload_file("fresh.png", image((300, 300)))
+        response = await storage.batch_thumb_response(session, user_id, [ids[1], fresh_id])
+        content = b"".join([chunk async for chunk in response.body_iterator])
+        assert content.count(b"X-Status: 200") == 1 and content.count(b"X-Status: 415") == 1
+        assert content.endswith(b"--\r\n")
+
+        # 其他用户的文件按不存在处理
+        response = await storage.batch_thumb_response(session, other_id, ids[:1])
+        content = b"".join([chunk async for chunk in response.body_iterator])
+        assert b"X-Status: 404" in content and b"image/jpeg" not in content
+    finally:
+        await ThumbCache.shutdown()
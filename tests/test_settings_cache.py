@@ -0,0 +1,42 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_settings_cache():
+    """测试设置缓存的加载、读取与重新加载"""
+    from models import database, migration
+    from models.setting import Setting, SettingsCache, SettingsType
+    from sqlalchemy import and_
+
+    await database.init_db(url='sqlite+aiosqlite:///:memory:')
+
+    await migration.migration()
+
+    async for session in database.get_session():
+        await SettingsCache.load(session)
+        version = SettingsCache.version()
+
+        assert SettingsCache.get(SettingsType.BASIC, "siteName") is not None
+        assert SettingsCache.get(SettingsType.BASIC, "not_exists", "fallback") == "fallback"
+        assert SettingsCache.get_int(SettingsType.FILE_EDIT, "maxEditSize") == 4194304
+        assert isinstance(SettingsCache.get_json(SettingsType.BASIC, "themes"), dict)
+
+        # 修改数据库后，缓存在重新加载前保持不变
+        setting = await Setting.get(
+            session,
+            and_(Setting.type == SettingsType.AUTHN, Setting.name == "authn_enabled")
+        )
+        original_value = setting.value
+        setting.value = "0" if original_value == "1" else "1"
+        setting = await setting.save(session)
+
+        assert SettingsCache.get_bool(SettingsType.AUTHN, "authn_enabled") == (original_value == "1")
+
+        await SettingsCache.reload(session)
+        assert SettingsCache.version() == version + 1
+        assert SettingsCache.get_bool(SettingsType.AUTHN, "authn_enabled") == (setting.value == "1")
+
+        # 还原
+        setting.value = original_value
+        await setting.save(session)
+        await SettingsCache.reload(session)
+        break